@@ -1,16 +1,39 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class SearchRequest(BaseModel):
     query: str
     limit: Optional[int] = 5
     fields: Optional[List[str]] = None
+    mode: Literal["vector", "keyword", "hybrid"] = "vector"
+    cursor: Optional[str] = None  # X-Next-Cursor of the previous page
+    stream: bool = False  # stream limit results as NDJSON
 
 class SearchResponse(BaseModel):
+    # Only the requested fields are set; the rest are left out of the response
+    header: Optional[str] = None
+    received_date: Optional[datetime] = None
+    snippet: Optional[str] = None
+    text_content: Optional[str] = None
+    newsletter: Optional[str] = None
+    sender: Optional[str] = None
+    links: Optional[List[str]] = None
+    email_id: Optional[str] = None
+
+class SectionResult(BaseModel):
+    title: str
+    description: Optional[str] = None
+    links: List[str] = []
+    section_index: Optional[int] = None
+    distance: Optional[float] = None
+
+class SectionSearchResponse(BaseModel):
+    email_id: str
     header: str
+    newsletter: Optional[str] = None
     received_date: datetime
-    text_content: Optional[str] = None
+    sections: List[SectionResult]
 
 class HealthResponse(BaseModel):
     status: str
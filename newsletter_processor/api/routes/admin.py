@@ -1,42 +1,68 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 import logging
 from weaviate import Client
 
-from ...services.email.newsletter_processor import NewsletterProcessor
 from ...services.weaviate.query import get_total_count
-from ...services.weaviate.loader import load_data
-from ...services.weaviate.newsletter_schema import create_schema_if_not_exists
-from ...services.weaviate.client import get_weaviate_client, check_weaviate_ready
+from ...services.storage.backend import get_storage_backend
+from ...services.monitor import get_service_monitor
+from ...services.refresh import RefreshJobManager
+from ...services.cache import IngestGeneration, get_search_cache
+from ...services.inference.query_cache import get_query_vector_cache
 from ...core.config import get_settings
+from ...core.metrics import render_metrics
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+async def _service_snapshot() -> dict:
+    """The monitor's latest snapshot, probing once if the background monitor has not yet"""
+    monitor = get_service_monitor()
+    return monitor.snapshot() or await run_in_threadpool(monitor.probe)
+
+async def _ensure_backend_ready() -> None:
+    """Raise 503 unless the backend is ready, re-probing only when the snapshot says it is not"""
+    snapshot = await _service_snapshot()
+    if not snapshot["backend_ready"]:
+        snapshot = await run_in_threadpool(get_service_monitor().probe)
+    if not snapshot["backend_ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{snapshot['backend']} service is not ready"
+        )
+
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, served from the service monitor's snapshot"""
     try:
-        client = get_weaviate_client()
-        if not client.is_ready():
-            return {"status": "degraded", "message": "Weaviate not ready"}
-        return {"status": "healthy"}
+        snapshot = await _service_snapshot()
+        if not snapshot["backend_ready"]:
+            return {"status": "degraded", "message": f"{snapshot['backend']} not ready", "checked_at": snapshot["checked_at"]}
+        if not snapshot["inference_ready"]:
+            return {"status": "degraded", "message": "Inference service not ready", "checked_at": snapshot["checked_at"]}
+        return {"status": "healthy", "checked_at": snapshot["checked_at"]}
     except Exception:
         return {"status": "unhealthy"}
 
 @router.get("/count")
 async def get_newsletter_count():
-    """Get total number of newsletters in the database"""
+    """Get total number of newsletters in the database, served from the service monitor's snapshot"""
     try:
-        client = get_weaviate_client()
-        if not client.is_ready():
+        snapshot = await _service_snapshot()
+        if not snapshot["backend_ready"]:
             raise HTTPException(
                 status_code=503,
-                detail="Weaviate service is not ready"
+                detail=f"{snapshot['backend']} service is not ready"
             )
-            
-        count = get_total_count()
-        return {"total_count": count}
+
+        count = snapshot["counts"].get("Newsletter")
+        if count is None:
+            # Not counted by the last probe (e.g. no schema yet), so ask the backend
+            count = await run_in_threadpool(get_total_count)
+        return {"total_count": count, "checked_at": snapshot["checked_at"]}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Database count failed: {str(e)}")
         raise HTTPException(
@@ -44,53 +70,48 @@ async def get_newsletter_count():
             detail=f"Failed to get total count from database: {str(e)}"
         )
 
-@router.post("/refresh")
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss statistics of the search result and query vector caches"""
+    return {
+        "search": get_search_cache().stats(),
+        "query_vectors": get_query_vector_cache().stats(),
+        "ingest_generation": IngestGeneration.get()
+    }
+
+@router.get("/metrics")
+async def get_metrics():
+    """Ingestion and serving metrics in the Prometheus text format"""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.post("/refresh", status_code=202)
 async def refresh_emails():
-    """Manually trigger email processing"""
-    try:
-        client = get_weaviate_client()
-        if not client.is_ready():
-            raise HTTPException(
-                status_code=503,
-                detail="Weaviate service is not ready"
-            )
-            
-        processor = NewsletterProcessor(
-            settings.EMAIL_ADDRESS,
-            settings.OUTPUT_FILE,
-            settings.ERROR_FILE,
-            settings.EMAIL_CHECK_INTERVAL
-        )
-        processed = await processor.process_emails()
-        
-        if processed > 0:
-            try:
-                load_data()
-            except Exception as e:
-                logger.error(f"Data loading failed: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Email processing succeeded but data loading failed: {str(e)}"
-                )
-            
-        return {"status": "success", "processed_count": processed}
-    except Exception as e:
-        logger.error(f"Email refresh failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Email refresh failed: {str(e)}")
+    """
+    Start email processing as a background job and return its id; a refresh
+    already in flight is joined instead. Poll /refresh/{job_id} for progress.
+    """
+    await _ensure_backend_ready()
+    job, joined = RefreshJobManager.submit(trigger="api")
+    return {"job_id": job.id, "status": job.status, "joined": joined}
+
+@router.get("/refresh/{job_id}")
+async def get_refresh_job(job_id: str):
+    """Status, per-stage progress and throughput of a refresh job"""
+    job = RefreshJobManager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown refresh job: {job_id}")
+    return job.to_dict()
 
 @router.post("/init")
 @router.get("/init")
 async def initialize_schema():
-    """Initialize the Weaviate schema"""
+    """Initialize the storage backend's schema"""
     try:
-        client = get_weaviate_client()
-        if not client.is_ready():
-            raise HTTPException(
-                status_code=503,
-                detail="Weaviate service is not ready"
-            )
-            
-        result = create_schema_if_not_exists()
+        await _ensure_backend_ready()
+
+        result = await run_in_threadpool(get_storage_backend().init_schema)
+        # The classes may be new, so count them now rather than at the next probe
+        await run_in_threadpool(get_service_monitor().probe)
         return result
     except Exception as e:
         logger.error(f"Schema creation failed: {str(e)}")
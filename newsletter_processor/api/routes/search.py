@@ -1,32 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Iterable, List, Optional
 
 from ...core.config import get_settings
-from ...services.weaviate.query import search_by_text, get_recent_records
-from ..models import SearchRequest, SearchResponse
+from ...services.weaviate.query import (
+    search_page, search_many, search_sections, get_recent_page, iter_recent_records, iter_search_results
+)
+from ..models import SearchRequest, SearchResponse, SectionSearchResponse
 
 router = APIRouter()
 settings = get_settings()
 
-@router.post("/search", response_model=List[SearchResponse])
-async def search_newsletters(request: SearchRequest):
+# Header carrying the cursor of the next page of /search and /recent
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _ndjson(records: Iterable[dict]) -> Iterable[str]:
+    for record in records:
+        yield json.dumps(record, default=str) + "\n"
+
+@router.post("/search", response_model=List[SearchResponse], response_model_exclude_none=True)
+async def search_newsletters(request: SearchRequest, response: Response):
     try:
-        results = search_by_text(
+        if request.stream:
+            # Pages are fetched as the client reads, so memory stays bounded by the page size
+            results = iter_search_results(
+                request.query, fields=request.fields, limit=request.limit, mode=request.mode, cursor=request.cursor
+            )
+            return StreamingResponse(_ndjson(results), media_type="application/x-ndjson")
+
+        results, next_cursor = await run_in_threadpool(
+            search_page,
             request.query,
-            fields=request.fields or ["header", "text_content", "received_date"],
-            limit=request.limit
+            fields=request.fields,
+            limit=request.limit,
+            mode=request.mode,
+            cursor=request.cursor
         )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return results
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Search operation failed: {str(e)}"
         )
 
-@router.get("/recent", response_model=List[SearchResponse])
-async def get_recent(limit: int = 5):
+@router.post("/search/batch", response_model=List[List[SearchResponse]], response_model_exclude_none=True)
+async def search_newsletters_batch(requests: List[SearchRequest]):
+    """Run several searches in one round trip, returning their results in request order"""
+    if len(requests) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SEARCH_BATCH_MAX_QUERIES} searches per batch"
+        )
     try:
-        return get_recent_records(limit)
+        return await run_in_threadpool(
+            search_many,
+            [
+                {
+                    "search_term": request.query,
+                    "fields": request.fields,
+                    "limit": request.limit,
+                    "mode": request.mode,
+                    "cursor": request.cursor
+                }
+                for request in requests
+            ]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch search failed: {str(e)}"
+        )
+
+@router.post("/search/sections", response_model=List[SectionSearchResponse])
+async def search_newsletter_sections(request: SearchRequest):
+    try:
+        return await run_in_threadpool(search_sections, request.query, limit=request.limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Section search failed: {str(e)}"
+        )
+
+@router.get("/recent", response_model=List[SearchResponse], response_model_exclude_none=True)
+async def get_recent(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    fields: Optional[List[str]] = Query(None)
+):
+    """Most recent newsletters; stream=true streams all of them (or limit) as NDJSON"""
+    try:
+        if stream:
+            records = iter_recent_records(limit, cursor, fields=fields)
+            return StreamingResponse(_ndjson(records), media_type="application/x-ndjson")
+
+        records, next_cursor = await run_in_threadpool(get_recent_page, limit or 5, cursor, fields)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return records
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
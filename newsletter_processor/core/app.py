@@ -1,13 +1,18 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+import time
 
 from ..api.routes.search import router as search_router
 from ..api.routes.admin import router as admin_router
 from .config import get_settings
 from .logging import setup_logging
+from .metrics import HTTP_REQUEST_SECONDS
 from ..services.scheduler import start_scheduler
+from ..services.email.idle_listener import start_idle_listeners
+from ..services.executor import IngestExecutorManager, ParseProcessPoolManager
+from ..services.monitor import get_service_monitor
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -16,8 +21,11 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting newsletter processor service")
-    scheduler = start_scheduler()
+    idle_listeners = start_idle_listeners()
+    app.state.idle_listeners = idle_listeners
+    scheduler = start_scheduler(idle_listeners)
     app.state.scheduler = scheduler
+    get_service_monitor().start()
     
     yield
     
@@ -25,6 +33,11 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down newsletter processor service")
     if hasattr(app.state, "scheduler"):
         app.state.scheduler.shutdown()
+    for listener in getattr(app.state, "idle_listeners", []):
+        listener.stop()
+    await get_service_monitor().stop()
+    IngestExecutorManager.shutdown()
+    ParseProcessPoolManager.shutdown()
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application"""
@@ -45,8 +58,20 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
+    @app.middleware("http")
+    async def observe_request_latency(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Labelled by route template, so /refresh/{job_id} is one series rather than one per job
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), response.status_code
+        ).observe(time.perf_counter() - started)
+        return response
+
     # Include routers
     app.include_router(search_router, prefix=settings.API_V1_STR, tags=["search"])
     app.include_router(admin_router, prefix=settings.API_V1_STR, tags=["admin"])
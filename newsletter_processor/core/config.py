@@ -1,5 +1,5 @@
 from pydantic import BaseSettings, Field
-from typing import Optional
+from typing import List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -11,14 +11,73 @@ class Settings(BaseSettings):
     # Weaviate Configuration
     WEAVIATE_URL: str = Field(..., env="WEAVIATE_URL")
     WEAVIATE_API_KEY: Optional[str] = Field(None, env="WEAVIATE_API_KEY")
+    WEAVIATE_BATCH_INITIAL_SIZE: int = Field(8, env="WEAVIATE_BATCH_INITIAL_SIZE")
+    WEAVIATE_BATCH_MAX_SIZE: int = Field(100, env="WEAVIATE_BATCH_MAX_SIZE")
+    WEAVIATE_BATCH_MAX_WORKERS: int = Field(4, env="WEAVIATE_BATCH_MAX_WORKERS")
+    WEAVIATE_BATCH_TARGET_SECONDS: float = Field(2.0, env="WEAVIATE_BATCH_TARGET_SECONDS")  # per-batch latency goal
+    WEAVIATE_BATCH_TIMEOUT_SECONDS: float = Field(120.0, env="WEAVIATE_BATCH_TIMEOUT_SECONDS")
+    
+    # Storage Configuration
+    STORAGE_BACKEND: str = Field("weaviate", env="STORAGE_BACKEND")  # "weaviate" or the in-process "local" index
+    LOCAL_INDEX_DIR: str = Field("data/local_index", env="LOCAL_INDEX_DIR")
+    LOCAL_INDEX_HNSW: bool = Field(False, env="LOCAL_INDEX_HNSW")  # approximate search, needs hnswlib
+    MONITOR_INTERVAL_SECONDS: float = Field(15.0, env="MONITOR_INTERVAL_SECONDS")  # readiness/count probes, 0 disables
+    
+    # Inference Configuration
+    TRANSFORMERS_INFERENCE_URL: str = Field("http://t2v-transformers:8080", env="TRANSFORMERS_INFERENCE_URL")
+    INFERENCE_TIMEOUT_SECONDS: float = Field(30.0, env="INFERENCE_TIMEOUT_SECONDS")
+    QUERY_VECTOR_CACHE_FILE: str = Field("data/query_vectors.db", env="QUERY_VECTOR_CACHE_FILE")
+    QUERY_VECTOR_CACHE_SIZE: int = Field(10000, env="QUERY_VECTOR_CACHE_SIZE")  # vectors kept on disk
+    INFERENCE_CONCURRENCY: int = Field(4, env="INFERENCE_CONCURRENCY")  # parallel /vectors requests
+    CLIENT_SIDE_VECTORS: bool = Field(True, env="CLIENT_SIDE_VECTORS")  # vectorize documents before loading
+    DOCUMENT_VECTOR_CACHE_DIR: str = Field("data/document_vectors", env="DOCUMENT_VECTOR_CACHE_DIR")
+    VECTORIZE_BATCH_SIZE: int = Field(32, env="VECTORIZE_BATCH_SIZE")  # documents vectorized per batch
+    EMBEDDER: str = Field("transformers", env="EMBEDDER")  # "transformers" or the offline "hashing" stand-in
+    HASHING_EMBEDDER_DIM: int = Field(384, env="HASHING_EMBEDDER_DIM")
+    INGEST_SECTIONS: bool = Field(False, env="INGEST_SECTIONS")  # also store each section as its own object
+    
+    # Deduplication Configuration
+    DEDUP_ENABLED: bool = Field(True, env="DEDUP_ENABLED")  # skip re-sends and copies before vectorizing
+    DEDUP_INDEX_FILE: str = Field("data/dedup_index.db", env="DEDUP_INDEX_FILE")
+    DEDUP_THRESHOLD: float = Field(0.85, env="DEDUP_THRESHOLD")  # estimated Jaccard similarity of shingles
+    DEDUP_NUM_PERM: int = Field(128, env="DEDUP_NUM_PERM")  # MinHash permutations
+    DEDUP_BANDS: int = Field(16, env="DEDUP_BANDS")  # LSH bands, must divide DEDUP_NUM_PERM
+    
+    # Search Configuration
+    SEARCH_CACHE_SIZE: int = Field(1024, env="SEARCH_CACHE_SIZE")  # cached result sets
+    SEARCH_CACHE_TTL_SECONDS: float = Field(300.0, env="SEARCH_CACHE_TTL_SECONDS")
+    STREAM_PAGE_SIZE: int = Field(100, env="STREAM_PAGE_SIZE")  # records fetched per page of NDJSON streams
+    SEARCH_BATCH_MAX_QUERIES: int = Field(50, env="SEARCH_BATCH_MAX_QUERIES")  # searches per /search/batch request
+    KEYWORD_INDEX_ENABLED: bool = Field(True, env="KEYWORD_INDEX_ENABLED")  # BM25 index for keyword/hybrid search
+    KEYWORD_INDEX_FILE: str = Field("data/keyword_index.db", env="KEYWORD_INDEX_FILE")
+    SNIPPET_LENGTH: int = Field(500, env="SNIPPET_LENGTH")  # characters of text stored as the result snippet
     
     # Email Configuration
     EMAIL_ADDRESS: str = Field(..., env="EMAIL_ADDRESS")
     EMAIL_PASSWORD: str = Field(..., env="EMAIL_PASSWORD")
     EMAIL_LABEL: str = Field("_News/AIML", env="EMAIL_LABEL")
-    OUTPUT_FILE: str = Field("data/newsletter_records.json", env="OUTPUT_FILE")
+    OUTPUT_FILE: str = Field("data/newsletter_records.json", env="OUTPUT_FILE")  # legacy, imported once
+    RECORD_STORE_FILE: str = Field("data/newsletter_records.db", env="RECORD_STORE_FILE")
     ERROR_FILE: str = Field("data/errors.json", env="ERROR_FILE")
+    SYNC_STATE_FILE: str = Field("data/sync_state.json", env="SYNC_STATE_FILE")
+    # JSON list of {"address", "password" or "password_env", "labels"}; empty syncs EMAIL_LABEL of EMAIL_ADDRESS
+    EMAIL_SOURCES: List[dict] = Field([], env="EMAIL_SOURCES")
+    EMAIL_SYNC_CONCURRENCY: int = Field(4, env="EMAIL_SYNC_CONCURRENCY")  # IMAP connections syncing at once
     EMAIL_CHECK_INTERVAL: int = Field(6, env="EMAIL_CHECK_INTERVAL")  # hours
+    IMAP_IDLE_ENABLED: bool = Field(True, env="IMAP_IDLE_ENABLED")  # refresh as soon as new mail arrives
+    IMAP_IDLE_TIMEOUT_SECONDS: float = Field(540.0, env="IMAP_IDLE_TIMEOUT_SECONDS")  # IDLE renewal, below the 29 minute limit
+    IMAP_RECONNECT_MIN_SECONDS: float = Field(5.0, env="IMAP_RECONNECT_MIN_SECONDS")
+    IMAP_RECONNECT_MAX_SECONDS: float = Field(300.0, env="IMAP_RECONNECT_MAX_SECONDS")
+    IMAP_POLL_FALLBACK_MINUTES: int = Field(15, env="IMAP_POLL_FALLBACK_MINUTES")  # polling while IDLE is down
+    EMAIL_FETCH_CHUNK_SIZE: int = Field(50, env="EMAIL_FETCH_CHUNK_SIZE")  # UIDs per FETCH
+    EMAIL_LEAN_FETCH: bool = Field(True, env="EMAIL_LEAN_FETCH")  # fetch only the text/plain part
+    INGEST_MAX_WORKERS: int = Field(2, env="INGEST_MAX_WORKERS")  # threads for blocking ingestion work
+    INGEST_QUEUE_SIZE: int = Field(50, env="INGEST_QUEUE_SIZE")  # records buffered between stages
+    INGEST_LOAD_BATCH_SIZE: int = Field(20, env="INGEST_LOAD_BATCH_SIZE")  # records per store/load flush
+    INGEST_FLUSH_SECONDS: float = Field(2.0, env="INGEST_FLUSH_SECONDS")  # flush partial batches when idle
+    PARSE_WORKERS: int = Field(0, env="PARSE_WORKERS")  # parser processes, 0 parses in the pipeline thread
+    PARSE_CHUNK_SIZE: int = Field(16, env="PARSE_CHUNK_SIZE")  # emails sent to a parser process at once
+    REFRESH_JOB_HISTORY: int = Field(50, env="REFRESH_JOB_HISTORY")  # finished refresh jobs kept for /refresh/{job_id}
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = Field(..., env="OPENAI_API_KEY")
@@ -0,0 +1,224 @@
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from a cached lookup to a slow batch write
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class _Metric(ABC):
+    """A named metric family with optional labels, registered for /metrics on creation"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values) -> object:
+        """The child metric of a set of label values, created on first use"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        return self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        """A child metric holding the values of one set of label values"""
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(name suffix, label names, label values, value) of every sample to render"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. bytes fetched or errors"""
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield "", self.labelnames, key, child.value
+
+class _HistogramChild:
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # Per-bucket counts are kept, and only made cumulative when rendered
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+class Histogram(_Metric):
+    """A distribution of observed values, usually durations in seconds, over fixed buckets"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, key + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, key, total
+            yield "_count", self.labelnames, key, cumulative
+
+class CallbackMetric(_Metric):
+    """
+    A metric read at scrape time from a callback returning {label values: value},
+    for counts that are already kept elsewhere, such as cache statistics
+    """
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        type_name: str = "gauge"
+    ) -> None:
+        self.callback = callback
+        self.type_name = type_name
+        super().__init__(name, documentation, labelnames)
+
+    def labels(self, *values) -> object:
+        raise TypeError(f"{self.name} is read from its callback and has no children to update")
+
+    def _new_child(self):
+        raise TypeError(f"{self.name} is read from its callback and has no children to update")
+
+    def samples(self):
+        for key, value in self.callback().items():
+            yield "", self.labelnames, key, value
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # A failing callback must not take the other metrics down with it
+            lines.append(f"# {metric.name} unavailable: {_escape(str(e))}")
+    return "\n".join(lines) + "\n"
+
+# Ingestion
+IMAP_COMMAND_SECONDS = Histogram("imap_command_seconds", "Latency of IMAP commands.", ["command"])
+IMAP_BYTES_FETCHED = Counter("imap_bytes_fetched_total", "Bytes received from IMAP servers.")
+EMAIL_PARSE_SECONDS = Histogram("email_parse_seconds", "Time to decode and split one email.")
+EMAIL_SPLIT_SECONDS = Histogram("email_split_seconds", "Time the content splitter takes for one email.")
+BATCH_WRITE_SECONDS = Histogram("batch_write_seconds", "Latency of storage backend batch writes.", ["backend"])
+BATCH_OBJECTS = Counter("batch_objects_total", "Objects written by batch writers.", ["backend", "result"])
+VECTORIZE_SECONDS = Histogram("vectorize_seconds", "Latency of inference container requests.")
+VECTORIZATION_ERRORS = Counter("vectorization_errors_total", "Failed client-side vectorizations.", ["kind"])
+
+# Serving
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Latency of API requests by route, until the response starts.", ["method", "route", "status"]
+)
+
+def _cache_stats() -> Dict[str, dict]:
+    # Imported here, as the caches' modules import this one
+    from ..services.cache import get_search_cache
+    from ..services.inference.query_cache import get_query_vector_cache
+    # The query vector cache's hits and misses are those of its in-memory layer
+    return {"search": get_search_cache().stats(), "query_vectors": get_query_vector_cache().stats()["memory"]}
+
+def _cache_metric(key: str) -> Dict[Tuple[str, ...], float]:
+    return {(cache,): stats[key] for cache, stats in _cache_stats().items()}
+
+CACHE_HITS = CallbackMetric(
+    "cache_hits_total", "Cache lookups answered from the cache.", ["cache"], lambda: _cache_metric("hits"), "counter"
+)
+CACHE_MISSES = CallbackMetric(
+    "cache_misses_total", "Cache lookups not found in the cache.", ["cache"], lambda: _cache_metric("misses"), "counter"
+)
+CACHE_ENTRIES = CallbackMetric(
+    "cache_entries", "Entries held in memory by each cache.", ["cache"], lambda: _cache_metric("size")
+)
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Hashable
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+class TTLCache:
+    """
+    TTLCache is a thread-safe in-process LRU cache whose entries also expire after
+    a fixed time to live. It keeps hit/miss counters for the admin stats endpoint.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and caching it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                # JSON has no infinity, so entries that never expire report no TTL
+                "ttl_seconds": self.ttl_seconds if self.ttl_seconds != float("inf") else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class IngestGeneration:
+    """Counter bumped whenever new objects land in the index, used to invalidate cached results"""
+    _value = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> int:
+        return cls._value
+
+    @classmethod
+    def bump(cls) -> int:
+        with cls._lock:
+            cls._value += 1
+            value = cls._value
+        get_search_cache().clear()
+        return value
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize keyword query text so trivially different spellings share cache entries.
+    Case is folded, as the keyword index does; vector queries keep it (see
+    inference.client.normalize_text), as the model ranks by case.
+    """
+    return " ".join(query.lower().split())
+
+@lru_cache()
+def get_search_cache() -> TTLCache:
+    return TTLCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL_SECONDS)
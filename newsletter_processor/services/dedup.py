@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_URL_RE = re.compile(r'https?://\S+|www\.\S+')
+_NON_WORD_RE = re.compile(r'[^\w]+')
+
+def normalize_text(text: str) -> str:
+    """Lowercase words without links or punctuation, so tracking links and forwarding noise do not count"""
+    return " ".join(_NON_WORD_RE.sub(" ", _URL_RE.sub(" ", text.lower())).split())
+
+def shingles(text: str, size: int = 5) -> set[int]:
+    """32-bit hashes of the overlapping word n-grams of normalized text"""
+    words = text.split()
+    if len(words) <= size:
+        return {zlib.crc32(text.encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+def record_text(record: dict) -> str:
+    if record.get('sections'):
+        return "\n\n".join(record['sections'])
+    return record.get('body') or ""
+
+class DuplicateIndex:
+    """
+    DuplicateIndex finds newsletters whose content was already indexed under another
+    Message-ID: re-sends, forwarded copies and the same digest arriving from two lists.
+    Exact copies are matched by the SHA-256 of their normalized text, near-duplicates
+    by MinHash signatures of word shingles. Signatures are split into LSH bands, so a
+    lookup only compares against records that share a band, and every record is added
+    as it is checked, keeping the index incremental across runs.
+    """
+    def __init__(
+        self,
+        path: str,
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = 0.85,
+        seed: int = 1
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        # Fixed permutations, so signatures stay comparable across runs
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints(content_hash);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (bucket INTEGER NOT NULL, id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets(bucket);
+        """)
+
+    def signature(self, hashes: set[int]) -> np.ndarray:
+        """MinHash signature over num_perm universal hash permutations"""
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        # Blocks bound the (shingles x permutations) matrix on long newsletters
+        for start in range(0, len(values), 2048):
+            block = values[start:start + 2048, None]
+            permuted = ((block * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+            signature = np.minimum(signature, permuted.min(axis=0))
+        return signature.astype(np.uint32)
+
+    def _buckets(self, signature: np.ndarray) -> list[int]:
+        """One LSH bucket per band, keyed by band number and the band's rows"""
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(band.to_bytes(2, 'little') + rows, digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, 'little', signed=True))
+        return buckets
+
+    def _find(self, record_id: str, content_hash: str, signature: np.ndarray, buckets: list[int]) -> Optional[tuple[str, float]]:
+        row = self._conn.execute(
+            "SELECT id FROM fingerprints WHERE content_hash = ? AND id != ? LIMIT 1", (content_hash, record_id)
+        ).fetchone()
+        if row:
+            return row[0], 1.0
+
+        candidates = self._conn.execute(
+            f"""
+            SELECT DISTINCT f.id, f.signature FROM lsh_buckets b JOIN fingerprints f ON f.id = b.id
+            WHERE b.bucket IN ({','.join('?' * len(buckets))}) AND b.id != ?
+            """,
+            (*buckets, record_id)
+        ).fetchall()
+        best = None
+        for candidate_id, blob in candidates:
+            # The share of equal MinHash values estimates the Jaccard similarity
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate_id, similarity)
+        return best
+
+    def _add(self, record_id: str, content_hash: str, signature: np.ndarray, buckets: list[int]) -> None:
+        self._conn.execute("DELETE FROM lsh_buckets WHERE id = ?", (record_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fingerprints (id, content_hash, signature) VALUES (?, ?, ?)",
+            (record_id, content_hash, signature.tobytes())
+        )
+        self._conn.executemany(
+            "INSERT INTO lsh_buckets (bucket, id) VALUES (?, ?)", [(bucket, record_id) for bucket in buckets]
+        )
+
+    def find_duplicates(self, records: Iterable[dict]) -> dict[str, tuple[str, float]]:
+        """
+        Check records against the index and each other, adding the originals.
+        Returns the duplicates as id -> (id of the original, estimated similarity).
+        """
+        duplicates = {}
+        with self._lock, self._conn:
+            for record in records:
+                record_id = record.get('id')
+                text = normalize_text(record_text(record))
+                if not record_id or not text:
+                    continue
+                content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                signature = self.signature(shingles(text))
+                buckets = self._buckets(signature)
+                match = self._find(record_id, content_hash, signature, buckets)
+                if match:
+                    duplicates[record_id] = match
+                else:
+                    self._add(record_id, content_hash, signature, buckets)
+        return duplicates
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+def drop_duplicates(records: list[dict], store) -> list[dict]:
+    """Link duplicates to their originals in the record store and return the records left to load"""
+    if not settings.DEDUP_ENABLED or not records:
+        return records
+    duplicates = get_duplicate_index().find_duplicates(records)
+    if not duplicates:
+        return records
+    for record_id, (original_id, similarity) in duplicates.items():
+        logger.info(f"Skipping duplicate {record_id} of {original_id} (similarity {similarity:.2f})")
+    store.mark_duplicates({record_id: original_id for record_id, (original_id, _) in duplicates.items()})
+    return [record for record in records if record.get('id') not in duplicates]
+
+def iter_unique(records: Iterable[dict], store, batch_size: int = 200) -> Iterator[dict]:
+    """Stream records with duplicates dropped, checking them a batch at a time"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from drop_duplicates(batch, store)
+            batch = []
+    if batch:
+        yield from drop_duplicates(batch, store)
+
+@lru_cache()
+def get_duplicate_index() -> DuplicateIndex:
+    return DuplicateIndex(
+        settings.DEDUP_INDEX_FILE,
+        num_perm=settings.DEDUP_NUM_PERM,
+        bands=settings.DEDUP_BANDS,
+        threshold=settings.DEDUP_THRESHOLD
+    )
@@ -0,0 +1,136 @@
+import base64
+import codecs
+import quopri
+import re
+from typing import Optional
+
+_UID_RE = re.compile(rb'UID (\d+)')
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_LITERAL_RE = re.compile(rb'\{(\d+)\}\r\n')
+
+def _parse_sexp(data: bytes, pos: int):
+    """Parse one IMAP value (list, string, literal or atom) starting at pos"""
+    while pos < len(data) and data[pos:pos + 1] in (b' ', b'\r', b'\n'):
+        pos += 1
+    char = data[pos:pos + 1]
+    if char == b'(':
+        values = []
+        pos += 1
+        while True:
+            while data[pos:pos + 1] == b' ':
+                pos += 1
+            if data[pos:pos + 1] == b')':
+                return values, pos + 1
+            if pos >= len(data):
+                raise ValueError("Unterminated list in BODYSTRUCTURE")
+            value, pos = _parse_sexp(data, pos)
+            values.append(value)
+    if char == b'"':
+        chunks = []
+        pos += 1
+        while pos < len(data):
+            current = data[pos:pos + 1]
+            if current == b'\\':
+                chunks.append(data[pos + 1:pos + 2])
+                pos += 2
+            elif current == b'"':
+                return b''.join(chunks).decode('utf-8', errors='replace'), pos + 1
+            else:
+                chunks.append(current)
+                pos += 1
+        raise ValueError("Unterminated string in BODYSTRUCTURE")
+    if char == b'{':
+        match = _LITERAL_RE.match(data, pos)
+        if not match:
+            raise ValueError("Malformed literal in BODYSTRUCTURE")
+        start = match.end()
+        end = start + int(match.group(1))
+        return data[start:end].decode('utf-8', errors='replace'), end
+    end = pos
+    while end < len(data) and data[end:end + 1] not in (b' ', b'(', b')'):
+        end += 1
+    atom = data[pos:end].decode('ascii', errors='replace')
+    return (None if atom.upper() == 'NIL' else atom), end
+
+def parse_bodystructure_response(response) -> dict[bytes, list]:
+    """Parse a multi-message "UID FETCH (UID BODYSTRUCTURE)" response into structures by UID"""
+    # Re-assemble each message line, putting literals back in place
+    lines = []
+    for part in response or []:
+        if part is None:
+            continue
+        if isinstance(part, tuple):
+            chunk = part[0] + b'\r\n' + part[1]
+            prefix = part[0]
+        else:
+            chunk = prefix = part
+        if _FETCH_START_RE.match(prefix) or not lines:
+            lines.append(chunk)
+        else:
+            lines[-1] += chunk
+
+    structures = {}
+    for line in lines:
+        marker = line.find(b'BODYSTRUCTURE ')
+        if marker < 0:
+            continue
+        structure, end = _parse_sexp(line, marker + len(b'BODYSTRUCTURE '))
+        uid_match = _UID_RE.search(line[:marker]) or _UID_RE.search(line[end:])
+        if uid_match:
+            structures[uid_match.group(1)] = structure
+    return structures
+
+def _params(value) -> dict:
+    if not isinstance(value, list):
+        return {}
+    return {str(k).lower(): v for k, v in zip(value[::2], value[1::2])}
+
+def find_text_part(structure, section: str = "") -> Optional[dict]:
+    """
+    Find the first text/plain part of a BODYSTRUCTURE, in the same depth-first
+    order as email.message.Message.walk. Returns its section number, transfer
+    encoding and charset, or None if the message has no text/plain part.
+    """
+    if not isinstance(structure, list) or not structure:
+        return None
+
+    if isinstance(structure[0], list):
+        # Multipart: child parts come first, followed by the subtype and extensions
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            child_section = f"{section}.{index}" if section else str(index)
+            found = find_text_part(child, child_section)
+            if found:
+                return found
+        return None
+
+    content_type = f"{structure[0]}/{structure[1]}".lower()
+    part_section = section or "1"
+    if content_type == 'text/plain':
+        return {
+            "section": part_section,
+            "encoding": (structure[5] or '7bit').lower() if len(structure) > 5 else '7bit',
+            "charset": _params(structure[2]).get('charset') or 'utf-8'
+        }
+    if content_type == 'message/rfc822' and len(structure) > 8:
+        # The encapsulated body is numbered below the message part itself
+        nested = structure[8]
+        if isinstance(nested, list) and nested and not isinstance(nested[0], list):
+            return find_text_part(nested, f"{part_section}.1")
+        return find_text_part(nested, part_section)
+    return None
+
+def decode_part(data: bytes, encoding: str, charset: str) -> str:
+    """Undo the transfer encoding of a fetched body part and decode it to text"""
+    if encoding == 'base64':
+        data = base64.b64decode(data)
+    elif encoding == 'quoted-printable':
+        data = quopri.decodestring(data)
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = 'utf-8'
+    return data.decode(charset, errors='replace')
@@ -1,33 +1,66 @@
+import re
+
+# Common patterns that might indicate a section header
+SECTION_PATTERNS = [
+    r'\n\s*[A-Z][A-Za-z\s&]+:',  # Capitalized words followed by colon
+    r'\n\s*[A-Z][A-Za-z\s&]+\n',  # Capitalized words followed by newline
+    r'\n\s*\d+\.\s+[A-Z]',  # Numbered sections
+    r'\n\s*[•★✦]\s+[A-Z]',  # Bullet points followed by capital letter
+]
+
+# All of SECTION_PATTERNS as one pattern, giving the same boundaries in a single
+# finditer pass. Running the patterns separately lets each one skip the newlines
+# inside its own previous match, so a match here consumes only text in which no
+# later newline can start a boundary:
+# - the whitespace after the newline, where every pattern would match again;
+# - a capitalized header through its colon, or through the last newline of its
+#   run, except that a numbered or bulleted line right after the run still starts
+#   a boundary, so then the match stops before the run's trailing whitespace.
+# (?=(...))\1 makes the run atomic, so a failed check does not backtrack into it.
+SECTION_BOUNDARY = re.compile(r"""
+    \n\s*
+    (?:
+        [A-Z][A-Za-z\s&]+:
+      | [A-Z](?=([A-Za-z\s&]+\n))
+        (?:
+            (?=\1[^\S\n]*(?:\d+\.\s+[A-Z]|[•★✦]\s+[A-Z]))
+            (?:[A-Za-z\s&]*[A-Za-z&])?[^\S\n]*(?=\n)
+          | \1
+        )
+      | (?=\d+\.\s+[A-Z]|[•★✦]\s+[A-Z])
+    )
+""", re.VERBOSE)
+
+LINK_PATTERN = re.compile(r'https?://[^\s\]\)>"]+')
+LINK_REFERENCE_PATTERN = re.compile(r'\[?https?://[^\s\]]+\]?')
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([.,;:])')
+
 class ContentSplitter:
     """
     ContentSplitter is a class to parse the body of newsletter emails.
     It splits the content into sections based on common newsletter section patterns.
     """ 
     def __init__(self) -> None:
-        # Common patterns that might indicate a section header
-        self.section_patterns = [
-            r'\n\s*[A-Z][A-Za-z\s&]+:',  # Capitalized words followed by colon
-            r'\n\s*[A-Z][A-Za-z\s&]+\n',  # Capitalized words followed by newline
-            r'\n\s*\d+\.\s+[A-Z]',  # Numbered sections
-            r'\n\s*[•★✦]\s+[A-Z]',  # Bullet points followed by capital letter
-        ]
+        self.section_patterns = list(SECTION_PATTERNS)
         
     def find_section_boundaries(self, body: str) -> list[int]:
         """Find all potential section boundaries in the text"""
-        import re
-        boundaries = set()
-        
-        # Add start of text
-        boundaries.add(0)
-        
-        # Find all potential section headers
+        if self.section_patterns != SECTION_PATTERNS:
+            return self._find_section_boundaries_per_pattern(body)
+
+        # Matches come out in order and never overlap, so no set or sort is needed
+        boundaries = [match.start() for match in SECTION_BOUNDARY.finditer(body)]
+        if not boundaries or boundaries[0] != 0:
+            # Add start of text
+            boundaries.insert(0, 0)
+        return boundaries
+
+    def _find_section_boundaries_per_pattern(self, body: str) -> list[int]:
+        """Boundaries for customized section_patterns, one pass per pattern"""
+        boundaries = {0}
         for pattern in self.section_patterns:
-            matches = re.finditer(pattern, body)
-            for match in matches:
-                boundaries.add(match.start())
-        
-        # Convert to sorted list
-        return sorted(list(boundaries))
+            boundaries.update(match.start() for match in re.finditer(pattern, body))
+        return sorted(boundaries)
 
     def parse(self, body: str) -> list[str]:
         """Parse the newsletter body into sections"""
@@ -52,3 +85,26 @@ class ContentSplitter:
         
         return sections
 
+    def parse_section(self, section: str) -> dict:
+        """Split a section into its title, description and links"""
+        links = []
+        for link in LINK_PATTERN.findall(section):
+            link = link.rstrip('.,;')
+            if link not in links:
+                links.append(link)
+
+        lines = [line.strip() for line in section.strip().splitlines() if line.strip()]
+        if not lines:
+            return {"title": "", "description": "", "links": links}
+
+        # Link references like "[https://...]" and bare URLs are kept out of the text
+        lines = [LINK_REFERENCE_PATTERN.sub('', line) for line in lines]
+        lines = [SPACE_BEFORE_PUNCTUATION.sub(r'\1', line).strip() for line in lines]
+        lines = [line for line in lines if line]
+        title = lines[0].rstrip(':').strip() if lines else ""
+        description = " ".join(lines[1:])
+        return {"title": title, "description": description, "links": links}
+
+    def parse_sections(self, body: str) -> list[dict]:
+        """Parse the newsletter body into sections split into title, description and links"""
+        return [self.parse_section(section) for section in self.parse(body)]
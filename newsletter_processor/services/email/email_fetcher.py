@@ -1,20 +1,79 @@
 import imaplib
-import email
 import os
-import json
+import re
+import select
+import time
 from dotenv import load_dotenv
-from email.header import decode_header, make_header
 import logging
-from datetime import datetime
+from typing import Iterable, Iterator, Optional
+from .sync_state import get_sync_state
+from ..record_store import RecordStore
+from .bodystructure import parse_bodystructure_response, find_text_part
+from .message_parser import build_record, get_text_from_message, parse_headers, parse_message
+from ...core.metrics import IMAP_BYTES_FETCHED, IMAP_COMMAND_SECONDS
 logger = logging.getLogger(__name__)
 
+# Headers needed to build a record when only the text/plain part is fetched
+LEAN_HEADER_FIELDS = 'MESSAGE-ID SUBJECT FROM DATE'
+
+# Matches the name of a FETCH data item that is followed by a literal, e.g. "BODY[1] {123}"
+_FETCH_ITEM_RE = re.compile(rb'(BODY\[[^\]]*\](?:<\d+>)?|RFC822(?:\.\w+)?|BODYSTRUCTURE)\s*\{\d+\}$')
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_EXISTS_RE = re.compile(rb'^\* \d+ EXISTS')
+
+# How long the server gets to confirm the end of an IDLE
+IDLE_DONE_TIMEOUT_SECONDS = 30
+
+def _uid_set(uids) -> str:
+    """Compress UIDs into an IMAP sequence set, e.g. 1:5,8,10:12"""
+    numbers = sorted({int(uid) for uid in uids})
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ','.join(str(lo) if lo == hi else f"{lo}:{hi}" for lo, hi in ranges)
+
+def _parse_fetch_response(response) -> dict[bytes, dict[str, bytes]]:
+    """Group the literals of a multi-message FETCH response by UID"""
+    messages = []
+    current = None
+    for part in response or []:
+        if part is None:
+            continue
+        prefix = part[0] if isinstance(part, tuple) else part
+        if _FETCH_START_RE.match(prefix):
+            # Each message starts with "<seq> (", its UID may follow later
+            current = {"uid": None, "items": {}}
+            messages.append(current)
+        if current is None:
+            continue
+        uid_match = _FETCH_UID_RE.search(prefix)
+        if uid_match:
+            current["uid"] = uid_match.group(1)
+        if isinstance(part, tuple):
+            item_match = _FETCH_ITEM_RE.search(prefix)
+            if item_match:
+                current["items"][item_match.group(1).decode()] = part[1]
+    return {m["uid"]: m["items"] for m in messages if m["uid"] is not None}
+
 class EmailFetcher:
     """
     EmailFetcher is a class to fetch emails from a specified email address.
     It connects to the Gmail server using IMAP, searches for emails from a specific sender,
     and retrieves the email content.
     """
-    def __init__(self, email_address: str, password: str = None) -> None:
+    def __init__(
+        self,
+        email_address: str,
+        password: str = None,
+        sync_state_path: str = None,
+        fetch_chunk_size: int = 50,
+        lean_fetch: bool = True,
+        sync_prefix: str = ""
+    ) -> None:
         if not password:
             load_dotenv()
             self.password = password or os.getenv('EMAIL_PASSWORD')
@@ -22,12 +81,23 @@ class EmailFetcher:
             self.password = password
         self.email_address = email_address        
         self.mail = None
+        self.sync_state = get_sync_state(sync_state_path) if sync_state_path else None
+        # Prepended to labels in the sync state, keeping accounts with the same label apart
+        self.sync_prefix = sync_prefix
+        self._pending_checkpoint = None
+        self.fetch_chunk_size = max(1, fetch_chunk_size)
+        self.lean_fetch = lean_fetch
+        self.command_count = 0
+        self.bytes_fetched = 0
 
     def connect(self) -> None:
         try:
-            self.mail = imaplib.IMAP4_SSL('imap.gmail.com')
-            self.mail.login(self.email_address, self.password)
-            self.mail.select('inbox')
+            with IMAP_COMMAND_SECONDS.labels("CONNECT").time():
+                self.mail = imaplib.IMAP4_SSL('imap.gmail.com')
+            with IMAP_COMMAND_SECONDS.labels("LOGIN").time():
+                self.mail.login(self.email_address, self.password)
+            with IMAP_COMMAND_SECONDS.labels("SELECT").time():
+                self.mail.select('inbox')
         except imaplib.IMAP4.error as e:
             raise ConnectionError(f"Failed to connect to email server: {str(e)}")
     
@@ -35,71 +105,290 @@ class EmailFetcher:
         if self.mail:
             self.mail.logout()
 
-    def _get_text_from_email(self, msg) -> bytes:
-        for part in msg.walk():
-            if part.get_content_type() == 'text/plain':
-                return part.get_payload(decode=True)
-
-    def load_existing_emails(self, path: str) -> list[dict]:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                existing_emails = json.load(f)
-                logger.info(f"Loaded {len(existing_emails)} existing emails from {path}")
-                # Log some sample IDs for debugging
-                if existing_emails:
-                    # Normalize existing IDs
-                    for email in existing_emails:
-                        if 'id' in email:
-                            email['id'] = email['id'].strip('<>').strip()
-                    sample_ids = [email['id'] for email in existing_emails[:3]]
-                    logger.debug(f"Sample existing email IDs: {sample_ids}")
-                return existing_emails
-        return []
+    def supports_idle(self) -> bool:
+        return 'IDLE' in self.mail.capabilities
+
+    def select_label(self, label: str) -> None:
+        """Select a label read-only, e.g. to wait on it with idle()"""
+        with IMAP_COMMAND_SECONDS.labels("SELECT").time():
+            status, _ = self.mail.select(f'"{label}"', readonly=True)
+        if status != 'OK':
+            raise ValueError(f'Label "{label}" not found or inaccessible')
+
+    def idle(self, timeout: float) -> bool:
+        """
+        Wait in IMAP IDLE (RFC 2177) on the selected label until the server reports
+        new messages or timeout seconds pass, and return whether messages arrived.
+        imaplib has no IDLE before Python 3.14, so the exchange is done on the socket;
+        lines are read only once select() reports data, so waiting never times out a read.
+        """
+        tag = self.mail._new_tag()
+        self.mail.send(tag + b' IDLE\r\n')
+        self.command_count += 1
+        buffer = bytearray()
+        arrived = False
+        deadline = time.monotonic() + IDLE_DONE_TIMEOUT_SECONDS
+        while True:
+            line = self._read_idle_line(buffer, deadline)
+            if line is None:
+                raise ConnectionError("Server did not answer IDLE")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise ConnectionError(f"IDLE rejected: {line.decode(errors='replace').strip()}")
+            arrived = arrived or bool(_EXISTS_RE.match(line))
+
+        deadline = time.monotonic() + timeout
+        while not arrived:
+            line = self._read_idle_line(buffer, deadline)
+            if line is None:
+                break
+            arrived = bool(_EXISTS_RE.match(line))
+
+        self.mail.send(b'DONE\r\n')
+        deadline = time.monotonic() + IDLE_DONE_TIMEOUT_SECONDS
+        while True:
+            line = self._read_idle_line(buffer, deadline)
+            if line is None:
+                raise ConnectionError("Server did not end IDLE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().upper().startswith(b'OK'):
+                    raise ConnectionError(f"IDLE failed: {line.decode(errors='replace').strip()}")
+                return arrived
+            arrived = arrived or bool(_EXISTS_RE.match(line))
+
+    def _read_idle_line(self, buffer: bytearray, deadline: float) -> Optional[bytes]:
+        """The next line from the server, or None if none arrives before deadline"""
+        sock = self.mail.sock
+        while b'\n' not in buffer:
+            # TLS may hold decrypted bytes that select() cannot see
+            if not (hasattr(sock, 'pending') and sock.pending()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    return None
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionError("Email server closed the connection")
+            self.bytes_fetched += len(data)
+            IMAP_BYTES_FETCHED.inc(len(data))
+            buffer += data
+        end = buffer.index(b'\n') + 1
+        line = bytes(buffer[:end])
+        del buffer[:end]
+        return line
+
+    def _get_text_from_email(self, msg) -> Optional[str]:
+        return get_text_from_message(msg)
+
+    def _get_uidvalidity(self, label: str) -> Optional[int]:
+        """Read the UIDVALIDITY of the selected label"""
+        _, data = self.mail.response('UIDVALIDITY')
+        if not data or data[0] is None:
+            # Not announced on SELECT, ask for it explicitly
+            status, data = self.mail.status(f'"{label}"', '(UIDVALIDITY)')
+            if status != 'OK' or not data or data[0] is None:
+                return None
+            match = re.search(rb'UIDVALIDITY (\d+)', data[0])
+            return int(match.group(1)) if match else None
+        return int(data[-1])
+
+    def _search_uids(self, label: str, uidvalidity: Optional[int]) -> tuple[list[bytes], int]:
+        """Search the UIDs to sync, returning them with the last UID already processed"""
+        checkpoint = self.sync_state.get(self.sync_prefix + label) if self.sync_state else None
+        if checkpoint and uidvalidity is not None and checkpoint['uidvalidity'] == uidvalidity:
+            last_uid = checkpoint['last_uid']
+            status, response = self._uid('SEARCH', None, f'UID {last_uid + 1}:*')
+            if status != 'OK':
+                raise ValueError(f'UID search failed for label "{label}"')
+            # "n:*" always matches the highest UID, even when it is below n
+            uids = [uid for uid in response[0].split() if int(uid) > last_uid]
+            logger.info(f"Incremental sync of label '{label}' from UID {last_uid + 1}")
+            return uids, last_uid
+
+        if checkpoint:
+            logger.warning(
+                f"UIDVALIDITY of label '{label}' changed from {checkpoint['uidvalidity']} "
+                f"to {uidvalidity}, running a full resync"
+            )
+        status, response = self._uid('SEARCH', None, 'ALL')
+        if status != 'OK':
+            raise ValueError(f'UID search failed for label "{label}"')
+        return response[0].split(), 0
+
+    def commit_sync_state(self, failed_uids: Iterable[str] = ()) -> None:
+        """
+        Persist the checkpoint of the last fetch once its emails have been saved.
+        The checkpoint only moves up to the highest UID below the first message that
+        was not stored but could be on a retry: one the server did not return, or one
+        in failed_uids (fetched, but not stored by the caller). Those are searched and
+        fetched again by the next sync instead of being skipped for good.
+        """
+        if not self.sync_state or not self._pending_checkpoint:
+            return
+        label, uidvalidity, last_uid, searched_uids, unstored_uids = self._pending_checkpoint
+        unstored_uids = unstored_uids | {int(uid) for uid in failed_uids}
+        checkpoint = last_uid
+        for uid in searched_uids:
+            if uid in unstored_uids:
+                break
+            checkpoint = uid
+        if unstored_uids:
+            logger.warning(
+                f"{len(unstored_uids)} messages of label '{label}' were not stored "
+                f"(UIDs {_uid_set(unstored_uids)}), keeping the checkpoint at UID {checkpoint} to retry them"
+            )
+        self.sync_state.update(label, uidvalidity, checkpoint)
+        self.sync_state.save()
+        self._pending_checkpoint = None
+
+    def _uid(self, command: str, *args):
+        """Run a UID command, counting round trips and bytes received"""
+        self.command_count += 1
+        with IMAP_COMMAND_SECONDS.labels(command).time():
+            status, response = self.mail.uid(command, *args)
+        received = 0
+        for part in response or []:
+            if isinstance(part, tuple):
+                received += len(part[0]) + len(part[1])
+            elif part:
+                received += len(part)
+        self.bytes_fetched += received
+        IMAP_BYTES_FETCHED.inc(received)
+        return status, response
+
+    def _parse_message_id(self, message_id_header: str):
+        try:
+            # Handle both Message-ID and Message-Id formats
+            if 'Message-ID:' in message_id_header:
+                message_id = message_id_header.split('Message-ID:', 1)[1].strip()
+            elif 'Message-Id:' in message_id_header:
+                message_id = message_id_header.split('Message-Id:', 1)[1].strip()
+            else:
+                logger.warning(f"No Message-ID found in header: {message_id_header}")
+                return None
+
+            # Clean the ID by removing angle brackets and whitespace
+            return message_id.strip('<>').strip()
+        except Exception as e:
+            logger.warning(f"Error parsing Message-ID from header: {message_id_header}. Error: {str(e)}")
+            return None
 
     def get_message_ids(self, mail, email_ids):
+        """Fetch the Message-ID of every UID with a single FETCH command"""
+        return self._fetch_message_ids(email_ids)[0]
+
+    def _fetch_message_ids(self, email_ids) -> tuple[dict, set]:
+        """The Message-ID of every UID, and the UIDs the server returned without one"""
         message_ids = {}
-        for email_id in email_ids:
-            _, response = mail.fetch(email_id, '(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
-            message_id_header = response[0][1].decode()
-            try:
-                # Handle both Message-ID and Message-Id formats
-                if 'Message-ID:' in message_id_header:
-                    message_id = message_id_header.split('Message-ID:', 1)[1].strip()
-                elif 'Message-Id:' in message_id_header:
-                    message_id = message_id_header.split('Message-Id:', 1)[1].strip()
-                else:
-                    logger.warning(f"No Message-ID found in header: {message_id_header}")
-                    continue
-                
-                # Clean the ID by removing angle brackets and whitespace
-                message_ids[email_id] = message_id.strip('<>').strip()
-                logger.debug(f"Successfully parsed Message-ID: {message_ids[email_id]}")
-            except Exception as e:
-                logger.warning(f"Error parsing Message-ID from header: {message_id_header}. Error: {str(e)}")
+        without_id = set()
+        if not email_ids:
+            return message_ids, without_id
+        _, response = self._uid('FETCH', _uid_set(email_ids), '(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
+        for uid, items in _parse_fetch_response(response).items():
+            header = next(iter(items.values()), b'')
+            message_id = self._parse_message_id(header.decode(errors='replace'))
+            if message_id:
+                message_ids[uid] = message_id
+                logger.debug(f"Successfully parsed Message-ID: {message_id}")
+            else:
+                without_id.add(uid)
+        return message_ids, without_id
+
+    def _parse_headers(self, msg) -> dict:
+        """Build an email record from the headers of a message"""
+        return parse_headers(msg)
+
+    def _parse_message(self, raw_message: bytes) -> dict:
+        """Build an email record from a raw RFC822 message"""
+        return parse_message(raw_message)
+
+    def _fetch_full_messages(self, uids: list[bytes]) -> dict[bytes, dict]:
+        """Fetch complete RFC822 messages"""
+        _, msg_data = self._uid('FETCH', _uid_set(uids), '(UID RFC822)')
+        raws = {}
+        for uid, items in _parse_fetch_response(msg_data).items():
+            if 'RFC822' in items:
+                raws[uid] = {'rfc822': items['RFC822']}
+        return raws
+
+    def _fetch_lean_messages(self, uids: list[bytes], structures: dict[bytes, list]) -> dict[bytes, dict]:
+        """Fetch only the headers and the text/plain part of each message"""
+        raws = {}
+        fallback = []
+        # A FETCH asks for the same items for every UID, so group UIDs by text/plain section
+        by_section = {}
+        for uid in uids:
+            if uid not in structures:
+                fallback.append(uid)
                 continue
-        return message_ids
+            part = find_text_part(structures[uid])
+            by_section.setdefault(part['section'] if part else None, []).append((uid, part))
+
+        for section, members in by_section.items():
+            items = f'BODY.PEEK[HEADER.FIELDS ({LEAN_HEADER_FIELDS})]'
+            if section:
+                items += f' BODY.PEEK[{section}]'
+            _, msg_data = self._uid('FETCH', _uid_set([uid for uid, _ in members]), f'(UID {items})')
+            messages = _parse_fetch_response(msg_data)
+
+            for uid, part in members:
+                fetched = messages.get(uid, {})
+                header = next((v for k, v in fetched.items() if k.upper().startswith('BODY[HEADER')), None)
+                if header is None:
+                    fallback.append(uid)
+                    continue
+                raw = {'header': header, 'body': None}
+                if section:
+                    raw.update(body=fetched.get(f'BODY[{section}]'), encoding=part['encoding'], charset=part['charset'])
+                raws[uid] = raw
+
+        if fallback:
+            logger.debug(f"Falling back to full RFC822 fetch for {len(fallback)} messages")
+            raws.update(self._fetch_full_messages(fallback))
+        return raws
+
+    def fetch_emails(self, label: str, record_store: RecordStore) -> list[dict]:
+        """Fetch emails from specified label that are not in the record store yet"""
+        return list(self.iter_new_emails(label, record_store))
 
-    def fetch_emails(self, label: str, processed_email_output_path: str) -> list[dict]:
-        """Fetch emails from specified label"""
+    def iter_new_emails(self, label: str, record_store: RecordStore) -> Iterator[dict]:
+        """Yield emails from specified label that are not in the record store yet, one chunk at a time"""
+        for raw in self.iter_raw_emails(label, record_store):
+            yield build_record(raw)
+
+    def iter_raw_emails(self, label: str, record_store: RecordStore) -> Iterator[dict]:
+        """
+        Yield the undecoded emails from specified label that are not in the record store
+        yet, one chunk at a time. message_parser.build_record turns them into records,
+        so MIME decoding can run elsewhere than the thread talking to the server.
+        """
         try:
+            self.command_count = 0
+            self.bytes_fetched = 0
             # Gmail labels need to be accessed with their full path including parent labels
-            status, response = self.mail.select(f'"{label}"')
+            with IMAP_COMMAND_SECONDS.labels("SELECT").time():
+                status, response = self.mail.select(f'"{label}"')
+            self.command_count += 1
             if status != 'OK':
                 logger.error(f'Failed to select label "{label}". Please ensure the label exists and is accessible.')
                 raise ValueError(f'Label "{label}" not found or inaccessible')
             
-            # Search for all emails in the label
-            status, response = self.mail.search(None, 'ALL')
-            email_binary_ids = response[0].split()
-            email_ids = self.get_message_ids(self.mail, email_binary_ids)
-            email_list = []
-
-            existing_emails = self.load_existing_emails(processed_email_output_path)
-            existing_ids = {email['id'] for email in existing_emails}
-            
-            if existing_ids:
-                sample_existing = list(existing_ids)[:3]
-                logger.info(f"Sample existing IDs: {sample_existing}")
+            # Only search UIDs above the checkpoint unless the label needs a full resync
+            uidvalidity = self._get_uidvalidity(label)
+            email_binary_ids, last_uid = self._search_uids(label, uidvalidity)
+            email_ids, without_id = self._fetch_message_ids(email_binary_ids)
+            if without_id:
+                # Records are keyed by Message-ID, so these can never be stored
+                logger.warning(
+                    f"Skipping {len(without_id)} messages without a Message-ID in label '{label}' "
+                    f"(UIDs {_uid_set(without_id)})"
+                )
+            fetched_count = 0
+
+            existing_ids = record_store.existing_ids(email_ids.values())
             
             new_ids = [k for k, v in email_ids.items() if v not in existing_ids]
             logger.info(f"Found {len(new_ids)} new emails out of {len(email_ids)} total emails in label '{label}'")
@@ -108,60 +397,48 @@ class EmailFetcher:
                 sample_new = [email_ids[k] for k in new_ids[:3]]
                 logger.info(f"Sample new email IDs: {sample_new}")
 
-            for i, email_id in enumerate(new_ids):
-                email_data = {}
-                _, msg_data = self.mail.fetch(email_id, '(RFC822)')
-                msg = email.message_from_bytes(msg_data[0][1])
-                msg_id = msg['Message-ID']
-                if msg_id:
-                    msg_id = msg_id.strip('<>').strip()
-                
-                if msg_id in existing_ids:
-                    logger.debug(f"Skipping already processed email with ID: {msg_id}")
-                    continue
+            structures = {}
+            if self.lean_fetch and new_ids:
+                _, response = self._uid('FETCH', _uid_set(new_ids), '(UID BODYSTRUCTURE)')
+                structures = parse_bodystructure_response(response)
+
+            fetched_ids = []
+            for start in range(0, len(new_ids), self.fetch_chunk_size):
+                chunk = new_ids[start:start + self.fetch_chunk_size]
+                if self.lean_fetch:
+                    raws = self._fetch_lean_messages(chunk, structures)
+                else:
+                    raws = self._fetch_full_messages(chunk)
 
-                logger.debug(f"Processing new email {i+1}/{len(new_ids)} with ID: {msg_id}")
+                for i, email_id in enumerate(chunk, start=start):
+                    raw = raws.get(email_id)
+                    if raw is None:
+                        logger.warning(f"Server returned no message for UID {email_id.decode()}")
+                        continue
 
-                email_data['id'] = msg_id
-                email_data['subject'] = str(make_header(decode_header(msg['Subject'])))
-                email_data['from'] = msg['From']
-                date_str = msg['date'].replace(" (UTC)", "")  # Remove (UTC) if present
-                email_data['date'] = datetime.strptime(date_str, "%a, %d %b %Y %H:%M:%S %z").isoformat()
+                    raw['uid'] = email_id.decode()
+                    raw['id'] = email_ids[email_id]
+                    logger.debug(f"Processing new email {i+1}/{len(new_ids)} with ID: {raw['id']}")
+                    fetched_ids.append(email_id)
+                    fetched_count += 1
+                    yield raw
 
-                body = self._get_text_from_email(msg)
-                if body:
-                    email_data['body'] = body.decode()
+            # Mark all fetched emails as read with a single ranged STORE
+            if fetched_ids:
+                self._uid('STORE', _uid_set(fetched_ids), '+FLAGS.SILENT', '(\\Seen)')
 
-                # Mark the email as read by setting the Seen flag
-                self.mail.store(email_id, '+FLAGS', '\\Seen')
-                email_list.append(email_data)
+            if uidvalidity is not None:
+                # Searched UIDs that are neither stored already nor fetched now hold the checkpoint
+                # back, unless retrying cannot help: a message without a Message-ID is never stored
+                handled = set(fetched_ids) | without_id | {
+                    uid for uid, message_id in email_ids.items() if message_id in existing_ids
+                }
+                searched_uids = sorted(int(uid) for uid in email_binary_ids)
+                unstored_uids = {int(uid) for uid in email_binary_ids if uid not in handled}
+                self._pending_checkpoint = (self.sync_prefix + label, uidvalidity, last_uid, searched_uids, unstored_uids)
 
-            return email_list
+            logger.info(f"Fetched {fetched_count} emails from label '{label}' using {self.command_count} IMAP commands ({self.bytes_fetched} bytes)")
 
         except Exception as e:
             logger.error(f"Error fetching emails: {str(e)}")
             raise
-
-    def save_emails(self, emails: list[dict], path: str) -> None:
-        """Save emails to the output file, merging with existing emails"""
-        existing_emails = self.load_existing_emails(path)
-        
-        # Create a dictionary of existing emails by ID for faster lookup
-        existing_dict = {email['id']: email for email in existing_emails}
-        
-        # Update existing emails and add new ones
-        for email in emails:
-            if email['id'] in existing_dict:
-                existing_dict[email['id']].update(email)
-            else:
-                existing_dict[email['id']] = email
-        
-        # Convert back to list and sort by date
-        all_emails = list(existing_dict.values())
-        all_emails.sort(key=lambda x: x['date'], reverse=True)
-        
-        # Save to file
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w') as f:
-            json.dump(all_emails, f, indent=2)
-        logger.info(f"Saved {len(all_emails)} emails to {path}")
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+from .email_fetcher import EmailFetcher
+from .sources import EmailSource, get_email_sources
+from ..refresh import RefreshJobManager
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class IdleListener:
+    """
+    IdleListener is a class to keep an IMAP connection idling on a newsletter label
+    and start a refresh job as soon as the server reports new messages, so new mail is
+    searchable within seconds instead of at the next scheduled check. It runs in its
+    own thread, as IDLE blocks a connection for as long as it waits. Lost connections
+    are re-opened with exponential backoff, each followed by a catch-up refresh for
+    mail that arrived in between; while it is disconnected, or when the server does
+    not support IDLE, the scheduler's fallback poll keeps mail flowing.
+    """
+    def __init__(self, source: EmailSource) -> None:
+        self.source = source
+        self.label = source.label
+        self.connected = False
+        self.supported = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fetcher: Optional[EmailFetcher] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        """Start listening; refresh jobs are started on the calling event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._run, name="imap-idle", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        fetcher = self._fetcher
+        if fetcher is not None and fetcher.mail is not None:
+            try:
+                # Ends a wait in IDLE right away instead of at its timeout
+                fetcher.mail.shutdown()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _trigger(self, reason: str) -> None:
+        logger.info(f"IDLE listener: {reason}, starting refresh")
+        self._loop.call_soon_threadsafe(RefreshJobManager.submit, "idle", True)
+
+    def _run(self) -> None:
+        backoff = settings.IMAP_RECONNECT_MIN_SECONDS
+        while not self._stop.is_set():
+            try:
+                self._fetcher = EmailFetcher(self.source.address, self.source.password)
+                self._fetcher.connect()
+                if not self._fetcher.supports_idle():
+                    logger.warning("Email server does not support IDLE, relying on polling")
+                    self.supported = False
+                    return
+                self._fetcher.select_label(self.label)
+                self.connected = True
+                backoff = settings.IMAP_RECONNECT_MIN_SECONDS
+                logger.info(f"IDLE listener connected to label '{self.label}' of {self.source.address}")
+                self._trigger("connected")
+
+                while not self._stop.is_set():
+                    # Servers drop idling clients after 30 minutes (RFC 2177), so IDLE is renewed before
+                    if self._fetcher.idle(settings.IMAP_IDLE_TIMEOUT_SECONDS):
+                        self._trigger("new mail")
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.error(f"IDLE listener error, reconnecting in {backoff:.0f}s: {str(e)}")
+            finally:
+                self.connected = False
+                self._close()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, settings.IMAP_RECONNECT_MAX_SECONDS)
+
+    def _close(self) -> None:
+        if self._fetcher is not None:
+            try:
+                self._fetcher.disconnect()
+            except Exception:
+                pass
+            self._fetcher = None
+
+def start_idle_listeners() -> List[IdleListener]:
+    """Start an IDLE listener on every email source, or none when IMAP_IDLE_ENABLED is off"""
+    if not settings.IMAP_IDLE_ENABLED:
+        return []
+    listeners = [IdleListener(source) for source in get_email_sources()]
+    for listener in listeners:
+        listener.start()
+    return listeners
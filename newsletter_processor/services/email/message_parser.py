@@ -0,0 +1,117 @@
+import email
+import time
+from datetime import timezone
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from .bodystructure import decode_part
+from .content_splitter import ContentSplitter
+
+# Outcomes of parsing a raw email
+PROCESSED = "processed"
+NO_BODY = "no_body"
+NO_SECTIONS = "no_sections"
+SPLIT_ERROR = "split_error"
+INVALID = "invalid"
+
+# Splitter used by parse_raw_emails, created once per worker process
+_splitter: Optional[ContentSplitter] = None
+
+def parse_headers(msg) -> dict:
+    """Build an email record from the headers of a message"""
+    email_data = {}
+    msg_id = msg['Message-ID']
+    if msg_id:
+        msg_id = msg_id.strip('<>').strip()
+
+    email_data['id'] = msg_id
+    email_data['subject'] = str(make_header(decode_header(msg['Subject'])))
+    email_data['from'] = msg['From']
+    # Any RFC 5322 date: without a weekday, with a zone name ("GMT") or a trailing comment ("(PST)")
+    date = parsedate_to_datetime(msg['date'])
+    if date.tzinfo is None:
+        # "-0000" is a UTC time whose source zone is unknown
+        date = date.replace(tzinfo=timezone.utc)
+    email_data['date'] = date.isoformat()
+    return email_data
+
+def get_text_from_message(msg) -> Optional[str]:
+    for part in msg.walk():
+        if part.get_content_type() == 'text/plain':
+            # get_payload has already undone the transfer encoding
+            return decode_part(part.get_payload(decode=True), '8bit', part.get_content_charset() or 'utf-8')
+
+def parse_message(raw_message: bytes) -> dict:
+    """Build an email record from a raw RFC822 message"""
+    msg = email.message_from_bytes(raw_message)
+    email_data = parse_headers(msg)
+
+    body = get_text_from_message(msg)
+    if body:
+        email_data['body'] = body
+    return email_data
+
+def build_record(raw: dict) -> dict:
+    """
+    Build an email record from a raw email as fetched by EmailFetcher.iter_raw_emails:
+    either a complete message under 'rfc822', or the 'header' fields with the undecoded
+    text/plain 'body' and its transfer 'encoding' and 'charset'.
+    """
+    if 'rfc822' in raw:
+        return parse_message(raw['rfc822'])
+
+    email_data = parse_headers(email.message_from_bytes(raw['header']))
+    if raw.get('body'):
+        email_data['body'] = decode_part(raw['body'], raw['encoding'], raw['charset'])
+    return email_data
+
+def parse_raw_email(
+    raw: dict,
+    splitter: ContentSplitter,
+    timings: Optional[dict] = None
+) -> tuple[str, Optional[dict], Optional[str]]:
+    """
+    Decode a raw email and split its body into sections.
+    Returns the outcome, the record (None if the message could not be decoded)
+    and an error message for failed outcomes. Given a timings dict, the seconds
+    spent in the splitter are recorded in it under "split".
+    """
+    try:
+        email_data = build_record(raw)
+    except Exception as e:
+        return INVALID, None, str(e)
+
+    if not email_data.get('body'):
+        return NO_BODY, email_data, None
+    started = time.perf_counter()
+    try:
+        sections = splitter.parse(email_data['body'])
+    except Exception as e:
+        return SPLIT_ERROR, email_data, str(e)
+    finally:
+        if timings is not None:
+            timings["split"] = time.perf_counter() - started
+    if not sections:
+        return NO_SECTIONS, email_data, None
+    email_data['sections'] = sections
+    return PROCESSED, email_data, None
+
+def timed_parse_raw_email(raw: dict, splitter: ContentSplitter) -> tuple[tuple, dict]:
+    """parse_raw_email's result and the seconds it took, in total ("parse") and in the splitter ("split")"""
+    timings = {}
+    started = time.perf_counter()
+    result = parse_raw_email(raw, splitter, timings)
+    timings["parse"] = time.perf_counter() - started
+    return result, timings
+
+def parse_raw_emails(raws: list[dict]) -> list[tuple[tuple, dict]]:
+    """
+    Parse a chunk of raw emails with timed_parse_raw_email; the unit of work sent to
+    parser processes. Timings are returned rather than recorded, as metrics recorded
+    in a worker process would never reach /metrics.
+    """
+    global _splitter
+    if _splitter is None:
+        _splitter = ContentSplitter()
+    return [timed_parse_raw_email(raw, _splitter) for raw in raws]
@@ -1,9 +1,13 @@
-from typing import Optional
+from typing import Iterator, Optional
 import logging
 from datetime import datetime
 
 from .email_fetcher import EmailFetcher
+from .sources import EmailSource, get_email_sources
 from .content_splitter import ContentSplitter
+from ..executor import get_parse_pool, run_ingest
+from ..record_store import get_record_store
+from ..pipeline import IngestPipeline
 from ...core.config import get_settings
 
 settings = get_settings()
@@ -21,62 +25,71 @@ class NewsletterProcessor:
         self.output_file = output_file
         self.error_file = error_file
         self.check_interval = check_interval
-        self.fetcher = EmailFetcher(email_address)
+        self.sources = get_email_sources()
+        self.fetchers = [
+            EmailFetcher(
+                source.address,
+                source.password,
+                sync_state_path=settings.SYNC_STATE_FILE,
+                fetch_chunk_size=settings.EMAIL_FETCH_CHUNK_SIZE,
+                lean_fetch=settings.EMAIL_LEAN_FETCH,
+                sync_prefix=source.sync_prefix
+            )
+            for source in self.sources
+        ]
         self.splitter = ContentSplitter()
+        self.store = get_record_store()
+        # The running pipeline, whose counters report progress
+        self.pipeline: Optional[IngestPipeline] = None
 
     async def process_emails(self) -> int:
-        """Process new newsletter emails"""
+        """Process new newsletter emails without blocking the event loop"""
+        return await run_ingest(self._process_emails)
+
+    def _iter_source(self, source: EmailSource, fetcher: EmailFetcher) -> Iterator[dict]:
+        """Raw emails of one source over its own connection, opened in the thread reading it"""
+        fetcher.connect()
+        logger.info(f"Connected to email server as {source.address}")
         try:
-            self.fetcher.connect()
-            logger.info("Connected to email server")
-            
-            emails = self.fetcher.fetch_emails(settings.EMAIL_LABEL, self.output_file)
-            logger.info(f"Fetched {len(emails)} new emails")
-            
-            processed_count = 0
-            skipped_count = 0
-            error_count = 0
-            
-            for email in emails:
-                try:
-                    if not email.get('body'):
-                        logger.warning(f"Skipping email {email.get('id')} - No body content")
-                        skipped_count += 1
-                        continue
-                        
-                    try:
-                        sections = self.splitter.parse(email['body'])
-                        if not sections:
-                            logger.warning(f"Skipping email {email.get('id')} - No sections parsed")
-                            skipped_count += 1
-                            continue
-                            
-                        email['sections'] = sections
-                        processed_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error parsing sections for email {email.get('id')}: {str(e)}")
-                        error_count += 1
-                        continue
-                        
-                except Exception as e:
-                    logger.error(f"Error processing email {email.get('id')}: {str(e)}")
-                    error_count += 1
-                    continue
+            yield from fetcher.iter_raw_emails(source.label, self.store)
+        finally:
+            fetcher.disconnect()
+            logger.info(f"Disconnected from email server ({source.address}, label '{source.label}')")
+
+    def _process_emails(self) -> int:
+        """Stream new newsletter emails of every source through the fetch, parse and load stages"""
+        try:
+            pipeline = self.pipeline = IngestPipeline(
+                [self._iter_source(source, fetcher) for source, fetcher in zip(self.sources, self.fetchers)],
+                self.splitter,
+                self.store,
+                parse_pool=get_parse_pool(),
+                fetch_workers=settings.EMAIL_SYNC_CONCURRENCY
+            )
+            stats = pipeline.run()
+            logger.info(f"Fetched {stats['fetched']} new emails from {len(self.sources)} sources")
             
-            # Save processed emails to file
-            if len(emails) > 0:
-                self.fetcher.save_emails(emails, self.output_file)
+            if stats['fetched'] > 0:
                 logger.info(f"Email processing summary:")
-                logger.info(f"- Successfully processed: {processed_count}")
-                logger.info(f"- Skipped: {skipped_count}")
-                logger.info(f"- Errors: {error_count}")
+                logger.info(f"- Successfully processed: {stats['processed']}")
+                logger.info(f"- Skipped: {stats['skipped']}")
+                logger.info(f"- Errors: {stats['errors']}")
+                logger.info(f"- Duplicates skipped: {stats['duplicates']}")
+                logger.info(f"- Embedded: {stats['embedded']}")
+                logger.info(f"- Failed to load: {stats['load_errors']}")
             
-            return processed_count
+            # Only advance the UID checkpoints once the fetched emails are stored, and not past
+            # emails that could not be; a failed source has no checkpoint to commit, so it
+            # resumes from its last one next time
+            for index, fetcher in enumerate(self.fetchers):
+                fetcher.commit_sync_state(pipeline.failed_uids.get(index, ()))
+            for index, error in pipeline.source_errors.items():
+                logger.error(f"Syncing {self.sources[index]!r} failed: {str(error)}")
+            if pipeline.source_errors and len(pipeline.source_errors) == len(self.sources):
+                raise next(iter(pipeline.source_errors.values()))
+            
+            return stats['processed']
             
         except Exception as e:
             logger.error(f"Email processing failed: {str(e)}")
             raise
-        finally:
-            self.fetcher.disconnect()
-            logger.info("Disconnected from email server") 
\ No newline at end of file
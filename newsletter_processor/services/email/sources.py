@@ -0,0 +1,45 @@
+import os
+from typing import List, NamedTuple
+
+from ...core.config import get_settings
+
+settings = get_settings()
+
+class EmailSource(NamedTuple):
+    """A mailbox label to sync, with the account it belongs to"""
+    address: str
+    password: str
+    label: str
+
+    @property
+    def sync_prefix(self) -> str:
+        # The primary account keeps its checkpoints under the bare label, as before sources existed
+        return "" if self.address == settings.EMAIL_ADDRESS else f"{self.address}/"
+
+    def __repr__(self) -> str:
+        return f"EmailSource({self.address}, {self.label})"
+
+def get_email_sources() -> List[EmailSource]:
+    """
+    The labels to sync from EMAIL_SOURCES, one source per account and label, or the
+    single EMAIL_LABEL of EMAIL_ADDRESS when it is not set. Entries without an address
+    use EMAIL_ADDRESS and its password; passwords can be read from another variable
+    with password_env. Raises ValueError for an entry without a password.
+    """
+    if not settings.EMAIL_SOURCES:
+        return [EmailSource(settings.EMAIL_ADDRESS, settings.EMAIL_PASSWORD, settings.EMAIL_LABEL)]
+
+    sources = []
+    for entry in settings.EMAIL_SOURCES:
+        address = entry.get("address") or settings.EMAIL_ADDRESS
+        password = entry.get("password")
+        if not password and entry.get("password_env"):
+            password = os.getenv(entry["password_env"])
+        if not password and address == settings.EMAIL_ADDRESS:
+            password = settings.EMAIL_PASSWORD
+        if not password:
+            raise ValueError(f"No password configured for email source {address}")
+        labels = entry.get("labels") or [entry.get("label") or settings.EMAIL_LABEL]
+        sources.extend(EmailSource(address, password, label) for label in labels)
+    # The same label listed twice would be synced twice
+    return list(dict.fromkeys(sources))
@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class SyncState:
+    """
+    SyncState persists the IMAP sync checkpoint of each label.
+    For every label it stores the mailbox UIDVALIDITY and the highest UID that has
+    been processed, so the next sync only has to ask the server for newer messages.
+    Fetchers syncing in parallel share one instance (see get_sync_state), so one
+    label's save never drops another's checkpoint.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.labels = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load sync state from {self.path}, falling back to full sync: {e}")
+            return {}
+
+    def get(self, label: str) -> Optional[dict]:
+        """Return the checkpoint for a label, if one has been recorded"""
+        return self.labels.get(label)
+
+    def update(self, label: str, uidvalidity: int, last_uid: int) -> None:
+        """Record the checkpoint for a label in memory"""
+        with self._lock:
+            self.labels[label] = {
+                "uidvalidity": uidvalidity,
+                "last_uid": last_uid
+            }
+
+    def save(self) -> None:
+        """Write all checkpoints to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.labels, f, indent=2)
+            os.replace(tmp_path, self.path)
+        logger.debug(f"Saved sync state for {len(self.labels)} labels to {self.path}")
+
+@lru_cache()
+def get_sync_state(path: str) -> SyncState:
+    return SyncState(path)
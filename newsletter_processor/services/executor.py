@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class IngestExecutorManager:
+    """
+    Owns the thread pool that runs the blocking parts of ingestion (imaplib, file I/O
+    and Weaviate batch writes) so they never run on the event loop serving searches.
+    The pool size caps how many ingestion jobs can run at the same time.
+    """
+    _instance: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """Get or create the ingestion thread pool"""
+        if cls._instance is None:
+            cls._instance = ThreadPoolExecutor(
+                max_workers=settings.INGEST_MAX_WORKERS,
+                thread_name_prefix="ingest"
+            )
+            logger.info(f"Started ingestion executor with {settings.INGEST_MAX_WORKERS} workers")
+        return cls._instance
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Wait for running ingestion work and stop the pool"""
+        if cls._instance is not None:
+            cls._instance.shutdown(wait=True)
+            cls._instance = None
+
+class ParseProcessPoolManager:
+    """
+    Owns the process pool that decodes MIME messages and splits them into sections.
+    That work is pure CPU and holds the GIL, so large backfills only scale with cores
+    in separate processes. Workers are spawned rather than forked, because the
+    service process runs threads that a fork would copy mid-operation.
+    """
+    _instance: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def get_pool(cls) -> Optional[ProcessPoolExecutor]:
+        """Get or create the parser pool, or None when parsing runs in-process"""
+        if settings.PARSE_WORKERS <= 0:
+            return None
+        if cls._instance is None:
+            cls._instance = ProcessPoolExecutor(
+                max_workers=settings.PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started parser pool with {settings.PARSE_WORKERS} processes")
+        return cls._instance
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._instance is not None:
+            cls._instance.shutdown(wait=True)
+            cls._instance = None
+
+# Convenience functions
+def get_ingest_executor() -> ThreadPoolExecutor:
+    return IngestExecutorManager.get_executor()
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    return ParseProcessPoolManager.get_pool()
+
+async def run_ingest(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking ingestion call on the ingestion executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_ingest_executor(), functools.partial(func, *args, **kwargs))
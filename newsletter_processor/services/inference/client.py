@@ -0,0 +1,68 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Union
+
+import numpy as np
+import requests
+
+from .embedder import HashingEmbedder
+from ...core.config import get_settings
+from ...core.metrics import VECTORIZE_SECONDS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class InferenceClient:
+    """
+    InferenceClient calls the transformers inference container (the same service
+    Weaviate's text2vec-transformers module uses) to compute vectors client-side.
+    """
+    cache_vectors = True
+
+    def __init__(self, url: str, timeout: float, concurrency: int = 4) -> None:
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="inference")
+
+    def is_ready(self) -> bool:
+        """Whether the container has loaded its model and serves requests"""
+        try:
+            response = self.session.get(f"{self.url}/.well-known/ready", timeout=min(self.timeout, 5.0))
+            return response.ok
+        except requests.RequestException as e:
+            logger.error(f"Error checking inference readiness: {str(e)}")
+            return False
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Compute the vector of a single text"""
+        with VECTORIZE_SECONDS.time():
+            response = self.session.post(
+                f"{self.url}/vectors",
+                json={"text": text, "config": {"pooling_strategy": "masked_mean"}},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        return np.asarray(response.json()["vector"], dtype=np.float32)
+
+    def vectorize_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Compute the vectors of several texts with parallel requests, keeping their order"""
+        if len(texts) == 1:
+            return [self.vectorize(texts[0])]
+        return list(self._executor.map(self.vectorize, texts))
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace; case is kept because the model is case sensitive"""
+    return " ".join(text.split())
+
+@lru_cache()
+def get_inference_client() -> Union[InferenceClient, HashingEmbedder]:
+    """The configured embedder: the transformers container, or the offline hashing stand-in"""
+    if settings.EMBEDDER == "hashing":
+        return HashingEmbedder(settings.HASHING_EMBEDDER_DIM)
+    return InferenceClient(
+        settings.TRANSFORMERS_INFERENCE_URL,
+        settings.INFERENCE_TIMEOUT_SECONDS,
+        concurrency=settings.INFERENCE_CONCURRENCY
+    )
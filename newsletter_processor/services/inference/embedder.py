@@ -0,0 +1,46 @@
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'\w+')
+
+class HashingEmbedder:
+    """
+    HashingEmbedder is a deterministic stand-in for the transformers inference
+    container, for development, CI and offline use. Words and word pairs are hashed
+    into a fixed number of signed buckets and weighted by log term frequency, so texts
+    that share vocabulary get similar unit vectors. It has the same interface as
+    InferenceClient and needs no model or network.
+    """
+    # Vectors are cheaper to recompute than to look up, so they are not cached
+    cache_vectors = False
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def is_ready(self) -> bool:
+        return True
+
+    def _feature(self, token: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Compute the vector of a single text"""
+        words = _TOKEN_RE.findall(text.lower())
+        counts = {}
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            counts[token] = counts.get(token, 0) + 1
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token, count in counts.items():
+            index, sign = self._feature(token)
+            vector[index] += sign * (1.0 + np.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def vectorize_many(self, texts: List[str]) -> List[np.ndarray]:
+        return [self.vectorize(text) for text in texts]
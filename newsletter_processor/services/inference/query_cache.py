@@ -0,0 +1,118 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+from .client import get_inference_client, normalize_text
+from ..cache import TTLCache
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class QueryVectorCache:
+    """
+    QueryVectorCache stores query vectors keyed by normalized query text in SQLite,
+    fronted by an in-memory LRU. The on-disk table is bounded: when it grows past
+    max_size, the least recently used vectors are pruned. Vectors survive restarts,
+    so repeated and paginated queries never go back to the inference container.
+    """
+    def __init__(self, path: str, max_size: int) -> None:
+        self.path = path
+        self.max_size = max(1, max_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_vectors (
+                text TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_query_vectors_last_used ON query_vectors(last_used)")
+        self._memory = TTLCache(min(self.max_size, 1024), float("inf"))
+        self._inserts = 0
+
+    def _load(self, text: str):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT vector FROM query_vectors WHERE text = ?", (text,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE query_vectors SET last_used = ? WHERE text = ?", (time.time(), text))
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _store(self, text: str, vector: np.ndarray) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_vectors (text, vector, last_used) VALUES (?, ?, ?)",
+                (text, vector.astype(np.float32).tobytes(), time.time())
+            )
+            self._inserts += 1
+            # Pruning is amortised over inserts instead of running on every write
+            if self._inserts % 100 == 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM query_vectors WHERE text IN (
+                        SELECT text FROM query_vectors ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_size,)
+                )
+
+    def get_vector(self, query: str) -> np.ndarray:
+        """Return the vector for a query, computing it with the inference container on a miss"""
+        text = normalize_text(query)
+        client = get_inference_client()
+        if not client.cache_vectors:
+            return client.vectorize(text)
+        vector = self._memory.get(text)
+        if vector is not None:
+            return vector
+        vector = self._load(text)
+        if vector is None:
+            vector = client.vectorize(text)
+            self._store(text, vector)
+            logger.debug(f"Vectorized query '{text}'")
+        self._memory.set(text, vector)
+        return vector
+
+    def get_vectors(self, queries: List[str]) -> List[np.ndarray]:
+        """Return the vectors for several queries, computing all misses with concurrent requests"""
+        texts = [normalize_text(query) for query in queries]
+        client = get_inference_client()
+        if not client.cache_vectors:
+            return client.vectorize_many(texts)
+        vectors = {}
+        for text in dict.fromkeys(texts):
+            vector = self._memory.get(text)
+            if vector is None:
+                vector = self._load(text)
+            if vector is not None:
+                vectors[text] = vector
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if missing:
+            for text, vector in zip(missing, client.vectorize_many(missing)):
+                self._store(text, vector)
+                vectors[text] = vector
+            logger.debug(f"Vectorized {len(missing)} queries concurrently")
+        for text, vector in vectors.items():
+            self._memory.set(text, vector)
+        return [vectors[text] for text in texts]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM query_vectors").fetchone()[0]
+        return {"stored": stored, "max_size": self.max_size, "memory": self._memory.stats()}
+
+@lru_cache()
+def get_query_vector_cache() -> QueryVectorCache:
+    return QueryVectorCache(settings.QUERY_VECTOR_CACHE_FILE, settings.QUERY_VECTOR_CACHE_SIZE)
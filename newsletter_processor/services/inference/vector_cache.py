@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .client import get_inference_client
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class DocumentVectorCache:
+    """
+    DocumentVectorCache maps the SHA-256 of a document's vectorized text to its vector.
+    Vectors are appended as rows of a flat float32 file that is read through a memory
+    map, and an SQLite index maps each content hash to its row. Re-indexing a
+    collection then costs disk reads instead of another pass through the vectorizer.
+    """
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self._map: Optional[np.memmap] = None
+
+    def _rows_on_disk(self) -> int:
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _matrix(self, needed_row: int) -> np.memmap:
+        """Memory map of the vector file, remapped when rows were appended since the last map"""
+        if self._map is None or self._map.shape[0] <= needed_row:
+            self._map = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self._rows_on_disk(), self.dim))
+        return self._map
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            if not self.dim:
+                return found
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT hash, row FROM vectors WHERE hash IN ({placeholders})", chunk
+                ).fetchall()
+                if rows:
+                    matrix = self._matrix(max(row for _, row in rows))
+                    for key, row in rows:
+                        found[key] = np.array(matrix[row])
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        with self._lock, self._conn:
+            if self.dim is None:
+                self.dim = len(next(iter(vectors.values())))
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            existing = {
+                key for (key,) in self._conn.execute(
+                    f"SELECT hash FROM vectors WHERE hash IN ({','.join('?' * len(vectors))})", list(vectors)
+                )
+            }
+            new = [(key, vector) for key, vector in vectors.items() if key not in existing]
+            if not new:
+                return
+            row = self._rows_on_disk()
+            with open(self.vectors_path, 'ab') as f:
+                for _, vector in new:
+                    f.write(np.asarray(vector, dtype=np.float32).tobytes())
+            self._conn.executemany(
+                "INSERT INTO vectors (hash, row) VALUES (?, ?)",
+                [(key, row + offset) for offset, (key, _) in enumerate(new)]
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+# Vectorized properties of each class in name order, and those that are prefixed by their name
+VECTORIZED_PROPERTIES = {
+    "Newsletter": ("header", "newsletter", "text_content"),
+    "NewsletterSection": ("description", "title")
+}
+NAMED_PROPERTIES = {"text_content"}
+
+def document_text(properties: dict, class_name: str = "Newsletter") -> str:
+    """
+    Text a document is vectorized from, built the way the schema configures the
+    text2vec module: class name, then vectorized properties in name order, with
+    text_content prefixed by its property name.
+    """
+    parts = [class_name.lower()]
+    for name in VECTORIZED_PROPERTIES[class_name]:
+        value = properties.get(name)
+        if value:
+            parts.append(f"{name} {value}" if name in NAMED_PROPERTIES else value)
+    return " ".join(parts)
+
+def get_document_vectors(texts: List[str]) -> List[np.ndarray]:
+    """Vectors for a batch of document texts, only sending cache misses to the inference container"""
+    client = get_inference_client()
+    if not client.cache_vectors:
+        return client.vectorize_many(texts)
+    cache = get_document_vector_cache()
+    hashes = [content_hash(text) for text in texts]
+    cached = cache.get_many(hashes)
+    missing = {key: text for key, text in zip(hashes, texts) if key not in cached}
+    if missing:
+        vectors = client.vectorize_many(list(missing.values()))
+        computed = dict(zip(missing.keys(), vectors))
+        cache.put_many(computed)
+        cached.update(computed)
+    logger.debug(f"Document vectors: {len(texts) - len(missing)} cached, {len(missing)} computed")
+    return [cached[key] for key in hashes]
+
+@lru_cache()
+def get_document_vector_cache() -> DocumentVectorCache:
+    return DocumentVectorCache(settings.DOCUMENT_VECTOR_CACHE_DIR)
@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Iterable, List
+
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Newsletter properties kept in the index, so keyword results need no other store
+KEYWORD_FIELDS = ["newsletter", "sender", "header", "received_date", "text_content", "snippet", "email_id"]
+
+_WORD_RE = re.compile(r'\w')
+
+def match_expression(query: str) -> str:
+    """
+    FTS5 query for free text: each whitespace-separated term is a quoted phrase, so
+    punctuation is literal and "GPT-4o" matches the adjacent tokens gpt and 4o,
+    and terms are OR-ed, leaving it to BM25 to rank documents matching more of them.
+    """
+    terms = [term for term in query.split() if _WORD_RE.search(term)]
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+class KeywordIndex:
+    """
+    KeywordIndex is a BM25-ranked inverted index over newsletter headers and text,
+    kept in SQLite FTS5. Exact terms such as model names, paper titles and tickers
+    match as written, and queries never touch the inference container. Documents
+    are keyed by email id and added as they are loaded, so re-loading a record
+    replaces its entry.
+    """
+    def __init__(self, path: str, header_weight: float = 2.0) -> None:
+        self.path = path
+        self.header_weight = header_weight
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # The FTS table only holds the inverted index; documents keeps the text once
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                email_id TEXT NOT NULL UNIQUE,
+                newsletter TEXT,
+                sender TEXT,
+                header TEXT,
+                received_date TEXT,
+                text_content TEXT,
+                snippet TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                header, text_content, content='documents', content_rowid='id', tokenize='unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts (rowid, header, text_content) VALUES (new.id, new.header, new.text_content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, header, text_content)
+                VALUES ('delete', old.id, old.header, old.text_content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, header, text_content)
+                VALUES ('delete', old.id, old.header, old.text_content);
+                INSERT INTO documents_fts (rowid, header, text_content) VALUES (new.id, new.header, new.text_content);
+            END;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "snippet" not in columns:
+            # Indexes created before snippets; search falls back to the start of text_content
+            self._conn.execute("ALTER TABLE documents ADD COLUMN snippet TEXT")
+
+    def add(self, documents: Iterable[dict]) -> int:
+        """Index Newsletter properties (see loader.build_properties), replacing documents with the same email id"""
+        rows = [
+            tuple(document.get(field) for field in KEYWORD_FIELDS)
+            for document in documents if document.get("email_id")
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"""
+                INSERT INTO documents ({', '.join(KEYWORD_FIELDS)}) VALUES ({', '.join('?' * len(KEYWORD_FIELDS))})
+                ON CONFLICT(email_id) DO UPDATE SET newsletter = excluded.newsletter, sender = excluded.sender,
+                    header = excluded.header, received_date = excluded.received_date,
+                    text_content = excluded.text_content, snippet = excluded.snippet
+                """,
+                rows
+            )
+        return len(rows)
+
+    def search(self, query: str, fields: List[str], limit: int, offset: int = 0) -> List[dict]:
+        """The best BM25 matches for a query, with the requested fields, best first, skipping the first offset"""
+        expression = match_expression(query)
+        if not expression or limit <= 0:
+            return []
+        # Only the requested columns are read, so text_content stays on disk unless asked for
+        columns = [field for field in fields if field in KEYWORD_FIELDS]
+        selected = [
+            f"COALESCE(d.snippet, substr(d.text_content, 1, {int(settings.SNIPPET_LENGTH)}))"
+            if field == "snippet" else "d." + field
+            for field in columns
+        ]
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT {''.join(column + ', ' for column in selected)}bm25(documents_fts, ?, 1.0) AS score
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE documents_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?
+                """,
+                (self.header_weight, expression, limit, offset)
+            ).fetchall()
+        results = []
+        for row in rows:
+            document = dict(zip(columns, row))
+            item = {field: document.get(field) for field in fields}
+            # FTS5's bm25() is negated, so lower is better; scores are reported as positive
+            item["_additional"] = {"score": -row[-1]}
+            results.append(item)
+        return results
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def is_backfilled(self) -> bool:
+        """Whether the records loaded before this index existed have all been added"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone() is not None
+
+    def mark_backfilled(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', '1')")
+
+@lru_cache()
+def get_keyword_index() -> KeywordIndex:
+    return KeywordIndex(settings.KEYWORD_INDEX_FILE)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from .storage.backend import get_storage_backend
+from .inference.client import get_inference_client
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Classes whose object counts are kept in the snapshot
+MONITORED_CLASSES = ("Newsletter", "NewsletterSection")
+
+class ServiceMonitor:
+    """
+    ServiceMonitor is a class to probe the storage backend and the inference container
+    in the background and keep their readiness and object counts in memory, so health
+    checks and dashboards polling /health and /count never reach Weaviate themselves.
+    Batch writers add the objects they load to the counts between probes, and every
+    probe replaces them with the backend's own counts.
+    """
+    def __init__(self, interval: float, classes: Iterable[str] = MONITORED_CLASSES) -> None:
+        self.interval = interval
+        self.classes = tuple(classes)
+        self._lock = threading.Lock()
+        self._snapshot: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def probe(self) -> dict:
+        """Check readiness and count objects now, replacing the snapshot; blocking"""
+        started = time.monotonic()
+        backend = get_storage_backend()
+        backend_ready = backend.is_ready()
+        try:
+            inference_ready = get_inference_client().is_ready()
+        except Exception as e:
+            logger.error(f"Error checking inference readiness: {str(e)}")
+            inference_ready = False
+
+        counts = {}
+        for class_name in self.classes:
+            try:
+                counts[class_name] = backend.count(class_name) if backend_ready else None
+            except Exception as e:
+                # A class that was never created has no count
+                logger.debug(f"Counting {class_name} objects failed: {str(e)}")
+                counts[class_name] = None
+
+        snapshot = {
+            "backend": backend.name,
+            "backend_ready": backend_ready,
+            "inference_ready": inference_ready,
+            "counts": counts,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "probe_seconds": time.monotonic() - started
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return self.snapshot()
+
+    def snapshot(self) -> Optional[dict]:
+        """The latest probe results, or None before the first probe"""
+        with self._lock:
+            if self._snapshot is None:
+                return None
+            return {**self._snapshot, "counts": dict(self._snapshot["counts"])}
+
+    def objects_loaded(self, counts: Dict[str, int]) -> None:
+        """Add objects written by a batch writer to the counts until the next probe"""
+        with self._lock:
+            if self._snapshot is None:
+                return
+            current = self._snapshot["counts"]
+            for class_name, loaded in counts.items():
+                if current.get(class_name) is not None:
+                    current[class_name] += loaded
+
+    def start(self) -> None:
+        """Start probing on the running event loop; a non-positive interval probes on demand only"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Service monitor started, probing every {self.interval}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Probes block on HTTP, so they run off the event loop
+                await loop.run_in_executor(None, self.probe)
+            except Exception as e:
+                logger.error(f"Service probe failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+@lru_cache()
+def get_service_monitor() -> ServiceMonitor:
+    return ServiceMonitor(settings.MONITOR_INTERVAL_SECONDS)
@@ -0,0 +1,307 @@
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from .email.content_splitter import ContentSplitter
+from .email import message_parser
+from .dedup import drop_duplicates
+from .record_store import RecordStore
+from .storage.backend import get_storage_backend
+from .weaviate.loader import KeywordIndexer, add_records
+from ..core.config import get_settings
+from ..core.metrics import EMAIL_PARSE_SECONDS, EMAIL_SPLIT_SECONDS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Marks the end of the stream on a stage queue
+_DONE = object()
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+class IngestPipeline:
+    """
+    IngestPipeline streams newsletters through fetch -> parse -> load stages.
+    Each stage runs in its own thread and hands records to the next one through a
+    bounded queue, so a slow stage blocks the ones before it instead of letting
+    records pile up in memory. Records are stored in small batches and handed to the
+    storage backend's batch writer, so each newsletter is searchable shortly after it has
+    been fetched and a slow vectorizer throttles fetching.
+    Each source yields raw emails (see EmailFetcher.iter_raw_emails). Sources are read
+    in parallel, up to fetch_workers at once, so syncing several mailboxes takes as
+    long as the slowest rather than the sum, and all of them share the parse and load
+    stages. A failing source is recorded in source_errors without stopping the others.
+    Given a process pool, the parse stage sends emails to it in chunks, so MIME
+    decoding and section splitting use more than one core.
+    """
+    def __init__(
+        self,
+        sources: List[Iterable[dict]],
+        splitter: ContentSplitter,
+        store: RecordStore,
+        queue_size: int = None,
+        load_batch_size: int = None,
+        flush_interval: float = None,
+        parse_pool: Optional[Executor] = None,
+        parse_chunk_size: int = None,
+        fetch_workers: int = None
+    ) -> None:
+        self.sources = sources
+        self.fetch_workers = max(1, fetch_workers or settings.EMAIL_SYNC_CONCURRENCY)
+        self.source_errors: Dict[int, Exception] = {}
+        # UIDs of emails that could not be stored, by source, to keep out of its sync checkpoint
+        self.failed_uids: Dict[int, Set[str]] = {}
+        self.splitter = splitter
+        self.store = store
+        self.parse_pool = parse_pool
+        self.parse_chunk_size = max(1, parse_chunk_size or settings.PARSE_CHUNK_SIZE)
+        # Chunks submitted ahead of the one being collected, bounding memory held by the pool
+        self.parse_ahead = 2 * max(1, settings.PARSE_WORKERS)
+        self.load_batch_size = max(1, load_batch_size or settings.INGEST_LOAD_BATCH_SIZE)
+        self.flush_interval = flush_interval or settings.INGEST_FLUSH_SECONDS
+        queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.parse_queue = queue.Queue(maxsize=queue_size)
+        self.load_queue = queue.Queue(maxsize=queue_size)
+        self.stats = {
+            "fetched": 0,
+            "processed": 0,
+            "skipped": 0,
+            "errors": 0,
+            "stored": 0,
+            "duplicates": 0,
+            "embedded": 0,
+            "load_errors": 0
+        }
+        self._stats_lock = threading.Lock()
+        self._embedded_ids: set[str] = set()
+        self._failed_ids: set[str] = set()
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _put(self, q: queue.Queue, item) -> None:
+        """Put an item on a stage queue, blocking while it is full"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def _get(self, q: queue.Queue, timeout: float = None):
+        """Get an item from a stage queue, returning None if nothing arrived within timeout"""
+        waited = 0.0
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                waited += 0.5
+                if timeout is not None and waited >= timeout:
+                    return None
+        raise PipelineStopped()
+
+    def _fetch_stage(self) -> None:
+        workers = min(self.fetch_workers, len(self.sources)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest_fetch") as pool:
+            for index, source in enumerate(self.sources):
+                pool.submit(self._fetch_source, index, source)
+        if self._stop.is_set():
+            raise PipelineStopped()
+        self._put(self.parse_queue, _DONE)
+
+    def _fetch_source(self, index: int, source: Iterable[dict]) -> None:
+        try:
+            for email in source:
+                self._count("fetched")
+                email["source_index"] = index
+                self._put(self.parse_queue, email)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            # Reported by the caller, which knows what the source is
+            self.source_errors[index] = e
+        finally:
+            # A source abandoned mid-stream still runs its clean-up, e.g. closing its IMAP session
+            close = getattr(source, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Closing email source {index} failed: {str(e)}")
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def snapshot(self) -> dict:
+        """A consistent copy of the per-stage counts, safe to read while the stages run"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _handle_parsed(self, raw: dict, outcome: str, email: Optional[dict], error: Optional[str]) -> None:
+        email_id = email.get('id') if email else raw.get('id')
+        if outcome == message_parser.INVALID:
+            logger.error(f"Error decoding email {email_id} (UID {raw.get('uid')}): {error}")
+            self._count("errors")
+            if not email_id:
+                return
+            try:
+                # The same bytes fail the same way on every retry, so the email is stored as an
+                # error record, which lets the source's checkpoint move past it
+                self.store.mark_invalid({email_id: error})
+            except Exception as e:
+                # Only a failed write is worth retrying: the checkpoint stays below this UID
+                logger.error(f"Error storing undecodable email {email_id}: {str(e)}")
+                if raw.get('uid') is not None:
+                    self.failed_uids.setdefault(raw.get('source_index'), set()).add(raw['uid'])
+            return
+
+        if outcome == message_parser.PROCESSED:
+            self._count("processed")
+        elif outcome == message_parser.NO_BODY:
+            logger.warning(f"Skipping email {email_id} - No body content")
+            self._count("skipped")
+        elif outcome == message_parser.NO_SECTIONS:
+            logger.warning(f"Skipping email {email_id} - No sections parsed")
+            self._count("skipped")
+        else:
+            logger.error(f"Error parsing sections for email {email_id}: {error}")
+            self._count("errors")
+
+        # Every fetched email is stored, so it is not fetched again
+        self._put(self.load_queue, email)
+
+    def _handle_timed(self, raw: dict, result: tuple, timings: dict) -> None:
+        EMAIL_PARSE_SECONDS.observe(timings["parse"])
+        if "split" in timings:
+            EMAIL_SPLIT_SECONDS.observe(timings["split"])
+        self._handle_parsed(raw, *result)
+
+    def _parse_stage(self) -> None:
+        if self.parse_pool is not None:
+            self._pooled_parse_stage()
+            return
+
+        while True:
+            raw = self._get(self.parse_queue)
+            if raw is _DONE:
+                self._put(self.load_queue, _DONE)
+                return
+            self._handle_timed(raw, *message_parser.timed_parse_raw_email(raw, self.splitter))
+
+    def _pooled_parse_stage(self) -> None:
+        """Parse chunks of emails in the process pool, handing results on in fetch order"""
+        pending = deque()
+        chunk = []
+
+        def submit() -> None:
+            nonlocal chunk
+            if chunk:
+                pending.append((chunk, self.parse_pool.submit(message_parser.parse_raw_emails, chunk)))
+                chunk = []
+
+        def collect(keep: int) -> None:
+            """Hand on finished chunks in order, waiting for the oldest while more than keep are pending"""
+            while pending and (len(pending) > keep or pending[0][1].done()):
+                raws, future = pending.popleft()
+                for raw, (result, timings) in zip(raws, future.result()):
+                    self._handle_timed(raw, result, timings)
+
+        while True:
+            raw = self._get(self.parse_queue, timeout=self.flush_interval)
+            if raw is _DONE:
+                submit()
+                collect(keep=0)
+                self._put(self.load_queue, _DONE)
+                return
+
+            if raw is None:
+                # Do not hold back a partial chunk while the fetcher is quiet
+                submit()
+            else:
+                chunk.append(raw)
+                if len(chunk) >= self.parse_chunk_size:
+                    submit()
+            # Backpressure: waits for the oldest chunk once enough are in flight
+            collect(keep=self.parse_ahead)
+
+    def _on_loaded(self, loaded_ids: list[str], errors: dict[str, str]) -> None:
+        """Called by the batch writer as batches complete"""
+        with self._stats_lock:
+            # Records loaded as several objects (sections) are reported once per object,
+            # and a record with any failed object stays pending
+            self._failed_ids.update(errors)
+            loaded_ids = set(loaded_ids) - self._failed_ids - self._embedded_ids
+            self._embedded_ids.update(loaded_ids)
+            self.stats["embedded"] = len(self._embedded_ids - self._failed_ids)
+            self.stats["load_errors"] = len(self._failed_ids)
+            # Updated under the lock, so a late success cannot overwrite an error
+            self.store.mark_embedded(loaded_ids)
+            if errors:
+                self.store.mark_errors(errors)
+
+    def _flush(self, batch: list[dict], writer, keywords: KeywordIndexer) -> None:
+        # Store first, so the writer's callback always finds the records
+        self._count("stored", self.store.append(batch))
+        unique = drop_duplicates(batch, self.store)
+        self._count("duplicates", len(batch) - len(unique))
+        errors = add_records(writer, unique, keywords)
+        if errors:
+            self._on_loaded([], errors)
+
+    def _load_stage(self) -> None:
+        batch = []
+        # Whether the writer was handed records since it was last flushed
+        unflushed = False
+        keywords = KeywordIndexer(self._on_loaded)
+        with get_storage_backend().create_batch_writer(on_complete=keywords.on_complete) as writer:
+            while True:
+                email = self._get(self.load_queue, timeout=self.flush_interval)
+                if email is None or email is _DONE:
+                    # Flush partial batches when the stream goes quiet so new mail becomes searchable
+                    if batch:
+                        self._flush(batch, writer, keywords)
+                        batch = []
+                        unflushed = True
+                    if unflushed:
+                        writer.flush()
+                        unflushed = False
+                    if email is _DONE:
+                        return
+                    continue
+
+                batch.append(email)
+                if len(batch) >= self.load_batch_size:
+                    self._flush(batch, writer, keywords)
+                    batch = []
+                    unflushed = True
+
+    def _run_stage(self, stage) -> None:
+        try:
+            stage()
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            logger.error(f"Ingest stage {stage.__name__} failed: {str(e)}")
+            if self._error is None:
+                self._error = e
+            self._stop.set()
+
+    def run(self) -> dict:
+        """Run all stages to completion and return the per-stage counts"""
+        threads = [
+            threading.Thread(target=self._run_stage, args=(stage,), name=f"ingest{stage.__name__}", daemon=True)
+            for stage in (self._fetch_stage, self._parse_stage, self._load_stage)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+        return self.stats
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+from .storage.backend import get_storage_backend
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class RecordStore:
+    """
+    RecordStore keeps processed newsletter records in an SQLite database.
+    Records are keyed by Message-ID, so "have I seen this email" is an index lookup,
+    new records are inserted without rewriting old ones, and a pending index lets the
+    loader iterate only the records that have not been embedded yet.
+    """
+    def __init__(
+        self,
+        path: str,
+        legacy_json_path: str = None,
+        legacy_errors_path: str = None,
+        legacy_loaded_ids: Optional[Callable[[], Set[str]]] = None
+    ) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                date TEXT,
+                data TEXT NOT NULL,
+                embedded INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_pending ON records(embedded) WHERE embedded = 0;
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(records)")}
+        if "duplicate_of" not in columns:
+            # Stores created before duplicate detection
+            self._conn.execute("ALTER TABLE records ADD COLUMN duplicate_of TEXT")
+        if legacy_json_path:
+            self._import_legacy_json(legacy_json_path, legacy_errors_path, legacy_loaded_ids)
+
+    def _import_legacy_json(
+        self,
+        path: str,
+        errors_path: str = None,
+        loaded_ids: Optional[Callable[[], Set[str]]] = None
+    ) -> None:
+        """
+        One-off import of the old rewrite-everything JSON file into an empty store.
+        The old scheduled check appended records without loading them, so only those
+        whose id loaded_ids (the email_ids already in the vector store) returns are
+        imported as embedded: loading them again would add a second object next to the
+        old random-UUID one. The rest stay pending, with the old loader's error if its
+        error file has one, so the next load embeds them. Without loaded_ids, every
+        record is pending.
+        """
+        if not os.path.exists(path) or self.count() > 0:
+            return
+        with open(path, 'r') as f:
+            records = json.load(f)
+        legacy_errors = {}
+        if errors_path and os.path.exists(errors_path):
+            try:
+                with open(errors_path, 'r') as f:
+                    legacy_errors = {email_id.strip('<>').strip(): error for email_id, error in json.load(f).items()}
+            except Exception as e:
+                logger.warning(f"Could not read legacy error file {errors_path}, importing records without errors: {e}")
+        # The old loader stored ids as they were in the file, angle brackets included
+        loaded = {email_id.strip('<>').strip() for email_id in loaded_ids()} if loaded_ids else set()
+
+        rows = []
+        for record in records:
+            if not record.get('id'):
+                continue
+            record['id'] = record['id'].strip('<>').strip()
+            embedded = record['id'] in loaded
+            error = None if embedded else legacy_errors.get(record['id'])
+            rows.append((record['id'], record.get('date', ''), json.dumps(record), int(embedded), error))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records (id, date, data, embedded, error) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        pending = sum(1 for row in rows if not row[3])
+        logger.info(
+            f"Imported {len(rows)} records from legacy file {path} into {self.path}, "
+            f"{pending} of them pending as they are not in the vector store yet"
+        )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def count_pending(self) -> int:
+        """Number of records not yet embedded"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records WHERE embedded = 0").fetchone()[0]
+
+    def has(self, email_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM records WHERE id = ?", (email_id,)).fetchone()
+        return row is not None
+
+    def existing_ids(self, email_ids: Iterable[str]) -> set[str]:
+        """Return the subset of email_ids that are already stored"""
+        email_ids = [email_id for email_id in email_ids if email_id]
+        found = set()
+        with self._lock:
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(email_ids), 500):
+                chunk = email_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id FROM records WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def append(self, records: Iterable[dict]) -> int:
+        """Insert new records, replacing stored records with the same id. Returns the number written."""
+        rows = [
+            (record['id'], record.get('date', ''), json.dumps(record))
+            for record in records if record.get('id')
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO records (id, date, data, embedded, error) VALUES (?, ?, ?, 0, NULL)
+                ON CONFLICT(id) DO UPDATE SET date = excluded.date, data = excluded.data,
+                    embedded = 0, error = NULL, duplicate_of = NULL
+                """,
+                rows
+            )
+        return len(rows)
+
+    def iter_pending(self, page_size: int = 200) -> Iterator[dict]:
+        """Iterate records that are not embedded yet, one page at a time"""
+        return self._iter_where("embedded = 0", page_size)
+
+    def iter_embedded(self, page_size: int = 200) -> Iterator[dict]:
+        """Iterate loaded records, leaving out duplicates and undecodable emails, one page at a time"""
+        return self._iter_where("embedded = 1 AND duplicate_of IS NULL AND error IS NULL", page_size)
+
+    def _iter_where(self, condition: str, page_size: int) -> Iterator[dict]:
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT rowid, data FROM records WHERE {condition} AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, data in rows:
+                last_rowid = rowid
+                yield json.loads(data)
+
+    def mark_embedded(self, email_ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE records SET embedded = 1, error = NULL WHERE id = ?",
+                [(email_id,) for email_id in email_ids]
+            )
+
+    def mark_errors(self, errors: dict[str, str]) -> None:
+        """Record load errors; errored records stay pending so the next load retries them"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE records SET embedded = 0, error = ? WHERE id = ?",
+                [(message, email_id) for email_id, message in errors.items()]
+            )
+
+    def mark_duplicates(self, duplicates: dict[str, str]) -> None:
+        """Link duplicate records to their originals; they are never embedded themselves"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE records SET embedded = 1, error = NULL, duplicate_of = ? WHERE id = ?",
+                [(original_id, email_id) for email_id, original_id in duplicates.items()]
+            )
+
+    def mark_invalid(self, errors: dict[str, str]) -> None:
+        """
+        Store emails that cannot be decoded as error records, so later syncs skip them.
+        They are never embedded, and a stored record with the same id is left alone.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO records (id, date, data, embedded, error) VALUES (?, '', ?, 1, ?)",
+                [(email_id, json.dumps({'id': email_id}), message) for email_id, message in errors.items()]
+            )
+
+    def count_duplicates(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records WHERE duplicate_of IS NOT NULL").fetchone()[0]
+
+    def get_errors(self) -> dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id, error FROM records WHERE error IS NOT NULL").fetchall()
+        return dict(rows)
+
+@lru_cache()
+def get_record_store() -> RecordStore:
+    return RecordStore(
+        settings.RECORD_STORE_FILE,
+        legacy_json_path=settings.OUTPUT_FILE,
+        # The old loader kept its failures next to the records file
+        legacy_errors_path=os.path.join(os.path.dirname(settings.OUTPUT_FILE), "error_records.json"),
+        legacy_loaded_ids=lambda: get_storage_backend().email_ids("Newsletter")
+    )
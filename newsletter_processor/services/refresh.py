@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from .email.newsletter_processor import NewsletterProcessor
+from .executor import run_ingest
+from .weaviate.loader import load_data
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class RefreshJob:
+    """
+    RefreshJob is one run of the email refresh: fetch, parse and load new mail
+    through the ingest pipeline, then load any records still pending. Progress is
+    read from the running pipeline's counters, so it is current while the job runs.
+    """
+    def __init__(self, trigger: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+        self.processed_count: Optional[int] = None
+        self.pending_load: Optional[dict] = None
+        self.processor: Optional[NewsletterProcessor] = None
+        self.task: Optional[asyncio.Task] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    async def run(self) -> None:
+        self.status = RUNNING
+        self.started_at = _now()
+        self._started = time.monotonic()
+        try:
+            self.stage = "ingest"
+            self.processor = NewsletterProcessor(
+                settings.EMAIL_ADDRESS,
+                settings.OUTPUT_FILE,
+                settings.ERROR_FILE,
+                settings.EMAIL_CHECK_INTERVAL
+            )
+            self.processed_count = await self.processor.process_emails()
+            if self.processed_count > 0:
+                # Records whose load failed in the pipeline are retried here
+                self.stage = "load_pending"
+                self.pending_load = await run_ingest(load_data)
+            self.status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Refresh job {self.id} failed in stage {self.stage}: {str(e)}")
+            self.status = FAILED
+            self.error = str(e)
+        finally:
+            self.finished_at = _now()
+            self._finished = time.monotonic()
+            logger.info(f"Refresh job {self.id} {self.status} after {self.elapsed():.1f}s")
+
+    def elapsed(self) -> float:
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.monotonic()) - self._started
+
+    def progress(self) -> dict:
+        """Per-stage counts of the ingest pipeline, with each stage's records per second"""
+        pipeline = self.processor.pipeline if self.processor else None
+        if pipeline is None:
+            return {}
+        stats = pipeline.snapshot()
+        elapsed = max(self.elapsed(), 1e-9)
+        stages = {
+            "fetch": {"fetched": stats["fetched"]},
+            "parse": {key: stats[key] for key in ("processed", "skipped", "errors")},
+            "load": {key: stats[key] for key in ("stored", "duplicates", "embedded", "load_errors")}
+        }
+        handled = {"fetch": stats["fetched"], "parse": sum(stages["parse"].values()), "load": stats["stored"]}
+        for name, counts in stages.items():
+            counts["per_sec"] = handled[name] / elapsed
+        return stages
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "trigger": self.trigger,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": self.elapsed(),
+            "progress": self.progress(),
+            "processed_count": self.processed_count,
+            "pending_load": self.pending_load,
+            "error": self.error
+        }
+
+class RefreshJobManager:
+    """
+    Runs email refreshes as background jobs, at most one at a time. A refresh
+    triggered while one is queued or running joins it instead of opening a second
+    IMAP session and loading the same records twice. Finished jobs are kept for
+    status queries, up to REFRESH_JOB_HISTORY of them. Jobs are created and
+    tracked on the event loop, so no locking is needed.
+    """
+    _jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+    _current: Optional[RefreshJob] = None
+    _follow_up: Optional[str] = None
+
+    @classmethod
+    def submit(cls, trigger: str = "api", follow_up: bool = False) -> Tuple[RefreshJob, bool]:
+        """
+        Start a refresh job, or join the one in flight; returns the job and whether it
+        was joined. With follow_up, a running job that may have searched the mailbox
+        before the triggering mail arrived is followed by one more run; any number of
+        such triggers share that run.
+        """
+        if cls._current is not None and cls._current.active:
+            if follow_up and cls._current.status == RUNNING:
+                cls._follow_up = trigger
+            logger.info(f"Refresh triggered by {trigger} joined in-flight job {cls._current.id}")
+            return cls._current, True
+
+        job = RefreshJob(trigger)
+        cls._jobs[job.id] = job
+        while len(cls._jobs) > max(1, settings.REFRESH_JOB_HISTORY):
+            cls._jobs.popitem(last=False)
+        cls._current = job
+        job.task = asyncio.get_running_loop().create_task(job.run())
+        job.task.add_done_callback(cls._on_done)
+        logger.info(f"Started refresh job {job.id} ({trigger})")
+        return job, False
+
+    @classmethod
+    def _on_done(cls, task: asyncio.Task) -> None:
+        if cls._follow_up is not None:
+            trigger, cls._follow_up = cls._follow_up, None
+            cls.submit(trigger)
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[RefreshJob]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def current(cls) -> Optional[RefreshJob]:
+        """The job in flight, if any"""
+        return cls._current if cls._current is not None and cls._current.active else None
@@ -3,39 +3,63 @@ import logging
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from typing import List
 
-from .email.newsletter_processor import NewsletterProcessor
+from .executor import run_ingest
+from .refresh import RefreshJobManager
+from .weaviate.loader import backfill_keyword_index
+from .email.idle_listener import IdleListener
 from ..core.config import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 async def scheduled_email_check():
-    """Scheduled task to check for and process new emails"""
+    """Scheduled task to check for and process new emails, as a refresh job"""
     try:
         logger.info("Starting scheduled email check")
-        processor = NewsletterProcessor(
-            settings.EMAIL_ADDRESS,
-            settings.OUTPUT_FILE,
-            settings.ERROR_FILE,
-            settings.EMAIL_CHECK_INTERVAL
-        )
-        await processor.process_emails()
-    except ConnectionError as e:
-        logger.error(f"Email connection error: {str(e)}")
+        # Joins a manually triggered refresh that is still running
+        job, _ = RefreshJobManager.submit(trigger="scheduler")
+        await job.task
+        if job.error:
+            logger.error(f"Scheduled email check failed: {job.error}")
     except Exception as e:
         logger.error(f"Unexpected error in scheduled email check: {str(e)}")
 
-def start_scheduler():
+async def fallback_email_check(listeners: List[IdleListener]):
+    """Poll for new emails while any IDLE listener is disconnected, or its server does not support IDLE"""
+    if all(listener.connected for listener in listeners):
+        return
+    await scheduled_email_check()
+
+async def keyword_backfill():
+    """Index the records loaded before the keyword index existed, unless that already ran"""
+    await run_ingest(backfill_keyword_index)
+
+def start_scheduler(listeners: List[IdleListener] = None):
     """Initialize and start the scheduler"""
     scheduler = AsyncIOScheduler()
     
+    # A safety net even with IDLE, which can miss mail, e.g. on a silently dropped connection
     scheduler.add_job(
         scheduled_email_check,
         CronTrigger(hour=f"*/{settings.EMAIL_CHECK_INTERVAL}"),
         id="email_check",
         name="Check for new newsletter emails"
     )
+    if settings.KEYWORD_INDEX_ENABLED:
+        # No trigger: runs once, right after start
+        scheduler.add_job(keyword_backfill, id="keyword_backfill", name="Backfill the keyword index")
+    # Without IDLE listeners (IMAP_IDLE_ENABLED off) the scheduled check alone is the configured cadence
+    if listeners:
+        scheduler.add_job(
+            fallback_email_check,
+            IntervalTrigger(minutes=settings.IMAP_POLL_FALLBACK_MINUTES),
+            args=[listeners],
+            id="email_fallback_check",
+            name="Poll for new newsletter emails while IDLE is down"
+        )
     
     scheduler.start()
     logger.info("Scheduler started")
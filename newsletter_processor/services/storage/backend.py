@@ -0,0 +1,89 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from ...core.config import get_settings
+
+settings = get_settings()
+
+class StorageBackend(ABC):
+    """
+    StorageBackend is the interface between the search and ingest code and the store
+    holding newsletter objects and their vectors. Queries name the class and the
+    properties to return in Weaviate's GraphQL field syntax, and results come back
+    in the shape of Weaviate's Get results, so callers work with any backend.
+    """
+    name = "Storage backend"
+
+    @abstractmethod
+    def is_ready(self) -> bool:
+        """Whether the backend can serve queries and accept writes"""
+
+    @abstractmethod
+    def init_schema(self) -> dict:
+        """Create the Newsletter and NewsletterSection classes if they do not exist"""
+
+    @abstractmethod
+    def count(self, class_name: str) -> int:
+        """Number of objects of a class"""
+
+    @abstractmethod
+    def email_ids(self, class_name: str) -> Set[str]:
+        """The email_id of every object of a class"""
+
+    @abstractmethod
+    def recent(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        before: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> List[dict]:
+        """
+        The most recently received objects of a class, newest first and by email_id
+        among those received at the same time. before (a received_date) and after_id
+        (an email_id) page through them: only objects received before it, or at it
+        with a later email_id, are returned.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        vector: Optional[np.ndarray] = None,
+        text: Optional[str] = None,
+        offset: int = 0
+    ) -> List[dict]:
+        """
+        The objects of a class nearest to a query vector, best match first,
+        skipping the first offset. Without a vector, the backend vectorizes the
+        query text itself.
+        """
+
+    def search_many(self, class_name: str, queries: List[dict]) -> List[List[dict]]:
+        """
+        Run several searches of a class, each a dict with the properties, limit,
+        vector, text and optionally offset arguments of search, returning their results in order.
+        Backends override this to answer all of them in one request.
+        """
+        return [self.search(class_name, **query) for query in queries]
+
+    @abstractmethod
+    def create_batch_writer(self, on_complete: Callable[[List[str], Dict[str, str]], None] = None):
+        """A batch writer (see AdaptiveBatchWriter) writing objects to this backend"""
+
+@lru_cache()
+def get_storage_backend() -> StorageBackend:
+    """The backend selected by STORAGE_BACKEND, imported lazily so unused backends cost nothing"""
+    if settings.STORAGE_BACKEND == "weaviate":
+        from .weaviate_backend import WeaviateBackend
+        return WeaviateBackend()
+    if settings.STORAGE_BACKEND == "local":
+        from .local_backend import LocalVectorIndex
+        return LocalVectorIndex(settings.LOCAL_INDEX_DIR, use_hnsw=settings.LOCAL_INDEX_HNSW)
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
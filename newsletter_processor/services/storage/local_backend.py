@@ -0,0 +1,426 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid as uuid_lib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .backend import StorageBackend
+from ..cache import IngestGeneration
+from ..monitor import get_service_monitor
+from ..inference.client import get_inference_client
+from ..inference.vector_cache import document_text, get_document_vectors
+from ...core.config import get_settings
+from ...core.metrics import BATCH_OBJECTS, BATCH_WRITE_SECONDS
+
+try:
+    import hnswlib
+except ImportError:  # optional, only needed for LOCAL_INDEX_HNSW
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rows a class's vector file starts with; it doubles whenever it fills up
+_INITIAL_CAPACITY = 1024
+
+# GraphQL fields understood besides plain properties
+_REFERENCE_FIELD = re.compile(r'^(\w+)\s*\{\s*\.\.\.\s*on\s+(\w+)\s*\{([^{}]*)\}\s*\}$')
+_ADDITIONAL_FIELD = re.compile(r'^_additional\s*\{([^{}]*)\}$')
+
+def _received_ts(properties: dict) -> float:
+    try:
+        # fromisoformat only accepts a "Z" suffix from Python 3.11
+        return datetime.fromisoformat((properties.get("received_date") or "").replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class LocalVectorIndex(StorageBackend):
+    """
+    LocalVectorIndex is an in-process storage backend for development, CI and
+    single-node deployments without a Weaviate container. The unit vectors of each
+    class are rows of a memory-mapped float32 matrix, and properties live in a SQLite
+    table mapping object UUIDs to rows, so re-writing an object overwrites its row.
+    Search is an exact cosine scan (one matrix-vector product); with use_hnsw and
+    hnswlib installed, an in-memory HNSW graph is built on first search instead and
+    kept up to date incrementally.
+    """
+    name = "Local index"
+
+    def __init__(self, directory: str, use_hnsw: bool = False, hnsw_m: int = 16, hnsw_ef: int = 64) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.use_hnsw = use_hnsw
+        if use_hnsw and hnswlib is None:
+            logger.warning("LOCAL_INDEX_HNSW is set but hnswlib is not installed, using exact search")
+            self.use_hnsw = False
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef = hnsw_ef
+
+        self._lock = threading.RLock()
+        self._matrices: Dict[str, np.memmap] = {}
+        self._hnsw = {}
+        # Rows written since the class's HNSW graph last caught up
+        self._stale_rows: Dict[str, set] = {}
+        self._conn = sqlite3.connect(os.path.join(directory, "objects.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                uuid TEXT PRIMARY KEY,
+                class TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                received_ts REAL NOT NULL DEFAULT 0,
+                properties TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_objects_row ON objects(class, row);
+            CREATE INDEX IF NOT EXISTS idx_objects_received ON objects(class, received_ts);
+            CREATE TABLE IF NOT EXISTS vectors (
+                class TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                rows INTEGER NOT NULL
+            );
+        """)
+
+    def is_ready(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error checking local index readiness: {str(e)}")
+            return False
+
+    def init_schema(self) -> dict:
+        # Classes are created by their first write
+        return {"status": "success", "message": f"Local index at {self.directory} needs no schema"}
+
+    def _shape(self, class_name: str) -> Optional[Tuple[int, int]]:
+        """(dimensions, rows) of a class's vectors, None before its first write"""
+        return self._conn.execute("SELECT dim, rows FROM vectors WHERE class = ?", (class_name,)).fetchone()
+
+    def _matrix(self, class_name: str, dim: int, rows: int) -> np.memmap:
+        """The memory-mapped vectors of a class, grown to hold at least rows rows"""
+        matrix = self._matrices.get(class_name)
+        if matrix is not None and matrix.shape[0] >= rows:
+            return matrix
+
+        path = os.path.join(self.directory, f"{class_name}.f32")
+        if matrix is not None:
+            matrix.flush()
+            del self._matrices[class_name]
+        open(path, 'ab').close()
+        capacity = max(_INITIAL_CAPACITY, os.path.getsize(path) // (4 * dim))
+        while capacity < rows:
+            capacity *= 2
+        if os.path.getsize(path) < capacity * dim * 4:
+            os.truncate(path, capacity * dim * 4)
+        matrix = self._matrices[class_name] = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        return matrix
+
+    def upsert(self, class_name: str, objects: List[Tuple[str, dict, np.ndarray]]) -> int:
+        """Write (uuid, properties, vector) objects of a class, overwriting existing UUIDs; returns the number of new objects"""
+        # The last write of a UUID wins, as with Weaviate's batch endpoint
+        unique = {uuid: (properties, vector) for uuid, properties, vector in objects}
+        if not unique:
+            return 0
+        vectors = _normalize(np.asarray([vector for _, vector in unique.values()], dtype=np.float32))
+
+        with self._lock, self._conn:
+            shape = self._shape(class_name)
+            dim = vectors.shape[1]
+            if shape is None:
+                rows = 0
+                self._conn.execute("INSERT INTO vectors (class, dim, rows) VALUES (?, ?, 0)", (class_name, dim))
+            elif shape[0] != dim:
+                raise ValueError(f"{class_name} vectors have {shape[0]} dimensions, got {dim}")
+            else:
+                rows = shape[1]
+
+            existing = dict(self._conn.execute(
+                f"SELECT uuid, row FROM objects WHERE class = ? AND uuid IN ({','.join('?' * len(unique))})",
+                (class_name, *unique)
+            ).fetchall())
+            assigned = []
+            added = len(unique) - len(existing)
+            for uuid in unique:
+                if uuid not in existing:
+                    existing[uuid] = rows
+                    rows += 1
+                assigned.append(existing[uuid])
+
+            # Vectors are written before the rows are committed, so readers never see a row without one
+            matrix = self._matrix(class_name, dim, rows)
+            matrix[np.asarray(assigned)] = vectors
+            matrix.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO objects (uuid, class, row, received_ts, properties) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (uuid, class_name, row, _received_ts(properties), json.dumps(properties))
+                    for (uuid, (properties, _)), row in zip(unique.items(), assigned)
+                ]
+            )
+            self._conn.execute("UPDATE vectors SET rows = ? WHERE class = ?", (rows, class_name))
+            if class_name in self._hnsw:
+                self._stale_rows.setdefault(class_name, set()).update(assigned)
+        return added
+
+    def count(self, class_name: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM objects WHERE class = ?", (class_name,)).fetchone()[0]
+
+    def email_ids(self, class_name: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT json_extract(properties, '$.email_id') FROM objects WHERE class = ?", (class_name,)
+            ).fetchall()
+        return {email_id for email_id, in rows if email_id}
+
+    def recent(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        before: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> List[dict]:
+        before_ts = _received_ts({"received_date": before}) if before else float("inf")
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT uuid, properties FROM objects WHERE class = ? AND (
+                    received_ts < ? OR (received_ts = ? AND json_extract(properties, '$.email_id') > ?)
+                )
+                ORDER BY received_ts DESC, json_extract(properties, '$.email_id') LIMIT ?
+                """,
+                (class_name, before_ts, before_ts, after_id or "", limit)
+            ).fetchall()
+            return [self._project(uuid, json.loads(data), properties) for uuid, data in rows]
+
+    def search(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        vector: Optional[np.ndarray] = None,
+        text: Optional[str] = None,
+        offset: int = 0
+    ) -> List[dict]:
+        query = {"properties": properties, "limit": limit, "vector": vector, "text": text, "offset": offset}
+        return self.search_many(class_name, [query])[0]
+
+    def search_many(self, class_name: str, queries: List[dict]) -> List[List[dict]]:
+        """All searches as one matrix product (or one batched HNSW query)"""
+        vectors = [query.get("vector") for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, get_inference_client().vectorize_many([queries[i]["text"] for i in missing])):
+                vectors[i] = vector
+        query_matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(queries), -1))
+
+        with self._lock:
+            shape = self._shape(class_name)
+            limit = max((query.get("offset", 0) + query["limit"] for query in queries), default=0)
+            if shape is None or not shape[1] or limit <= 0:
+                return [[] for _ in queries]
+            dim, rows = shape
+            if query_matrix.shape[1] != dim:
+                raise ValueError(f"Query vectors have {query_matrix.shape[1]} dimensions, the {class_name} index {dim}")
+            matrix = self._matrix(class_name, dim, rows)
+            # Every query gets the top k of the deepest page, cut down to its own below
+            k = min(limit, rows)
+            if self.use_hnsw:
+                top, distances = self._hnsw_query(class_name, matrix, rows, query_matrix, k)
+            else:
+                scores = query_matrix @ matrix[:rows].T
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+                top = np.take_along_axis(top, order, axis=1)
+                distances = 1.0 - np.take_along_axis(scores, top, axis=1)
+
+            wanted = {int(row) for row in np.unique(top)}
+            found = {
+                row: (uuid, json.loads(data)) for row, uuid, data in self._conn.execute(
+                    f"SELECT row, uuid, properties FROM objects WHERE class = ? AND row IN ({','.join('?' * len(wanted))})",
+                    (class_name, *wanted)
+                )
+            }
+            results = []
+            for query, query_top, query_distances in zip(queries, top, distances):
+                items = []
+                offset = query.get("offset", 0)
+                page = slice(offset, offset + query["limit"])
+                for row, distance in zip(query_top[page], query_distances[page]):
+                    if int(row) in found:
+                        uuid, data = found[int(row)]
+                        items.append(self._project(uuid, data, query["properties"], float(distance)))
+                results.append(items)
+            return results
+
+    def _hnsw_query(self, class_name: str, matrix: np.memmap, rows: int, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate nearest rows of each query, catching the class's graph up with writes first"""
+        index = self._hnsw.get(class_name)
+        if index is None:
+            index = hnswlib.Index(space='cosine', dim=matrix.shape[1])
+            index.init_index(max_elements=max(rows, _INITIAL_CAPACITY), ef_construction=200, M=self.hnsw_m)
+            self._hnsw[class_name] = index
+            stale = range(rows)
+        else:
+            stale = sorted(self._stale_rows.pop(class_name, ()))
+        if len(stale):
+            if rows > index.get_max_elements():
+                index.resize_index(max(rows, 2 * index.get_max_elements()))
+            ids = np.asarray(stale, dtype=np.int64)
+            # Re-adding an existing label replaces its vector
+            index.add_items(np.asarray(matrix[ids]), ids)
+        index.set_ef(max(self.hnsw_ef, k))
+        return index.knn_query(queries, k=k)
+
+    def _project(self, uuid: str, data: dict, properties: List[str], distance: Optional[float] = None) -> dict:
+        """Shape an object like a Weaviate Get result for the requested fields"""
+        item = {}
+        for field in properties:
+            field = " ".join(field.split())
+            additional = _ADDITIONAL_FIELD.match(field)
+            if additional:
+                values = {"id": uuid, "distance": distance}
+                item["_additional"] = {name: values.get(name) for name in additional.group(1).split()}
+                continue
+            reference = _REFERENCE_FIELD.match(field)
+            if reference:
+                name, target_class, subfields = reference.groups()
+                item[name] = self._resolve(data.get(name) or [], target_class, subfields.split())
+                continue
+            item[field] = data.get(field)
+        return item
+
+    def _resolve(self, references: List[dict], target_class: str, fields: List[str]) -> List[dict]:
+        """Follow weaviate://localhost/<class>/<uuid> beacons to the referenced objects"""
+        resolved = []
+        for reference in references:
+            uuid = reference.get("beacon", "").rsplit("/", 1)[-1]
+            row = self._conn.execute(
+                "SELECT properties FROM objects WHERE uuid = ? AND class = ?", (uuid, target_class)
+            ).fetchone()
+            if row:
+                resolved.append(self._project(uuid, json.loads(row[0]), fields))
+        return resolved
+
+    def create_batch_writer(self, on_complete: Callable[[List[str], Dict[str, str]], None] = None) -> "LocalBatchWriter":
+        return LocalBatchWriter(self, on_complete=on_complete)
+
+class LocalBatchWriter:
+    """
+    LocalBatchWriter writes objects to a LocalVectorIndex with the interface of
+    AdaptiveBatchWriter. Local writes are fast, so batches are written in the calling
+    thread; objects queued without a vector are vectorized by the configured embedder.
+    """
+    def __init__(
+        self,
+        index: LocalVectorIndex,
+        on_complete: Callable[[List[str], Dict[str, str]], None] = None,
+        batch_size: int = None
+    ) -> None:
+        self.index = index
+        self.on_complete = on_complete
+        self.batch_size = max(1, batch_size or settings.WEAVIATE_BATCH_MAX_SIZE)
+        self._buffer: List[tuple] = []
+        self._started = time.monotonic()
+        self.objects_sent = 0
+        self.objects_failed = 0
+        self.batches_sent = 0
+
+    def __enter__(self) -> "LocalBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add(
+        self,
+        record_id: str,
+        properties: dict,
+        uuid: str = None,
+        class_name: str = "Newsletter",
+        vector: Optional[List[float]] = None
+    ) -> None:
+        """Queue an object for writing, writing a batch once enough objects are buffered"""
+        self._buffer.append((record_id, class_name, uuid or str(uuid_lib.uuid4()), properties, vector))
+        if len(self._buffer) >= self.batch_size:
+            self._write()
+
+    def flush(self) -> None:
+        """Write all buffered objects"""
+        while self._buffer:
+            self._write()
+
+    def close(self) -> None:
+        self.flush()
+        stats = self.stats()
+        if stats["objects"]:
+            logger.info(
+                f"Local batch writer: {stats['objects']} objects in {stats['seconds']:.1f}s "
+                f"({stats['objects_per_sec']:.1f} objects/sec), {stats['failed']} failed"
+            )
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "objects": self.objects_sent,
+            "failed": self.objects_failed,
+            "batches": self.batches_sent,
+            "seconds": elapsed,
+            "objects_per_sec": self.objects_sent / elapsed,
+            "batch_size": self.batch_size,
+            "workers": 1
+        }
+
+    def _write(self) -> None:
+        batch = self._buffer[:self.batch_size]
+        self._buffer = self._buffer[self.batch_size:]
+        loaded_ids = []
+        added = {}
+        errors = {}
+        started = time.monotonic()
+        try:
+            vectors = [vector for *_, vector in batch]
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                texts = [document_text(batch[i][3], batch[i][1]) for i in missing]
+                for i, vector in zip(missing, get_document_vectors(texts)):
+                    vectors[i] = vector
+
+            by_class = {}
+            for (_, class_name, uuid, properties, _), vector in zip(batch, vectors):
+                by_class.setdefault(class_name, []).append((uuid, properties, vector))
+            for class_name, objects in by_class.items():
+                added[class_name] = self.index.upsert(class_name, objects)
+            loaded_ids = [record_id for record_id, *_ in batch]
+        except Exception as e:
+            logger.error(f"Local batch of {len(batch)} objects failed: {str(e)}")
+            errors = {record_id: f"Batch failure: {str(e)}" for record_id, *_ in batch}
+        BATCH_WRITE_SECONDS.labels("local").observe(time.monotonic() - started)
+        BATCH_OBJECTS.labels("local", "loaded" if loaded_ids else "failed").inc(len(batch))
+
+        if loaded_ids:
+            # New objects are searchable now, so cached search results are stale
+            IngestGeneration.bump()
+            get_service_monitor().objects_loaded(added)
+        try:
+            if self.on_complete:
+                self.on_complete(loaded_ids, errors)
+        except Exception as e:
+            logger.error(f"Batch completion callback failed: {str(e)}")
+        finally:
+            self.objects_sent += len(loaded_ids)
+            self.objects_failed += len(errors)
+            self.batches_sent += 1
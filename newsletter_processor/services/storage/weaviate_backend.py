@@ -0,0 +1,127 @@
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from .backend import StorageBackend
+from ..weaviate.batch_writer import AdaptiveBatchWriter
+from ..weaviate.client import get_weaviate_client
+
+logger = logging.getLogger(__name__)
+
+# Weaviate's default QUERY_MAXIMUM_RESULTS, the most objects a query returns
+_MAX_RESULTS = 10000
+
+class WeaviateBackend(StorageBackend):
+    """
+    WeaviateBackend is a class to store and search newsletters in a Weaviate instance.
+    Objects are written through Weaviate's batch endpoint, and queries without a
+    client-side vector fall back to the text2vec-transformers module's near_text.
+    """
+    name = "Weaviate"
+
+    def is_ready(self) -> bool:
+        try:
+            return bool(get_weaviate_client().is_ready())
+        except Exception as e:
+            logger.error(f"Error checking Weaviate readiness: {str(e)}")
+            return False
+
+    def init_schema(self) -> dict:
+        # Imported here, as the schema module connects to Weaviate on import
+        from ..weaviate.newsletter_schema import create_schema_if_not_exists
+        return create_schema_if_not_exists()
+
+    def count(self, class_name: str) -> int:
+        result = get_weaviate_client().query.aggregate(class_name).with_meta_count().do()
+        return result['data']['Aggregate'][class_name][0]['meta']['count']
+
+    def email_ids(self, class_name: str) -> Set[str]:
+        client = get_weaviate_client()
+        email_ids = set()
+        after = None
+        while True:
+            # The cursor API pages through a class of any size, where limit and offset stop at _MAX_RESULTS
+            query = client.query.get(class_name, ["email_id"]).with_additional(["id"]).with_limit(1000)
+            if after:
+                query = query.with_after(after)
+            items = query.do()['data']['Get'][class_name] or []
+            if not items:
+                return email_ids
+            email_ids.update(item["email_id"] for item in items if item.get("email_id"))
+            after = items[-1]["_additional"]["id"]
+
+    def recent(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        before: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> List[dict]:
+        items = []
+        # A keyset filter keeps deep pages cheap, where a large offset would not be
+        where = {"path": ["received_date"], "operator": "LessThanEqual", "valueDate": before} if before else None
+        if before and after_id is not None:
+            # email_id is word-tokenized, so Weaviate cannot range-filter on it. The objects
+            # received at before are few, so they are all fetched and filtered here instead
+            ties = self._recent(
+                class_name, list(dict.fromkeys([*properties, "email_id"])), _MAX_RESULTS,
+                {"path": ["received_date"], "operator": "Equal", "valueDate": before}
+            )
+            items = [item for item in ties if (item.get("email_id") or "") > after_id][:limit]
+            where = {"path": ["received_date"], "operator": "LessThan", "valueDate": before}
+        if len(items) < limit:
+            items += self._recent(class_name, properties, limit - len(items), where)
+        return items
+
+    def _recent(self, class_name: str, properties: List[str], limit: int, where: Optional[dict]) -> List[dict]:
+        query = get_weaviate_client().query.get(class_name, properties).with_sort([
+            {"path": ["received_date"], "order": "desc"},
+            # Objects received at the same time keep one order across pages
+            {"path": ["email_id"], "order": "asc"}
+        ]).with_limit(limit)
+        if where:
+            query = query.with_where(where)
+        result = query.do()
+        return result['data']['Get'][class_name] or []
+
+    def search(
+        self,
+        class_name: str,
+        properties: List[str],
+        limit: int,
+        vector: Optional[np.ndarray] = None,
+        text: Optional[str] = None,
+        offset: int = 0
+    ) -> List[dict]:
+        query = get_weaviate_client().query.get(class_name, properties)
+        if vector is not None:
+            query = query.with_near_vector({"vector": vector.tolist()})
+        else:
+            query = query.with_near_text({"concepts": [text]})
+        if offset:
+            query = query.with_offset(offset)
+        result = query.with_limit(limit).do()
+        return result['data']['Get'][class_name] or []
+
+    def search_many(self, class_name: str, queries: List[dict]) -> List[List[dict]]:
+        """All searches as one GraphQL request, each under its own alias"""
+        client = get_weaviate_client()
+        builders = []
+        for i, query in enumerate(queries):
+            builder = client.query.get(class_name, query["properties"]).with_alias(f"q{i}")
+            if query.get("vector") is not None:
+                builder = builder.with_near_vector({"vector": query["vector"].tolist()})
+            else:
+                builder = builder.with_near_text({"concepts": [query["text"]]})
+            if query.get("offset"):
+                builder = builder.with_offset(query["offset"])
+            builders.append(builder.with_limit(query["limit"]))
+        result = client.query.multi_get(builders).do()
+        if result.get("errors"):
+            raise RuntimeError(f"Batch search failed: {result['errors']}")
+        return [result['data']['Get'][f"q{i}"] or [] for i in range(len(queries))]
+
+    def create_batch_writer(self, on_complete: Callable[[List[str], Dict[str, str]], None] = None) -> AdaptiveBatchWriter:
+        return AdaptiveBatchWriter(on_complete=on_complete)
@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from ...core.config import get_settings
+from ...core.metrics import BATCH_OBJECTS, BATCH_WRITE_SECONDS
+from ..cache import IngestGeneration
+from ..monitor import get_service_monitor
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_session = requests.Session()
+
+def _headers() -> dict:
+    headers = {
+        "Content-Type": "application/json",
+        "X-OpenAI-Api-Key": settings.OPENAI_API_KEY
+    }
+    if settings.WEAVIATE_API_KEY:
+        headers["Authorization"] = f"Bearer {settings.WEAVIATE_API_KEY}"
+    return headers
+
+class AdaptiveBatchWriter:
+    """
+    AdaptiveBatchWriter sends objects to Weaviate's batch endpoint from a pool of
+    worker threads and tunes itself while it runs: batches and concurrency grow while
+    the vectorizer answers below the target latency, and are cut back when batches
+    get slow or fail. add() blocks while all allowed workers are busy, which pushes
+    backpressure up to the caller when the inference container falls behind.
+    Tuned values carry over to the next writer.
+    """
+    _tuned_batch_size: Optional[int] = None
+    _tuned_workers: Optional[int] = None
+
+    def __init__(
+        self,
+        on_complete: Callable[[List[str], Dict[str, str]], None] = None,
+        max_workers: int = None,
+        max_batch_size: int = None,
+        target_latency: float = None
+    ) -> None:
+        self.on_complete = on_complete
+        self.max_workers = max(1, max_workers or settings.WEAVIATE_BATCH_MAX_WORKERS)
+        self.max_batch_size = max(1, max_batch_size or settings.WEAVIATE_BATCH_MAX_SIZE)
+        self.min_batch_size = 1
+        self.target_latency = target_latency or settings.WEAVIATE_BATCH_TARGET_SECONDS
+        self.batch_size = min(self.max_batch_size, self._tuned_batch_size or settings.WEAVIATE_BATCH_INITIAL_SIZE)
+        self.workers = min(self.max_workers, self._tuned_workers or 1)
+        self.num_retries = 3
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="weaviate-batch")
+        self._buffer: List[tuple] = []
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._started = time.monotonic()
+        self.objects_sent = 0
+        self.objects_failed = 0
+        self.batches_sent = 0
+
+    def __enter__(self) -> "AdaptiveBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add(
+        self,
+        record_id: str,
+        properties: dict,
+        uuid: str = None,
+        class_name: str = "Newsletter",
+        vector: Optional[List[float]] = None
+    ) -> None:
+        """Queue an object for writing, sending a batch once enough objects are buffered"""
+        data_object = {"class": class_name, "properties": properties}
+        if uuid:
+            data_object["id"] = uuid
+        if vector is not None:
+            # Objects with a vector are stored as-is, without a vectorizer round trip
+            data_object["vector"] = vector
+        self._buffer.append((record_id, data_object))
+        if len(self._buffer) >= self.batch_size:
+            self._submit()
+
+    def _submit(self) -> None:
+        with self._condition:
+            # Backpressure: wait for a free worker slot
+            while self._in_flight >= self.workers:
+                self._condition.wait()
+            batch = self._buffer[:self.batch_size]
+            self._buffer = self._buffer[self.batch_size:]
+            self._in_flight += 1
+        self._executor.submit(self._send, batch)
+
+    def flush(self) -> None:
+        """Send all buffered objects and wait until every batch has completed"""
+        while self._buffer:
+            self._submit()
+        with self._condition:
+            while self._in_flight:
+                self._condition.wait()
+
+    def close(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+        AdaptiveBatchWriter._tuned_batch_size = self.batch_size
+        AdaptiveBatchWriter._tuned_workers = self.workers
+        stats = self.stats()
+        if stats["objects"]:
+            logger.info(
+                f"Batch writer: {stats['objects']} objects in {stats['seconds']:.1f}s "
+                f"({stats['objects_per_sec']:.1f} objects/sec), {stats['failed']} failed, "
+                f"batch size {stats['batch_size']}, workers {stats['workers']}"
+            )
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "objects": self.objects_sent,
+            "failed": self.objects_failed,
+            "batches": self.batches_sent,
+            "seconds": elapsed,
+            "objects_per_sec": self.objects_sent / elapsed,
+            "batch_size": self.batch_size,
+            "workers": self.workers
+        }
+
+    def _post(self, objects: List[dict]) -> List[dict]:
+        """POST one batch, retrying transport errors and overload responses with backoff"""
+        for attempt in range(self.num_retries + 1):
+            try:
+                response = _session.post(
+                    f"{settings.WEAVIATE_URL}/v1/batch/objects",
+                    json={"objects": objects},
+                    headers=_headers(),
+                    timeout=settings.WEAVIATE_BATCH_TIMEOUT_SECONDS
+                )
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.RequestException as e:
+                if isinstance(e, requests.HTTPError):
+                    raise
+                error = str(e)
+            if attempt < self.num_retries:
+                # Overloaded vectorizer: shrink before retrying
+                self._tune(latency=None, error_rate=1.0)
+                time.sleep(min(2 ** attempt, 30))
+        raise RuntimeError(f"Batch request failed after {self.num_retries} retries: {error}")
+
+    def _send(self, batch: List[tuple]) -> None:
+        loaded_ids = []
+        loaded_counts = {}
+        errors = {}
+        started = time.monotonic()
+        try:
+            results = self._post([data_object for _, data_object in batch])
+            for (record_id, data_object), result in zip(batch, results):
+                object_errors = (result.get("result") or {}).get("errors")
+                if object_errors:
+                    messages = [e.get("message", "") for e in object_errors.get("error", [])]
+                    errors[record_id] = "; ".join(messages) or "Unknown batch error"
+                else:
+                    loaded_ids.append(record_id)
+                    loaded_counts[data_object["class"]] = loaded_counts.get(data_object["class"], 0) + 1
+            self._tune(time.monotonic() - started, len(errors) / len(batch))
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} objects failed: {str(e)}")
+            errors = {record_id: f"Batch failure: {str(e)}" for record_id, _ in batch}
+            self._tune(latency=None, error_rate=1.0)
+        BATCH_WRITE_SECONDS.labels("weaviate").observe(time.monotonic() - started)
+        loaded_objects = sum(loaded_counts.values())
+        BATCH_OBJECTS.labels("weaviate", "loaded").inc(loaded_objects)
+        BATCH_OBJECTS.labels("weaviate", "failed").inc(len(batch) - loaded_objects)
+
+        if loaded_ids:
+            # New objects are searchable now, so cached search results are stale
+            IngestGeneration.bump()
+            # Overwritten objects are counted too, until the next probe corrects the counts
+            get_service_monitor().objects_loaded(loaded_counts)
+
+        try:
+            if self.on_complete:
+                self.on_complete(loaded_ids, errors)
+        except Exception as e:
+            logger.error(f"Batch completion callback failed: {str(e)}")
+        finally:
+            with self._condition:
+                self.objects_sent += len(loaded_ids)
+                self.objects_failed += len(errors)
+                self.batches_sent += 1
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _tune(self, latency: Optional[float], error_rate: float) -> None:
+        """Additive increase while batches are fast and clean, multiplicative decrease otherwise"""
+        with self._condition:
+            if latency is None or error_rate > 0.1 or latency > 2 * self.target_latency:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                self.workers = max(1, self.workers - 1)
+            elif latency < self.target_latency:
+                if self.workers < self.max_workers:
+                    self.workers += 1
+                else:
+                    self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+            logger.debug(
+                f"Batch tuning: latency={latency}, error_rate={error_rate:.2f}, "
+                f"batch_size={self.batch_size}, workers={self.workers}"
+            )
+            self._condition.notify_all()
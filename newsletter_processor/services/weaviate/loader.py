@@ -1,162 +1,272 @@
-import os
-import json
 import logging
-from typing import Set
-from .client import get_weaviate_client
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from weaviate.util import generate_uuid5
+from ..email.content_splitter import ContentSplitter
+from ..record_store import get_record_store
+from ..dedup import iter_unique
+from ..keyword_index import get_keyword_index
+from ..inference.vector_cache import document_text, get_document_vectors
+from ..storage.backend import get_storage_backend
+from ...core.config import get_settings
+from ...core.metrics import VECTORIZATION_ERRORS
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def get_existing_email_ids() -> Set[str]:
-    """Get set of email IDs already in Weaviate"""
-    client = get_weaviate_client()
-    try:
-        result = client.query.get(
-            "Newsletter", 
-            ["email_id", "_additional {id}"]
-        ).with_limit(10000).do()
-        
-        existing = set()
-        if result and 'data' in result and 'Get' in result['data']:
-            for item in result['data']['Get']['Newsletter']:
-                if 'email_id' in item and item['email_id']:
-                    existing.add(item['email_id'])
-                if '_additional' in item and 'id' in item['_additional']:
-                    existing.add(item['_additional']['id'])
-                    
-            logger.info(f"Found {len(existing)} unique identifiers in Weaviate (includes both email_ids and internal Weaviate IDs)")
-            
-            count_result = client.query.aggregate("Newsletter").with_meta_count().do()
-            total_count = count_result['data']['Aggregate']['Newsletter'][0]['meta']['count']
-            logger.info(f"Actual number of unique records in Weaviate: {total_count}")
-            
-        return existing
-    except Exception as e:
-        logger.warning(f"Error getting existing records: {e}")
-    
-    return set()
+_splitter = ContentSplitter()
 
-def load_data():
-    """Load newsletter data into Weaviate"""
-    client = get_weaviate_client()
-    
-    # Add diagnostic information
-    logger.info("Weaviate client information:")
-    logger.info(f"Client: {client.__class__.__module__}.{client.__class__.__name__}")
-    logger.info(f"Batch: {client.batch.__class__.__module__}.{client.batch.__class__.__name__}")
-    
-    data_path = os.path.abspath(os.path.join(os.getcwd(), 'data', 'newsletter_records.json'))
-    error_path = os.path.abspath(os.path.join(os.getcwd(), 'data', 'error_records.json'))
-    logger.info(f"Loading data from {data_path}")
-    
-    with open(data_path, 'r') as f:
-        data = json.load(f)
-    
-    # Load existing error records if any
-    error_records = {}
-    if os.path.exists(error_path):
+def newsletter_uuid(email_id: str) -> str:
+    """Deterministic object UUID for an email, so re-loading a record overwrites it"""
+    return generate_uuid5(email_id, "Newsletter")
+
+def section_uuid(email_id: str, index: int) -> str:
+    return generate_uuid5(f"{email_id}#{index}", "NewsletterSection")
+
+def make_snippet(text: str, length: int = None) -> str:
+    """The start of a text as a result preview, cut back to a word boundary when truncated"""
+    length = settings.SNIPPET_LENGTH if length is None else length
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    space = cut.rfind(" ")
+    # A single word longer than half the snippet is cut mid-word instead
+    if space > length // 2:
+        cut = cut[:space]
+    return cut.rstrip()
+
+def build_properties(d: dict) -> dict:
+    """Build the Weaviate properties of a record, raising ValueError if it cannot be loaded"""
+    text_content = ""
+    if 'sections' in d and d['sections']:
+        text_content = "\n\n".join(section.strip() for section in d['sections'] if section.strip())
+    elif 'body' in d and d['body']:
+        text_content = d['body']
+
+    if not text_content.strip():
+        raise ValueError("Empty content")
+
+    header = d.get('subject', '')
+    if not header and 'sections' in d and d['sections']:
+        header = d['sections'][0].strip()
+
+    if not header.strip():
+        raise ValueError("Empty header")
+
+    if not d.get("id"):
+        raise ValueError("Missing ID")
+
+    return {
+        "newsletter": d.get("from", "Unknown Newsletter").split('<')[0].strip(),
+        "sender": d.get("from", ""),
+        "header": header,
+        "received_date": d.get("date", ""),
+        "links": [],
+        "text_content": text_content,
+        "snippet": make_snippet(text_content),
+        "email_id": d.get("id", "")
+    }
+
+def build_section_properties(d: dict) -> List[Tuple[str, dict]]:
+    """Build (uuid, properties) of each section of a record, referencing its newsletter object"""
+    beacon = f"weaviate://localhost/Newsletter/{newsletter_uuid(d['id'])}"
+    sections = []
+    for index, section in enumerate(d.get('sections') or []):
+        parsed = _splitter.parse_section(section)
+        if not parsed["title"] and not parsed["description"]:
+            continue
+        sections.append((section_uuid(d['id'], index), {
+            "title": parsed["title"],
+            "description": parsed["description"],
+            "links": parsed["links"],
+            "section_index": index,
+            "received_date": d.get("date", ""),
+            "email_id": d['id'],
+            "parent": [{"beacon": beacon}]
+        }))
+    return sections
+
+class KeywordIndexer:
+    """
+    KeywordIndexer is a class to add newsletters to the keyword index only once the
+    batch writer has loaded them, so keyword and hybrid search never return records
+    that are missing from the vector store. Pass its on_complete to the batch writer;
+    it calls the wrapped callback with the same arguments. A record is indexed once
+    every one of its objects (the newsletter and its sections) has loaded, and
+    dropped if any of them fails.
+    """
+    def __init__(self, on_complete: Optional[Callable[[List[str], Dict[str, str]], None]] = None) -> None:
+        self._on_complete = on_complete
+        # record id -> (Newsletter properties, objects not loaded yet)
+        self._pending: Dict[str, Tuple[dict, int]] = {}
+        self._lock = threading.Lock()
+
+    def expect(self, record_id: str, properties: dict, objects: int) -> None:
+        with self._lock:
+            self._pending[record_id] = (properties, objects)
+
+    def on_complete(self, loaded_ids: List[str], errors: Dict[str, str]) -> None:
+        ready = []
+        with self._lock:
+            for record_id in errors:
+                self._pending.pop(record_id, None)
+            # Records loaded as several objects are reported once per object
+            for record_id in loaded_ids:
+                if record_id not in self._pending:
+                    continue
+                properties, remaining = self._pending[record_id]
+                if remaining > 1:
+                    self._pending[record_id] = (properties, remaining - 1)
+                else:
+                    del self._pending[record_id]
+                    ready.append(properties)
+        index_keywords(ready)
+        if self._on_complete:
+            self._on_complete(loaded_ids, errors)
+
+def add_records(writer, records: List[dict], keywords: Optional[KeywordIndexer] = None) -> Dict[str, str]:
+    """
+    Queue records on a storage backend's batch writer, attaching client-side vectors when enabled.
+    With INGEST_SECTIONS, each section is also queued as its own object under the
+    record's id, so the record only counts as loaded once all its objects are.
+    Given the KeywordIndexer the writer reports to, newsletters are added to the
+    keyword index as they load. Returns a mapping of ids that cannot be loaded to error messages.
+    """
+    errors = {}
+    # (record id, class name, uuid, properties) of every object to write
+    objects = []
+    for d in records:
         try:
-            with open(error_path, 'r') as f:
-                error_records = json.load(f)
+            properties = build_properties(d)
+        except ValueError as e:
+            logger.warning(f"Skipping record {d.get('id', 'unknown')}: {e}")
+            if d.get('id'):
+                errors[d['id']] = str(e)
+            continue
+        record_objects = [(d['id'], "Newsletter", newsletter_uuid(d['id']), properties)]
+        if settings.INGEST_SECTIONS:
+            record_objects.extend(
+                (d['id'], "NewsletterSection", uuid, section_properties)
+                for uuid, section_properties in build_section_properties(d)
+            )
+        if keywords is not None:
+            keywords.expect(d['id'], properties, len(record_objects))
+        objects.extend(record_objects)
+
+    vectors = [None] * len(objects)
+    if settings.CLIENT_SIDE_VECTORS and objects:
+        try:
+            # Newsletters and their sections are vectorized together, in parallel requests
+            texts = [document_text(properties, class_name) for _, class_name, _, properties in objects]
+            vectors = [vector.tolist() for vector in get_document_vectors(texts)]
         except Exception as e:
-            logger.warning(f"Could not load error records: {e}")
-    
-    logger.info(f"Found {len(data)} newsletter records in the JSON file")
-    logger.info(f"Found {len(error_records)} existing error records")
-    
-    # Get records actually in Weaviate
-    existing_ids = get_existing_email_ids()
-    logger.info(f"Found {len(existing_ids)} existing identifiers in Weaviate database")
-    
-    # Include both records not in Weaviate and records that previously errored
-    new_records = [d for d in data if d['id'] not in existing_ids or d['id'] in error_records]
-    logger.info(f"Will attempt to load {len(new_records)} records (not in Weaviate or previously errored)")
+            VECTORIZATION_ERRORS.labels("document").inc()
+            # The backend still vectorizes objects without a vector (Weaviate with its own module)
+            logger.warning(f"Client-side vectorization failed, leaving it to the storage backend: {str(e)}")
 
-    if not new_records:
-        logger.info("No new records to load")
-        if error_records:
-            # Clear error records since everything is loaded
-            with open(error_path, 'w') as f:
-                json.dump({}, f)
-        return
+    for (record_id, class_name, uuid, properties), vector in zip(objects, vectors):
+        writer.add(record_id, properties, uuid=uuid, class_name=class_name, vector=vector)
+    return errors
 
-    successful_imports = 0
-    current_errors = {}
-    
+def index_keywords(newsletters: List[dict]) -> None:
+    """Add Newsletter properties to the keyword index; a failure there does not fail the load"""
+    if not settings.KEYWORD_INDEX_ENABLED or not newsletters:
+        return
     try:
-        with client.batch(
-            batch_size=2,
-            dynamic=True,
-            num_workers=1,
-            num_retries=3
-        ) as batch:
-            logger.debug("Successfully initialized batch context")
-            for d in new_records:
-                try:
-                    text_content = ""
-                    if 'sections' in d and d['sections']:
-                        text_content = "\n\n".join(section.strip() for section in d['sections'] if section.strip())
-                    elif 'body' in d and d['body']:
-                        text_content = d['body']
-
-                    if not text_content.strip():
-                        logger.warning(f"Skipping record {d.get('id', 'unknown')} due to empty content")
-                        current_errors[d['id']] = "Empty content"
-                        continue
-
-                    header = d.get('subject', '')
-                    if not header and 'sections' in d and d['sections']:
-                        header = d['sections'][0].strip()
-
-                    if not header.strip():
-                        logger.warning(f"Skipping record {d.get('id', 'unknown')} due to empty header")
-                        current_errors[d['id']] = "Empty header"
-                        continue
-
-                    properties = {
-                        "newsletter": d.get("from", "Unknown Newsletter").split('<')[0].strip(),
-                        "sender": d.get("from", ""),
-                        "header": header,
-                        "received_date": d.get("date", ""),
-                        "links": [],
-                        "text_content": text_content,
-                        "email_id": d.get("id", "")
-                    }
-                    
-                    if not properties["email_id"]:
-                        logger.warning(f"Skipping record due to missing ID")
-                        current_errors[d['id']] = "Missing ID"
-                        continue
-                        
-                    batch.add_data_object(
-                        data_object=properties,
-                        class_name="Newsletter"
-                    )
-                    successful_imports += 1
-                    
-                    if successful_imports % 10 == 0:
-                        logger.info(f"Progress: {successful_imports}/{len(new_records)} records processed")
-                        
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f"Error importing record {d.get('id', 'unknown')}: {error_msg}")
-                    current_errors[d['id']] = error_msg
+        get_keyword_index().add(newsletters)
+    except Exception as e:
+        logger.warning(f"Keyword indexing failed: {str(e)}")
+
+# Held while a backfill runs, so the startup job and a load do not both run one
+_backfill_lock = threading.Lock()
 
+def backfill_keyword_index(store=None) -> None:
+    """
+    Index the records loaded before the keyword index existed. New records are indexed
+    as they load, so the index is never empty after an upgrade; a marker in the index
+    records that the backfill completed instead.
+    """
+    if not settings.KEYWORD_INDEX_ENABLED:
+        return
+    index = get_keyword_index()
+    if index.is_backfilled() or not _backfill_lock.acquire(blocking=False):
+        return
+    try:
+        store = store or get_record_store()
+        indexed = 0
+        batch = []
+        for d in store.iter_embedded():
+            try:
+                batch.append(build_properties(d))
+            except ValueError:
+                continue
+            if len(batch) >= 500:
+                indexed += index.add(batch)
+                batch = []
+        indexed += index.add(batch)
+        index.mark_backfilled()
+        logger.info(f"Keyword index backfilled with {indexed} records")
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Batch processing failed: {error_msg}")
-        # Add all remaining records to errors
-        for d in new_records[successful_imports:]:
-            current_errors[d['id']] = f"Batch failure: {error_msg}"
+        logger.warning(f"Keyword index backfill failed, retrying with the next load: {str(e)}")
     finally:
-        # Update error records file
-        if current_errors:
-            with open(error_path, 'w') as f:
-                json.dump(current_errors, f, indent=2)
-        elif os.path.exists(error_path):
-            # If no errors and file exists, clear it
-            with open(error_path, 'w') as f:
-                json.dump({}, f)
-                
-        logger.info(f"Import summary:")
-        logger.info(f"- Successfully embedded: {successful_imports}")
-        logger.info(f"- Failed records: {len(current_errors)}")
\ No newline at end of file
+        _backfill_lock.release()
+
+def load_records(records: Iterable[dict], total: int = None) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Load records with the storage backend's batch writer.
+    Returns the ids that were loaded and a mapping of failed ids to error messages.
+    """
+    # Records with sections are reported once per object, so ids are kept in a dict
+    loaded_ids = {}
+    current_errors = {}
+
+    def on_complete(batch_loaded: List[str], batch_errors: Dict[str, str]) -> None:
+        loaded_ids.update(dict.fromkeys(batch_loaded))
+        current_errors.update(batch_errors)
+        if total:
+            logger.info(f"Progress: {len(loaded_ids)}/{total} records processed")
+
+    keywords = KeywordIndexer(on_complete)
+    with get_storage_backend().create_batch_writer(on_complete=keywords.on_complete) as writer:
+        batch = []
+        for d in records:
+            batch.append(d)
+            if len(batch) >= settings.VECTORIZE_BATCH_SIZE:
+                current_errors.update(add_records(writer, batch, keywords))
+                batch = []
+        if batch:
+            current_errors.update(add_records(writer, batch, keywords))
+
+    # A record is loaded only if none of its objects failed
+    return [record_id for record_id in loaded_ids if record_id not in current_errors], current_errors
+
+def load_data() -> dict:
+    """Load pending newsletter records into the storage backend, returning how many loaded and failed"""
+    store = get_record_store()
+    backfill_keyword_index(store)
+    
+    # Records that were never embedded or previously errored are still pending
+    pending_count = store.count_pending()
+    logger.info(f"Found {pending_count} pending records in {store.path}")
+    logger.info(f"Found {len(store.get_errors())} existing error records")
+
+    if not pending_count:
+        logger.info("No new records to load")
+        return {"pending": 0, "embedded": 0, "failed": 0}
+
+    # Objects have deterministic UUIDs, so re-sending a record that is already
+    # stored is an idempotent upsert and no existence check is needed
+    duplicates_before = store.count_duplicates()
+    loaded_ids, current_errors = load_records(iter_unique(store.iter_pending(), store), total=pending_count)
+
+    # Update the record store; errored records stay pending for the next load
+    store.mark_embedded(loaded_ids)
+    if current_errors:
+        store.mark_errors(current_errors)
+            
+    logger.info(f"Import summary:")
+    logger.info(f"- Successfully embedded: {len(loaded_ids)}")
+    logger.info(f"- Failed records: {len(current_errors)}")
+    logger.info(f"- Duplicates skipped: {store.count_duplicates() - duplicates_before}")
+    return {"pending": pending_count, "embedded": len(loaded_ids), "failed": len(current_errors)}
@@ -9,24 +9,54 @@ logger = logging.getLogger(__name__)
 client = get_weaviate_client()
 
 def clear_schema():
-    """Delete the Newsletter class if it exists"""
+    """Delete the Newsletter and NewsletterSection classes if they exist"""
     try:
-        if client.schema.exists("Newsletter"):
-            client.schema.delete_class("Newsletter")
-            logger.info("Deleted existing Newsletter schema")
+        # Sections reference newsletters, so they go first
+        for class_name in ("NewsletterSection", "Newsletter"):
+            if client.schema.exists(class_name):
+                client.schema.delete_class(class_name)
+                logger.info(f"Deleted existing {class_name} schema")
     except Exception as e:
         logger.error(f"Error clearing schema: {e}")
 
+# Precomputed at load time, so results need not fetch the full text_content
+SNIPPET_PROPERTY = {
+    "name": "snippet",
+    "description": "The start of the text content, shown as a result preview.",
+    "dataType": ["text"],
+    "moduleConfig": {
+        "text2vec-transformers": {
+            "skip": True,
+            "vectorizePropertyName": False
+        }
+    }
+}
+
+def add_missing_properties(schema: dict):
+    """Add properties introduced after the Newsletter class was created"""
+    for class_obj in schema.get("classes", []):
+        if class_obj["class"] != "Newsletter":
+            continue
+        names = {prop["name"] for prop in class_obj.get("properties") or []}
+        if SNIPPET_PROPERTY["name"] not in names:
+            # Objects loaded before this get their snippet when they are re-loaded
+            logger.info("Adding snippet property to Newsletter schema")
+            client.schema.property.create("Newsletter", SNIPPET_PROPERTY)
+
 def create_schema_if_not_exists():
-    # Check if schema exists
+    # Check which classes exist
+    existing = set()
     try:
         schema = client.schema.get()
-        if any(class_obj["class"] == "Newsletter" for class_obj in schema["classes"]):
-            logger.info("Newsletter schema already exists")
-            return {"status": "success", "message": "Newsletter schema already exists"}
+        existing = {class_obj["class"] for class_obj in schema["classes"]}
+        add_missing_properties(schema)
     except Exception as e:
         logger.warning(f"Error checking schema: {e}")
 
+    if "Newsletter" in existing and "NewsletterSection" in existing:
+        logger.info("Newsletter schema already exists")
+        return {"status": "success", "message": "Newsletter schema already exists"}
+
     # Create schema only if it doesn't exist
     newsletter_class_obj = {
         "class": "Newsletter",
@@ -91,12 +121,71 @@ def create_schema_if_not_exists():
                         "vectorizePropertyName": False
                     }
                 }
+            },
+            SNIPPET_PROPERTY
+        ]
+    }
+
+    section_class_obj = {
+        "class": "NewsletterSection",
+        "description": "A single section of a newsletter",
+        "vectorizer": "text2vec-transformers",
+        "properties": [
+            {
+                "name": "title",
+                "description": "The title of the section.",
+                "dataType": ["text"]
+            },
+            {
+                "name": "description",
+                "description": "The text of the section.",
+                "dataType": ["text"]
+            },
+            {
+                "name": "links",
+                "description": "The links in the section.",
+                "dataType": ["string[]"],
+                "moduleConfig": {
+                    "text2vec-transformers": {
+                        "skip": True,
+                        "vectorizePropertyName": False
+                    }
+                }
+            },
+            {
+                "name": "section_index",
+                "description": "Position of the section in the newsletter.",
+                "dataType": ["int"]
+            },
+            {
+                "name": "received_date",
+                "description": "The date when the newsletter was received.",
+                "dataType": ["date"]
+            },
+            {
+                "name": "email_id",
+                "description": "ID of the email the section belongs to.",
+                "dataType": ["string"],
+                "moduleConfig": {
+                    "text2vec-transformers": {
+                        "skip": True,
+                        "vectorizePropertyName": False
+                    }
+                }
+            },
+            {
+                "name": "parent",
+                "description": "The newsletter the section belongs to.",
+                "dataType": ["Newsletter"]
             }
         ]
     }
 
-    logger.info("Creating Newsletter schema")
-    client.schema.create_class(newsletter_class_obj)
+    # The section class references Newsletter, so it is created second
+    for class_obj in (newsletter_class_obj, section_class_obj):
+        if class_obj["class"] not in existing:
+            logger.info(f"Creating {class_obj['class']} schema")
+            client.schema.create_class(class_obj)
     return {"status": "success", "message": "Schema created successfully"}
 
 if __name__ == "__main__":
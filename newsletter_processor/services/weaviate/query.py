@@ -1,52 +1,323 @@
+import base64
 import json
+import logging
 from datetime import datetime
-from .client import get_weaviate_client
+from ..storage.backend import get_storage_backend
+from ..cache import IngestGeneration, get_search_cache, normalize_query
+from ..inference.client import normalize_text
+from ..inference.query_cache import get_query_vector_cache
+from ..keyword_index import get_keyword_index
+from ...core.config import get_settings
+from ...core.metrics import VECTORIZATION_ERRORS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Define all available fields
-NEWSLETTER_FIELDS = ["newsletter", "sender", "header", "received_date", "links", "text_content", "email_id"]
+NEWSLETTER_FIELDS = ["newsletter", "sender", "header", "received_date", "links", "text_content", "snippet", "email_id"]
+
+# Returned when no fields are requested; the snippet stands in for the full text
+DEFAULT_FIELDS = ["header", "snippet", "received_date"]
+
+SECTION_FIELDS = [
+    "title", "description", "links", "section_index", "received_date", "email_id",
+    "parent { ... on Newsletter { header newsletter received_date } }",
+    "_additional { distance }"
+]
+
+# Sections fetched per requested newsletter group
+SECTIONS_PER_GROUP = 5
+
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+
+# Candidates each ranking contributes to hybrid search, per requested result
+HYBRID_CANDIDATES_PER_RESULT = 4
+
+# Reciprocal rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = 60
 
 def get_total_count():
     """Get the total number of records in the Newsletter class"""
-    client = get_weaviate_client()
-    result = client.query.aggregate("Newsletter").with_meta_count().do()
-    count = result['data']['Aggregate']['Newsletter'][0]['meta']['count']
-    return count
+    return get_storage_backend().count("Newsletter")
+
+def encode_cursor(position):
+    """Opaque page cursor for a position in a result list"""
+    data = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """The position of a cursor from encode_cursor; no cursor is the first page"""
+    if not cursor:
+        return {}
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+def _validate_fields(fields):
+    """The requested Newsletter fields, DEFAULT_FIELDS when none are, raising ValueError for unknown ones"""
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    unknown = [field for field in fields if field not in NEWSLETTER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+def _format_record(item, fields):
+    return {field: item.get(field) for field in fields}
 
 def get_recent_records(limit=5):
-    """Get the most recent newsletter records"""
-    client = get_weaviate_client()
-    result = client.query.get(
-        "Newsletter", 
-        ["newsletter", "header", "received_date", "sender", "text_content"]
-    ).with_sort({"path": ["received_date"], "order": "desc"}).with_limit(limit).do()
-    
-    return [
-        {
-            "header": item["header"],
-            "received_date": item["received_date"],
-            "text_content": item.get("text_content", "")[:500]  # First 500 chars
-        }
-        for item in result['data']['Get']['Newsletter']
-    ]
-
-def search_by_text(search_term, fields=None, limit=3):
-    """Search newsletters by content"""
-    client = get_weaviate_client()
-    if fields is None:
-        fields = ["header", "text_content", "received_date"]
-    
-    result = client.query.get(
-        "Newsletter", 
-        fields
-    ).with_near_text({
-        "concepts": [search_term]
-    }).with_limit(limit).do()
-    
-    return [
-        {
-            "header": item["header"],
-            "received_date": item["received_date"],
-            "text_content": item.get("text_content", "")[:500]  # First 500 chars
-        }
-        for item in result['data']['Get']['Newsletter']
-    ] 
\ No newline at end of file
+    """Get the most recent newsletter records, served from the result cache when possible"""
+    return get_recent_page(limit)[0]
+
+def get_recent_page(limit=5, cursor=None, fields=None):
+    """
+    A page of the most recent newsletter records and the cursor of the next page
+    (None after the last page), served from the result cache when possible
+    """
+    fields = _validate_fields(fields)
+    key = ("recent", limit, cursor, tuple(fields), IngestGeneration.get())
+    return get_search_cache().get_or_compute(key, lambda: _get_recent_page(limit, cursor, fields))
+
+def iter_recent_records(limit=None, cursor=None, page_size=None, fields=None):
+    """
+    Stream the most recent newsletter records a page at a time, up to limit records
+    (all of them by default). Pages bypass the result cache, so exports do not evict
+    cached searches.
+    """
+    page_size = page_size or settings.STREAM_PAGE_SIZE
+    fields = _validate_fields(fields)
+    decode_cursor(cursor)  # Fail before streaming starts
+
+    def records():
+        page_cursor = cursor
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            page, page_cursor = _get_recent_page(size, page_cursor, fields)
+            yield from page
+            if remaining is not None:
+                remaining -= len(page)
+            if page_cursor is None:
+                return
+    return records()
+
+def _get_recent_page(limit, cursor, fields=DEFAULT_FIELDS):
+    # Pages are keyed by (date, email_id), not offset, so deep pages stay as cheap as the first
+    # and records received at the same time are neither repeated nor skipped
+    position = decode_cursor(cursor)
+    before, after_id = position.get("before"), position.get("after_id")
+    if (before is None) != (after_id is None):
+        raise ValueError("Invalid cursor")
+    items = get_storage_backend().recent(
+        "Newsletter",
+        # received_date and email_id position the next page even when they are not returned
+        list(dict.fromkeys([*fields, "received_date", "email_id"])),
+        limit,
+        before=before,
+        after_id=after_id
+    )
+
+    next_cursor = None
+    if items and len(items) >= limit:
+        last = items[-1]
+        next_cursor = encode_cursor({"before": last["received_date"], "after_id": last["email_id"]})
+    return [_format_record(item, fields) for item in items], next_cursor
+
+def _prepare_search(search_term, fields=None, limit=3, mode="vector", cursor=None):
+    """Validated search arguments and the search's result cache key"""
+    fields = _validate_fields(fields)
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if mode != "vector" and not settings.KEYWORD_INDEX_ENABLED:
+        raise ValueError(f"Search mode {mode} needs the keyword index (KEYWORD_INDEX_ENABLED)")
+    offset = decode_cursor(cursor).get("offset", 0)
+    # Keys normalize queries like the query vector does, keeping case the model ranks by;
+    # only keyword search, whose index folds case, shares entries across case
+    query_key = normalize_query(search_term) if mode == "keyword" else normalize_text(search_term)
+    # The generation in the key keeps results computed before a load from being reused
+    key = ("search", mode, query_key, tuple(fields), limit, offset, IngestGeneration.get())
+    return search_term, fields, limit, mode, offset, key
+
+def search_by_text(search_term, fields=None, limit=3, mode="vector"):
+    """
+    Search newsletters by content, served from the result cache when possible.
+    mode is "vector" (semantic), "keyword" (BM25 over exact terms) or "hybrid"
+    (both rankings fused by reciprocal rank).
+    """
+    return search_page(search_term, fields, limit, mode)[0]
+
+def search_page(search_term, fields=None, limit=3, mode="vector", cursor=None):
+    """A page of search_by_text results and the cursor of the next page (None after the last page)"""
+    search_term, fields, limit, mode, offset, key = _prepare_search(search_term, fields, limit, mode, cursor)
+    results = get_search_cache().get_or_compute(key, lambda: _search_by_text(search_term, fields, limit, mode, offset))
+    return results, _next_search_cursor(results, limit, offset)
+
+def iter_search_results(search_term, fields=None, limit=3, mode="vector", cursor=None, page_size=None):
+    """Stream search_by_text results a page at a time, up to limit results, bypassing the result cache"""
+    page_size = page_size or settings.STREAM_PAGE_SIZE
+    search_term, fields, limit, mode, offset, _ = _prepare_search(search_term, fields, limit, mode, cursor)
+
+    def results():
+        page_offset = offset
+        while page_offset < offset + limit:
+            size = min(page_size, offset + limit - page_offset)
+            page = _search_by_text(search_term, fields, size, mode, page_offset)
+            yield from page
+            if len(page) < size:
+                return
+            page_offset += size
+    return results()
+
+def _next_search_cursor(results, limit, offset):
+    # Ranked results have no stable key to resume from, so search cursors are offsets
+    return encode_cursor({"offset": offset + limit}) if results and len(results) >= limit else None
+
+def search_many(searches):
+    """
+    Run several newsletter searches, each a dict of search_page arguments, and
+    return their results in order. Identical searches run once and cached results
+    are reused; the query texts of the rest are vectorized together, as concurrent
+    single-text requests to the inference container (it has no batch endpoint),
+    and their vector searches are sent to the storage backend as one request.
+    """
+    prepared = [_prepare_search(**search) for search in searches]
+    cache = get_search_cache()
+    results = {}
+    pending = {}
+    missing = object()
+    for *args, key in prepared:
+        if key in results or key in pending:
+            continue
+        value = cache.get(key, missing)
+        if value is missing:
+            pending[key] = tuple(args)
+        else:
+            results[key] = value
+
+    vector_items = {}
+    vector_searches = [(key, args) for key, args in pending.items() if args[3] != "keyword"]
+    if vector_searches:
+        vectors = _query_vectors([args[0] for _, args in vector_searches])
+        queries = [_vector_query(*args, vector) for (_, args), vector in zip(vector_searches, vectors)]
+        found = _run_vector_searches(queries, hybrid_only=all(args[3] == "hybrid" for _, args in vector_searches))
+        vector_items = {key: items for (key, _), items in zip(vector_searches, found)}
+
+    for key, args in pending.items():
+        results[key] = _finish_search(*args, vector_items.get(key))
+        cache.set(key, results[key])
+    return [results[key] for *_, key in prepared]
+
+def _query_vector(search_term):
+    """The query's vector, or None to leave vectorizing the text to the storage backend"""
+    try:
+        # Cached query vectors let repeated queries skip the inference container
+        return get_query_vector_cache().get_vector(search_term)
+    except Exception as e:
+        VECTORIZATION_ERRORS.labels("query").inc()
+        logger.warning(f"Query vectorization failed, falling back to near_text: {str(e)}")
+        return None
+
+def _query_vectors(search_terms):
+    """The vectors of several queries, vectorized concurrently, or Nones as in _query_vector"""
+    try:
+        return get_query_vector_cache().get_vectors(search_terms)
+    except Exception as e:
+        VECTORIZATION_ERRORS.labels("query").inc(len(search_terms))
+        logger.warning(f"Query vectorization failed, falling back to near_text: {str(e)}")
+        return [None] * len(search_terms)
+
+def reciprocal_rank_fusion(rankings, key="email_id", k=RRF_K):
+    """Merge rankings by the sum of 1 / (k + rank) of each item over the rankings it appears in"""
+    scores = {}
+    items = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = item.get(key)
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+    return [items[item_key] for item_key in sorted(scores, key=scores.get, reverse=True)]
+
+def _hybrid_fields(fields):
+    return list(dict.fromkeys([*fields, "email_id"]))
+
+def _hybrid_depth(limit, offset):
+    # Rankings go deeper than the page, so documents both rank well rise to the top
+    return (offset + limit) * HYBRID_CANDIDATES_PER_RESULT
+
+def _vector_query(search_term, fields, limit, mode, offset, vector):
+    """The storage backend query for the vector side of a search"""
+    if mode == "hybrid":
+        # Fusion ranks from the top, so the page is cut from the fused list instead
+        return {"properties": _hybrid_fields(fields), "limit": _hybrid_depth(limit, offset), "vector": vector, "text": search_term}
+    return {"properties": fields, "limit": limit, "vector": vector, "text": search_term, "offset": offset}
+
+def _run_vector_searches(queries, hybrid_only=False):
+    """Results of backend queries; hybrid searches fall back to keyword results alone on failure"""
+    backend = get_storage_backend()
+    try:
+        if len(queries) == 1:
+            return [backend.search("Newsletter", **queries[0])]
+        return backend.search_many("Newsletter", queries)
+    except Exception as e:
+        if not hybrid_only:
+            raise
+        logger.warning(f"Vector search failed, returning keyword results only: {str(e)}")
+        return [[] for _ in queries]
+
+def _finish_search(search_term, fields, limit, mode, offset, vector_items):
+    """Search results from the search's vector results (None for keyword searches)"""
+    if mode == "keyword":
+        # Answered from the local index, without a query vector
+        items = get_keyword_index().search(search_term, fields, limit, offset)
+    elif mode == "hybrid":
+        keyword = get_keyword_index().search(search_term, _hybrid_fields(fields), _hybrid_depth(limit, offset))
+        items = reciprocal_rank_fusion([vector_items, keyword])[offset:offset + limit]
+    else:
+        items = vector_items
+    return [_format_record(item, fields) for item in items]
+
+def _search_by_text(search_term, fields, limit, mode="vector", offset=0):
+    vector_items = None
+    if mode != "keyword":
+        query = _vector_query(search_term, fields, limit, mode, offset, _query_vector(search_term))
+        vector_items = _run_vector_searches([query], hybrid_only=mode == "hybrid")[0]
+    return _finish_search(search_term, fields, limit, mode, offset, vector_items)
+
+def search_sections(search_term, limit=3):
+    """Search newsletter sections, grouped by newsletter, served from the result cache when possible"""
+    key = ("sections", normalize_text(search_term), limit, IngestGeneration.get())
+    return get_search_cache().get_or_compute(key, lambda: _search_sections(search_term, limit))
+
+def _search_sections(search_term, limit):
+    items = get_storage_backend().search(
+        "NewsletterSection", SECTION_FIELDS, limit * SECTIONS_PER_GROUP,
+        vector=_query_vector(search_term), text=search_term
+    )
+
+    # Sections arrive best match first, so groups are ordered by their best section
+    groups = {}
+    for item in items:
+        group = groups.get(item["email_id"])
+        if group is None:
+            if len(groups) >= limit:
+                continue
+            parent = (item.get("parent") or [{}])[0]
+            group = groups[item["email_id"]] = {
+                "email_id": item["email_id"],
+                "header": parent.get("header", ""),
+                "newsletter": parent.get("newsletter"),
+                "received_date": parent.get("received_date") or item["received_date"],
+                "sections": []
+            }
+        group["sections"].append({
+            "title": item["title"],
+            "description": item.get("description", ""),
+            "links": item.get("links") or [],
+            "section_index": item.get("section_index"),
+            "distance": (item.get("_additional") or {}).get("distance")
+        })
+    return list(groups.values())
@@ -0,0 +1,113 @@
+"""
+Benchmark of the storage backends on a synthetic corpus: load throughput, query
+latency and, for approximate search, recall against the exact local scan.
+
+    python scripts/benchmark_backends.py --docs 20000 --queries 500
+    python scripts/benchmark_backends.py --backends local,local-hnsw,weaviate
+
+Vectors come from the deterministic hashing embedder, so runs are repeatable and
+need no inference container. The service configuration (.env) is read as usual;
+the weaviate backend writes into the Newsletter class at WEAVIATE_URL, so point it
+at a scratch instance. local-hnsw needs hnswlib (poetry install -E hnsw).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from newsletter_processor.services.inference.embedder import HashingEmbedder
+from newsletter_processor.services.storage.backend import StorageBackend
+
+TOPICS = [
+    "transformer attention", "robot grasping", "protein folding", "chip exports", "agent benchmarks",
+    "open weights", "inference latency", "fine tuning", "startup funding", "context windows"
+]
+WORDS = "the model data new release paper research open source training evaluation cluster weights".split()
+
+def document(rng: random.Random, i: int) -> dict:
+    topic = rng.choice(TOPICS)
+    text = " ".join([topic] + [rng.choice(WORDS) for _ in range(rng.randint(40, 120))] + [topic])
+    return {
+        "newsletter": "Benchmark Weekly",
+        "sender": "Benchmark Weekly <bench@example.com>",
+        "header": f"Benchmark issue {i}: {topic}",
+        "received_date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T08:00:00+00:00",
+        "links": [],
+        "text_content": text,
+        "email_id": f"benchmark-{i}"
+    }
+
+def create_backend(name: str) -> StorageBackend:
+    if name == "weaviate":
+        from newsletter_processor.services.storage.weaviate_backend import WeaviateBackend
+        backend = WeaviateBackend()
+        backend.init_schema()
+        return backend
+    from newsletter_processor.services.storage.local_backend import LocalVectorIndex, hnswlib
+    if name == "local-hnsw" and hnswlib is None:
+        raise SystemExit("local-hnsw needs hnswlib")
+    return LocalVectorIndex(tempfile.mkdtemp(prefix="local-index-"), use_hnsw=name == "local-hnsw")
+
+def load(backend: StorageBackend, documents: list[dict], vectors: np.ndarray) -> float:
+    from weaviate.util import generate_uuid5
+    started = time.perf_counter()
+    with backend.create_batch_writer() as writer:
+        for properties, vector in zip(documents, vectors):
+            uuid = generate_uuid5(properties["email_id"], "Newsletter")
+            writer.add(properties["email_id"], properties, uuid=uuid, vector=vector.tolist())
+    return time.perf_counter() - started
+
+def query(backend: StorageBackend, queries: np.ndarray, limit: int) -> tuple[list[float], list[list[str]]]:
+    # The first query builds the HNSW graph, so it is not timed
+    backend.search("Newsletter", ["email_id"], limit, vector=queries[0])
+    latencies, results = [], []
+    for vector in queries:
+        started = time.perf_counter()
+        items = backend.search("Newsletter", ["email_id"], limit, vector=vector)
+        latencies.append(time.perf_counter() - started)
+        results.append([item["email_id"] for item in items])
+    return latencies, results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10_000, help="Number of synthetic newsletters")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed queries")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimensions")
+    parser.add_argument("--backends", default="local", help="Comma-separated: local, local-hnsw, weaviate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    embedder = HashingEmbedder(args.dim)
+    documents = [document(rng, i) for i in range(args.docs)]
+    vectors = np.asarray(embedder.vectorize_many([d["text_content"] for d in documents]), dtype=np.float32)
+    terms = [f"{rng.choice(TOPICS)} {rng.choice(WORDS)}" for _ in range(args.queries)]
+    queries = np.asarray(embedder.vectorize_many(terms), dtype=np.float32)
+    print(f"Corpus: {args.docs} newsletters, {args.queries} queries, {args.dim} dimensions")
+
+    exact = None
+    for name in args.backends.split(","):
+        backend = create_backend(name.strip())
+        load_seconds = load(backend, documents, vectors)
+        latencies, results = query(backend, queries, args.limit)
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        line = (
+            f"{name:<11} load {load_seconds:7.2f}s ({args.docs / load_seconds:8.0f} docs/sec)  "
+            f"query p50 {p50:7.2f}ms  p95 {p95:7.2f}ms"
+        )
+        if name == "local":
+            exact = results
+        elif exact is not None:
+            recall = np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(results, exact)])
+            line += f"  recall@{args.limit} {recall:.3f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
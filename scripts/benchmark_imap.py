@@ -0,0 +1,93 @@
+"""
+Benchmark of an IMAP sync against a local fake IMAP server: commands sent,
+bytes received and wall time of the previous one-message-per-command sync,
+the bulk full (RFC822) fetch and the bulk lean (text/plain only) fetch.
+
+    python scripts/benchmark_imap.py --messages 500 --chunk-size 50
+    python scripts/benchmark_imap.py --messages 200 --latency-ms 20
+
+The fake server lives in tests/fake_imap.py. With --latency-ms every command
+waits that long before it is answered, as a remote server would, so round
+trips show up in the timings. Needs the service configuration (.env) only for
+its required settings; nothing is written to the record store or sync state.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from newsletter_processor.services.email.email_fetcher import EmailFetcher
+from newsletter_processor.services.record_store import RecordStore
+from tests import fake_imap
+from tests.fake_imap import FakeImapServer, FakeMailbox, make_newsletter
+
+LABEL = "Newsletters"
+
+def add_latency(seconds: float) -> None:
+    handle = fake_imap._Handler._uid_command
+
+    def delayed(self, tag, args):
+        time.sleep(seconds)
+        handle(self, tag, args)
+    fake_imap._Handler._uid_command = delayed
+
+def per_message_sync(server: FakeImapServer) -> int:
+    """The sync before bulk fetching: a Message-ID fetch, an RFC822 fetch and a STORE per message"""
+    client = server.connect()
+    client.select(f'"{LABEL}"')
+    _, data = client.uid('SEARCH', None, 'ALL')
+    fetched = 0
+    for uid in data[0].split():
+        client.uid('FETCH', uid, '(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
+        _, message = client.uid('FETCH', uid, '(RFC822)')
+        fetched += message[0] is not None
+        client.uid('STORE', uid, '+FLAGS', '(\\Seen)')
+    client.logout()
+    return fetched
+
+def bulk_sync(server: FakeImapServer, chunk_size: int, lean_fetch: bool) -> int:
+    fetcher = EmailFetcher("benchmark@example.com", "password", fetch_chunk_size=chunk_size, lean_fetch=lean_fetch)
+    fetcher.mail = server.connect()
+    store = RecordStore(os.path.join(tempfile.mkdtemp(prefix="imap-benchmark-"), "records.db"))
+    fetched = sum(1 for _ in fetcher.iter_raw_emails(LABEL, store))
+    fetcher.disconnect()
+    return fetched
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mailbox = FakeMailbox()
+    for index in range(args.messages):
+        mailbox.add(make_newsletter(index, attachment=index % 3 == 0))
+    if args.latency_ms:
+        add_latency(args.latency_ms / 1000)
+
+    runs = [
+        ("per message", lambda server: per_message_sync(server)),
+        ("bulk, full", lambda server: bulk_sync(server, args.chunk_size, lean_fetch=False)),
+        ("bulk, lean", lambda server: bulk_sync(server, args.chunk_size, lean_fetch=True))
+    ]
+    print(f"{args.messages} messages, {args.chunk_size} UIDs per FETCH, {args.latency_ms:.0f} ms per command")
+    print(f"{'sync':<12} {'fetched':>8} {'commands':>9} {'MB received':>12} {'seconds':>8}")
+    with FakeImapServer(mailbox) as server:
+        for name, run in runs:
+            mailbox.reset_counters()
+            started = time.perf_counter()
+            fetched = run(server)
+            elapsed = time.perf_counter() - started
+            # Connection set-up is the same for every run, so it is left out of the counts
+            commands = [command for command in mailbox.commands if not command.startswith(("LOGIN", "LOGOUT"))]
+            print(
+                f"{name:<12} {fetched:>8} {len(commands):>9} "
+                f"{mailbox.bytes_sent / 1e6:>12.2f} {elapsed:>8.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
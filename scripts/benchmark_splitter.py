@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of ContentSplitter.find_section_boundaries against the previous
+implementation, over a synthetic corpus of plain-text newsletters.
+
+    python scripts/benchmark_splitter.py --docs 200 --size 300000
+
+Both implementations must return identical boundaries for every document, and
+so identical sections, before any timings are reported.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import textwrap
+import time
+
+SPLITTER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "newsletter_processor", "services", "email", "content_splitter.py"
+)
+
+WORDS = (
+    "the model data new release paper research open source training agents benchmark "
+    "latency inference cluster weights context window fine tuning evaluation startup funding"
+).split()
+HEADERS = ["Top Stories", "Research & Papers", "Tools", "Jobs", "Quick Hits", "Funding News", "Sponsored"]
+
+def load_splitter_module():
+    # Loaded by path, so the benchmark does not need the service configuration
+    spec = importlib.util.spec_from_file_location("content_splitter", SPLITTER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class LegacyContentSplitter:
+    """The implementation before the single-pass engine, kept as the reference"""
+    def __init__(self) -> None:
+        self.section_patterns = [
+            r'\n\s*[A-Z][A-Za-z\s&]+:',
+            r'\n\s*[A-Z][A-Za-z\s&]+\n',
+            r'\n\s*\d+\.\s+[A-Z]',
+            r'\n\s*[•★✦]\s+[A-Z]',
+        ]
+
+    def find_section_boundaries(self, body: str) -> list[int]:
+        import re
+        boundaries = set()
+        boundaries.add(0)
+        for pattern in self.section_patterns:
+            matches = re.finditer(pattern, body)
+            for match in matches:
+                boundaries.add(match.start())
+        return sorted(list(boundaries))
+
+def sentence(rng: random.Random) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize()
+    return text + rng.choice([".", ".", ".", "!", " (https://example.com/a).", ", see [https://example.com/b]."])
+
+def newsletter(rng: random.Random, size: int) -> str:
+    """A hard-wrapped plain-text newsletter of roughly size characters"""
+    blocks = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.2:
+            block = rng.choice(HEADERS) + (":" if rng.random() < 0.5 else "")
+        elif kind < 0.35:
+            block = "\n".join(f"{i}. {sentence(rng)}" for i in range(1, rng.randint(2, 6)))
+        elif kind < 0.45:
+            block = "\n".join(f"{rng.choice('•★✦')} {sentence(rng)}" for _ in range(rng.randint(2, 5)))
+        else:
+            block = textwrap.fill(" ".join(sentence(rng) for _ in range(rng.randint(2, 8))), 72)
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks)
+
+def edge_cases(rng: random.Random, count: int) -> list[str]:
+    """Short random strings over the characters the patterns care about"""
+    alphabet = ["\n", "\n", "\n", " ", "\t", "A", "Z", "a", "&", ":", "1", "22", ".", "•", "★", "x", ",", "\r"]
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+def timed(func, corpus: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in corpus:
+            func(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100, help="Number of synthetic newsletters")
+    parser.add_argument("--size", type=int, default=100_000, help="Approximate characters per newsletter")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs, the best is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    module = load_splitter_module()
+    splitter = module.ContentSplitter()
+    legacy = LegacyContentSplitter()
+    rng = random.Random(args.seed)
+    corpus = [newsletter(rng, rng.randint(args.size // 10, args.size)) for _ in range(args.docs)]
+
+    checked = 0
+    for body in corpus + edge_cases(rng, 20_000):
+        expected = legacy.find_section_boundaries(body)
+        if splitter.find_section_boundaries(body) != expected:
+            raise SystemExit(f"Boundary mismatch for {body[:80]!r}")
+        checked += 1
+    print(f"Identical boundaries for {checked} documents")
+
+    total_chars = sum(len(body) for body in corpus)
+    legacy_seconds = timed(legacy.find_section_boundaries, corpus, args.repeat)
+    new_seconds = timed(splitter.find_section_boundaries, corpus, args.repeat)
+    print(f"Corpus: {len(corpus)} newsletters, {total_chars / 1e6:.1f}M characters")
+    print(f"Legacy:      {legacy_seconds:.3f}s ({total_chars / legacy_seconds / 1e6:.1f}M chars/sec)")
+    print(f"Single pass: {new_seconds:.3f}s ({total_chars / new_seconds / 1e6:.1f}M chars/sec)")
+    print(f"Speedup:     {legacy_seconds / new_seconds:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+
+# Settings are read on import, so the required ones need a value before any test module loads
+for name, value in {
+    "WEAVIATE_URL": "http://127.0.0.1:8080",
+    "EMAIL_ADDRESS": "newsletters@example.com",
+    "EMAIL_PASSWORD": "password",
+    "OPENAI_API_KEY": "test"
+}.items():
+    os.environ.setdefault(name, value)
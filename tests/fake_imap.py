@@ -0,0 +1,231 @@
+"""
+A minimal in-process IMAP server for tests and benchmarks.
+
+It implements only what EmailFetcher uses: LOGIN, SELECT/EXAMINE, STATUS and the
+UID variants of SEARCH, FETCH (UID, RFC822, BODYSTRUCTURE, BODY.PEEK[...]) and
+STORE. Every command and every byte sent is counted, so the round trips and
+traffic of a sync can be measured without a real mailbox.
+"""
+import email
+import imaplib
+import re
+import socketserver
+import threading
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Optional
+
+def _sequence_set(spec: str, uids: list[int]) -> list[int]:
+    """The UIDs matched by an IMAP sequence set such as 1:5,8,10:*"""
+    highest = max(uids) if uids else 0
+    matched = set()
+    for part in spec.split(','):
+        bounds = [highest if value == '*' else int(value) for value in part.split(':')]
+        lo, hi = min(bounds), max(bounds)
+        matched.update(uid for uid in uids if lo <= uid <= hi)
+    return sorted(matched)
+
+def _quote(value: Optional[str]) -> bytes:
+    if value is None:
+        return b'NIL'
+    return b'"' + value.encode().replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"'
+
+def _bodystructure(msg) -> bytes:
+    if msg.is_multipart():
+        children = b''.join(_bodystructure(part) for part in msg.get_payload())
+        return b'(' + children + b' ' + _quote(msg.get_content_subtype().upper()) + b')'
+    maintype, subtype = msg.get_content_maintype().upper(), msg.get_content_subtype().upper()
+    charset = msg.get_param('charset')
+    params = b'(' + _quote('CHARSET') + b' ' + _quote(charset) + b')' if charset else b'NIL'
+    encoding = (msg.get('Content-Transfer-Encoding') or '7BIT').upper()
+    payload = msg.get_payload().encode('latin-1', 'replace')
+    fields = [_quote(maintype), _quote(subtype), params, b'NIL', b'NIL', _quote(encoding), str(len(payload)).encode()]
+    if maintype == 'TEXT':
+        fields.append(str(payload.count(b'\n')).encode())
+    return b'(' + b' '.join(fields) + b')'
+
+def _section(msg, section: str) -> bytes:
+    part = msg
+    for index in section.split('.'):
+        if part.is_multipart():
+            part = part.get_payload()[int(index) - 1]
+        elif index != '1':
+            return b''
+    return part.get_payload().encode('latin-1', 'replace')
+
+def _header_fields(msg, fields: list[str]) -> bytes:
+    wanted = {field.upper() for field in fields}
+    lines = [f"{name}: {value}\r\n".encode() for name, value in msg.items() if name.upper() in wanted]
+    return b''.join(lines) + b'\r\n'
+
+def make_newsletter(
+    index: int,
+    html: bool = True,
+    attachment: bool = False,
+    message_id: Optional[str] = None,
+    date: Optional[str] = None
+) -> bytes:
+    """
+    A newsletter with a text/plain part, optionally an HTML alternative and an
+    attachment. An empty message_id leaves out the Message-ID header.
+    """
+    text = MIMEText(
+        f"\nHEADLINE NUMBER {index}\nSome description text {index}.\n\n"
+        f"SECOND STORY\nMore text [https://example.com/{index}]\n",
+        'plain', 'utf-8'
+    )
+    alternative = MIMEMultipart('alternative')
+    alternative.attach(text)
+    if html:
+        alternative.attach(MIMEText("<html>" + "<p>story</p>" * 2000 + "</html>", 'html'))
+    if attachment:
+        msg = MIMEMultipart('mixed')
+        msg.attach(alternative)
+        msg.attach(MIMEApplication(b'\0' * 20000, Name='report.pdf'))
+    else:
+        msg = alternative
+    msg['Subject'] = f'Issue {index}'
+    msg['From'] = 'TLDR AI <dan@tldr.tech>'
+    msg['Date'] = date or f'Mon, {1 + index % 28:02d} Jan 2024 10:00:00 +0000'
+    if message_id != '':
+        msg['Message-ID'] = message_id or f'<issue-{index}@example.com>'
+    return msg.as_bytes()
+
+class FakeMailbox:
+    """The messages of a single label, keyed by UID, and the traffic the server has seen"""
+    def __init__(self, uidvalidity: int = 1) -> None:
+        self.uidvalidity = uidvalidity
+        self.messages: dict[int, bytes] = {}
+        self.seen: set[int] = set()
+        # UIDs the server omits from FETCH responses, as for messages expunged mid-sync
+        self.unfetchable: set[int] = set()
+        self.next_uid = 1
+        self.commands: list[str] = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def add(self, raw: bytes) -> int:
+        with self._lock:
+            uid = self.next_uid
+            self.next_uid += 1
+            self.messages[uid] = raw
+            return uid
+
+    def reset_counters(self) -> None:
+        self.commands = []
+        self.bytes_sent = 0
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _send(self, data: bytes) -> None:
+        self.server.mailbox.bytes_sent += len(data)
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def _ok(self, tag: str) -> None:
+        self._send(f'{tag} OK done\r\n'.encode())
+
+    def handle(self) -> None:
+        mailbox = self.server.mailbox
+        self._send(b'* OK fake IMAP server ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().rstrip('\r\n').partition(' ')
+            command, _, args = rest.partition(' ')
+            command = command.upper()
+            mailbox.commands.append(rest)
+            if command == 'CAPABILITY':
+                self._send(b'* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n')
+                self._ok(tag)
+            elif command in ('LOGIN', 'NOOP'):
+                self._ok(tag)
+            elif command == 'LOGOUT':
+                self._send(b'* BYE\r\n')
+                self._ok(tag)
+                return
+            elif command in ('SELECT', 'EXAMINE'):
+                self._send(
+                    f'* {len(mailbox.messages)} EXISTS\r\n'
+                    f'* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid\r\n'
+                    f'* OK [UIDNEXT {mailbox.next_uid}] Predicted next UID\r\n'
+                    f'{tag} OK [READ-WRITE] done\r\n'.encode()
+                )
+            elif command == 'STATUS':
+                self._send(f'* STATUS label (UIDVALIDITY {mailbox.uidvalidity})\r\n'.encode())
+                self._ok(tag)
+            elif command == 'UID':
+                self._uid_command(tag, args)
+            else:
+                self._send(f'{tag} BAD unknown command\r\n'.encode())
+
+    def _uid_command(self, tag: str, args: str) -> None:
+        mailbox = self.server.mailbox
+        command, _, args = args.partition(' ')
+        command = command.upper()
+        uids = sorted(mailbox.messages)
+        if command == 'SEARCH':
+            match = re.search(r'UID (\S+)', args)
+            found = _sequence_set(match.group(1), uids) if match else uids
+            self._send(('* SEARCH' + ''.join(f' {uid}' for uid in found) + '\r\n').encode())
+        elif command == 'STORE':
+            for uid in _sequence_set(args.split(' ')[0], uids):
+                mailbox.seen.add(uid)
+                self._send(f'* {uids.index(uid) + 1} FETCH (UID {uid} FLAGS (\\Seen))\r\n'.encode())
+        elif command == 'FETCH':
+            spec, _, items = args.partition(' ')
+            items = items.strip().strip('()')
+            for uid in _sequence_set(spec, uids):
+                if uid not in mailbox.unfetchable:
+                    self._send(self._fetch(uid, uids.index(uid) + 1, items))
+        else:
+            self._send(f'{tag} BAD unknown UID command\r\n'.encode())
+            return
+        self._ok(tag)
+
+    def _fetch(self, uid: int, sequence: int, items: str) -> bytes:
+        raw = self.server.mailbox.messages[uid]
+        msg = email.message_from_bytes(raw)
+        out = [f'* {sequence} FETCH (UID {uid}'.encode()]
+        for item in re.findall(r'BODY\.PEEK\[[^\]]*\]|RFC822|BODYSTRUCTURE', items):
+            if item == 'BODYSTRUCTURE':
+                out.append(b' BODYSTRUCTURE ' + _bodystructure(msg))
+                continue
+            if item == 'RFC822':
+                name, data = b'RFC822', raw
+            else:
+                section = item[len('BODY.PEEK['):-1]
+                name = b'BODY[' + section.encode() + b']'
+                if section.upper().startswith('HEADER.FIELDS'):
+                    data = _header_fields(msg, re.search(r'\((.*)\)', section).group(1).split())
+                else:
+                    data = _section(msg, section)
+            out.append(b' ' + name + b' {' + str(len(data)).encode() + b'}\r\n' + data)
+        return b''.join(out) + b')\r\n'
+
+class FakeImapServer(socketserver.ThreadingTCPServer):
+    """
+    FakeImapServer is a class to serve a FakeMailbox on a local port, in a daemon
+    thread. Use it as a context manager; connect() opens a logged in imaplib client.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, mailbox: FakeMailbox) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.mailbox = mailbox
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeImapServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def connect(self) -> imaplib.IMAP4:
+        client = imaplib.IMAP4('127.0.0.1', self.server_address[1])
+        client.login('newsletters@example.com', 'password')
+        return client
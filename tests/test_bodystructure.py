@@ -0,0 +1,75 @@
+from newsletter_processor.services.email.bodystructure import decode_part, find_text_part, parse_bodystructure_response
+
+def parse_one(line: bytes):
+    return parse_bodystructure_response([line])
+
+def test_single_part_text_plain():
+    structures = parse_one(
+        b'1 (UID 5 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "iso-8859-1") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL))'
+    )
+    assert find_text_part(structures[b'5']) == {"section": "1", "encoding": "quoted-printable", "charset": "iso-8859-1"}
+
+def test_nested_multipart_alternative():
+    # multipart/mixed (multipart/alternative (text/plain, text/html), application/pdf)
+    structures = parse_one(
+        b'2 (UID 9 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "BASE64" 300 5 NIL NIL NIL)'
+        b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "7BIT" 9000 120 NIL NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL)'
+        b'("APPLICATION" "PDF" ("NAME" "report.pdf") NIL NIL "BASE64" 20000 NIL ("ATTACHMENT" ("FILENAME" "report.pdf")) NIL)'
+        b' "MIXED" ("BOUNDARY" "b0") NIL NIL))'
+    )
+    assert find_text_part(structures[b'9']) == {"section": "1.1", "encoding": "base64", "charset": "utf-8"}
+
+def test_text_plain_after_html_is_numbered_by_position():
+    structures = parse_one(
+        b'1 (UID 3 BODYSTRUCTURE (("TEXT" "HTML" NIL NIL NIL "7BIT" 10 1)("TEXT" "PLAIN" NIL NIL NIL NIL 10 1) "ALTERNATIVE"))'
+    )
+    assert find_text_part(structures[b'3']) == {"section": "2", "encoding": "7bit", "charset": "utf-8"}
+
+def test_literal_encoded_params():
+    # Servers send values with special characters as literals, which imaplib splits off the line
+    structures = parse_bodystructure_response([
+        (b'1 (UID 12 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" {12}', b'windows-1252'),
+        (b') NIL {13}', b'Quoted "desc"'),
+        b' "8BIT" 42 2 NIL NIL NIL))'
+    ])
+    structure = structures[b'12']
+    assert structure[2] == ["CHARSET", "windows-1252"]
+    assert structure[4] == 'Quoted "desc"'
+    assert find_text_part(structure) == {"section": "1", "encoding": "8bit", "charset": "windows-1252"}
+
+def test_quoted_strings_with_escapes_and_nil():
+    structures = parse_one(
+        b'1 (UID 4 BODYSTRUCTURE ("TEXT" "PLAIN" NIL "<id\\"1>" NIL "7BIT" 5 1 NIL NIL NIL))'
+    )
+    structure = structures[b'4']
+    assert structure[2] is None
+    assert structure[3] == '<id"1>'
+
+def test_message_without_text_plain_part():
+    structures = parse_one(
+        b'1 (UID 8 BODYSTRUCTURE (("TEXT" "HTML" NIL NIL NIL "7BIT" 10 1)'
+        b'("IMAGE" "PNG" ("NAME" "logo.png") NIL NIL "BASE64" 400 NIL NIL NIL) "RELATED"))'
+    )
+    assert find_text_part(structures[b'8']) is None
+
+def test_encapsulated_message():
+    # message/rfc822 carries the envelope, the nested structure and its line count
+    structures = parse_one(
+        b'1 (UID 6 BODYSTRUCTURE (("TEXT" "HTML" NIL NIL NIL "7BIT" 10 1)'
+        b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 (NIL "Fwd" NIL NIL NIL NIL NIL NIL NIL NIL)'
+        b'("TEXT" "PLAIN" ("CHARSET" "us-ascii") NIL NIL "7BIT" 20 2) 12) "MIXED"))'
+    )
+    assert find_text_part(structures[b'6']) == {"section": "2.1", "encoding": "7bit", "charset": "us-ascii"}
+
+def test_several_messages_and_uid_after_structure():
+    structures = parse_bodystructure_response([
+        b'1 (UID 1 BODYSTRUCTURE ("TEXT" "PLAIN" NIL NIL NIL "7BIT" 1 1))',
+        b'2 (BODYSTRUCTURE ("TEXT" "HTML" NIL NIL NIL "7BIT" 1 1) UID 2)'
+    ])
+    assert set(structures) == {b'1', b'2'}
+    assert find_text_part(structures[b'2']) is None
+
+def test_decode_part_undoes_transfer_encoding():
+    assert decode_part(b'Y2Fmw6k=', 'base64', 'utf-8') == 'café'
+    assert decode_part(b'caf=E9', 'quoted-printable', 'iso-8859-1') == 'café'
+    assert decode_part(b'plain', '7bit', 'no-such-charset') == 'plain'
@@ -0,0 +1,154 @@
+import pytest
+
+from newsletter_processor.services.email.email_fetcher import EmailFetcher, _parse_fetch_response, _uid_set
+from newsletter_processor.services.record_store import RecordStore
+
+from .fake_imap import FakeImapServer, FakeMailbox, make_newsletter
+
+@pytest.mark.parametrize("uids, expected", [
+    ([b'1'], "1"),
+    ([b'1', b'2', b'3', b'4', b'5'], "1:5"),
+    ([b'12', b'10', b'1', b'11', b'3', b'2', b'8'], "1:3,8,10:12"),
+    ([b'7', b'7', 7], "7"),
+    ([], "")
+])
+def test_uid_set_compresses_ranges(uids, expected):
+    assert _uid_set(uids) == expected
+
+def test_parse_fetch_response_groups_literals_by_uid():
+    # As returned by imaplib: literals as (prefix, data) tuples, the rest of the line as bytes
+    response = [
+        (b'1 (UID 10 BODY[HEADER.FIELDS (MESSAGE-ID)] {25}', b'Message-ID: <a@example>\r\n'),
+        b')',
+        (b'2 (UID 11 BODY[HEADER.FIELDS (SUBJECT)] {13}', b'Subject: Hi\r\n'),
+        (b' BODY[1.2] {5}', b'hello'),
+        b')',
+        None
+    ]
+    assert _parse_fetch_response(response) == {
+        b'10': {'BODY[HEADER.FIELDS (MESSAGE-ID)]': b'Message-ID: <a@example>\r\n'},
+        b'11': {'BODY[HEADER.FIELDS (SUBJECT)]': b'Subject: Hi\r\n', 'BODY[1.2]': b'hello'}
+    }
+
+def test_parse_fetch_response_reads_uid_after_the_literal():
+    response = [(b'3 (RFC822 {4}', b'data'), b' UID 42)']
+    assert _parse_fetch_response(response) == {b'42': {'RFC822': b'data'}}
+
+def test_parse_fetch_response_skips_messages_without_uid():
+    assert _parse_fetch_response([(b'1 (RFC822 {4}', b'data'), b')']) == {}
+
+@pytest.fixture
+def mailbox():
+    mailbox = FakeMailbox(uidvalidity=7)
+    for index in range(12):
+        mailbox.add(make_newsletter(index, attachment=index % 3 == 0))
+    return mailbox
+
+@pytest.fixture
+def fetcher(mailbox, tmp_path):
+    with FakeImapServer(mailbox) as server:
+        fetcher = EmailFetcher("newsletters@example.com", "password", sync_state_path=str(tmp_path / "sync.json"))
+        fetcher.mail = server.connect()
+        yield fetcher
+        fetcher.disconnect()
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / "records.db"))
+
+def sync(fetcher, store):
+    raws = list(fetcher.iter_raw_emails("Newsletters", store))
+    fetcher.commit_sync_state()
+    return raws
+
+def test_search_uids_without_checkpoint_searches_all(fetcher, mailbox):
+    fetcher.mail.select('"Newsletters"')
+    uids, last_uid = fetcher._search_uids("Newsletters", 7)
+    assert uids == [str(uid).encode() for uid in sorted(mailbox.messages)]
+    assert last_uid == 0
+
+def test_search_uids_from_checkpoint(fetcher, mailbox):
+    fetcher.sync_state.update("Newsletters", 7, 10)
+    fetcher.mail.select('"Newsletters"')
+    uids, last_uid = fetcher._search_uids("Newsletters", 7)
+    assert (uids, last_uid) == ([b'11', b'12'], 10)
+    assert mailbox.commands[-1] == "UID SEARCH UID 11:*"
+
+def test_search_uids_drops_the_highest_uid_matched_by_star(fetcher):
+    # "13:*" matches UID 12 when no message has a UID of 13 or above
+    fetcher.sync_state.update("Newsletters", 7, 12)
+    fetcher.mail.select('"Newsletters"')
+    assert fetcher._search_uids("Newsletters", 7) == ([], 12)
+
+def test_search_uids_resyncs_when_uidvalidity_changes(fetcher, mailbox):
+    fetcher.sync_state.update("Newsletters", 6, 10)
+    fetcher.mail.select('"Newsletters"')
+    uids, last_uid = fetcher._search_uids("Newsletters", 7)
+    assert len(uids) == len(mailbox.messages)
+    assert last_uid == 0
+    assert mailbox.commands[-1] == "UID SEARCH ALL"
+
+def test_sync_uses_a_fixed_number_of_commands(fetcher, mailbox, store):
+    mailbox.reset_counters()
+    raws = sync(fetcher, store)
+    assert len(raws) == 12
+    # SELECT, SEARCH, Message-ID FETCH, BODYSTRUCTURE FETCH, one lean FETCH per text/plain section, STORE
+    assert [command.split(' (')[0] for command in mailbox.commands] == [
+        'SELECT "Newsletters"',
+        'UID SEARCH ALL',
+        'UID FETCH 1:12',
+        'UID FETCH 1:12',
+        'UID FETCH 1,4,7,10',
+        'UID FETCH 2:3,5:6,8:9,11:12',
+        'UID STORE 1:12 +FLAGS.SILENT'
+    ]
+    assert mailbox.seen == set(mailbox.messages)
+
+def test_incremental_sync_only_fetches_new_messages(fetcher, mailbox, store):
+    for raw in sync(fetcher, store):
+        store.append([{'id': raw['id']}])
+    mailbox.add(make_newsletter(100))
+    mailbox.reset_counters()
+
+    raws = sync(fetcher, store)
+    assert [raw['id'] for raw in raws] == ['issue-100@example.com']
+    assert mailbox.commands[1] == "UID SEARCH UID 13:*"
+    assert fetcher.sync_state.get("Newsletters") == {"uidvalidity": 7, "last_uid": 13}
+
+def test_lean_fetch_skips_html_and_attachments(fetcher, mailbox, store):
+    full = EmailFetcher("newsletters@example.com", "password", lean_fetch=False)
+    full.mail = fetcher.mail
+    full_bytes = sum(len(raw['rfc822']) for raw in full.iter_raw_emails("Newsletters", store))
+    lean_bytes = sum(len(raw['header']) + len(raw['body']) for raw in fetcher.iter_raw_emails("Newsletters", store))
+    assert lean_bytes * 10 < full_bytes
+
+def store_all(fetcher, store, failed_uids=()):
+    """Sync like NewsletterProcessor: store what was fetched, then commit the checkpoint"""
+    raws = list(fetcher.iter_raw_emails("Newsletters", store))
+    store.append([{'id': raw['id']} for raw in raws if raw['uid'] not in failed_uids])
+    fetcher.commit_sync_state(failed_uids)
+    return raws
+
+def test_checkpoint_stops_before_messages_the_server_did_not_return(fetcher, mailbox, store):
+    mailbox.unfetchable.add(5)
+    assert len(store_all(fetcher, store)) == 11
+    assert fetcher.sync_state.get("Newsletters")["last_uid"] == 4
+
+    mailbox.unfetchable.clear()
+    assert [raw['uid'] for raw in store_all(fetcher, store)] == ['5']
+    assert fetcher.sync_state.get("Newsletters")["last_uid"] == 12
+
+def test_checkpoint_moves_past_messages_without_message_id(fetcher, mailbox, store):
+    mailbox.add(make_newsletter(50, message_id=''))
+    last = mailbox.add(make_newsletter(51))
+    assert [raw['id'] for raw in store_all(fetcher, store)][-1] == 'issue-51@example.com'
+    assert fetcher.sync_state.get("Newsletters")["last_uid"] == last
+    assert store_all(fetcher, store) == []
+
+def test_checkpoint_stops_before_failed_uids(fetcher, mailbox, store):
+    store_all(fetcher, store, failed_uids=('3', '9'))
+    assert fetcher.sync_state.get("Newsletters")["last_uid"] == 2
+
+    raws = store_all(fetcher, store)
+    assert [raw['uid'] for raw in raws] == ['3', '9']
+    assert fetcher.sync_state.get("Newsletters")["last_uid"] == 12
@@ -0,0 +1,45 @@
+from newsletter_processor.services.keyword_index import KeywordIndex
+from newsletter_processor.services.weaviate import loader
+from newsletter_processor.services.weaviate.loader import KeywordIndexer
+
+def test_keyword_indexer_indexes_records_once_all_objects_loaded(monkeypatch):
+    indexed = []
+    monkeypatch.setattr(loader, "index_keywords", lambda newsletters: indexed.extend(n["email_id"] for n in newsletters))
+    reported = []
+    keywords = KeywordIndexer(lambda loaded_ids, errors: reported.append((loaded_ids, errors)))
+    keywords.expect("a", {"email_id": "a"}, objects=3)
+    keywords.expect("b", {"email_id": "b"}, objects=1)
+    keywords.expect("c", {"email_id": "c"}, objects=2)
+
+    keywords.on_complete(["a", "a", "b", "c"], {})
+    assert indexed == ["b"]
+    # c's second object fails, so it never reaches the keyword index
+    keywords.on_complete(["a"], {"c": "Batch failure: timeout"})
+    keywords.on_complete(["c"], {})
+    assert indexed == ["b", "a"]
+    assert reported[1] == (["a"], {"c": "Batch failure: timeout"})
+
+class EmbeddedStore:
+    def __init__(self, records) -> None:
+        self.records = records
+
+    def iter_embedded(self):
+        return iter(self.records)
+
+def test_backfill_indexes_the_archive_once_even_when_new_mail_was_indexed_first(monkeypatch, tmp_path):
+    index = KeywordIndex(str(tmp_path / "keywords.db"))
+    monkeypatch.setattr(loader, "get_keyword_index", lambda: index)
+    monkeypatch.setattr(loader.settings, "KEYWORD_INDEX_ENABLED", True)
+    # Indexed by the first pipeline run after the upgrade, before any backfill
+    index.add([{"email_id": "new@example.com", "header": "New"}])
+    archive = [
+        {"id": f"old-{i}@example.com", "subject": f"Old {i}", "date": "2024-01-01T10:00:00+00:00", "body": "Old issue body"}
+        for i in range(3)
+    ]
+
+    loader.backfill_keyword_index(EmbeddedStore(archive))
+    assert index.count() == 4
+    assert index.is_backfilled()
+
+    loader.backfill_keyword_index(EmbeddedStore([{**archive[0], "id": "later@example.com"}]))
+    assert index.count() == 4
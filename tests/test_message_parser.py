@@ -0,0 +1,17 @@
+import email
+
+import pytest
+
+from newsletter_processor.services.email.message_parser import parse_headers
+
+@pytest.mark.parametrize("date, expected", [
+    ("Mon, 04 Mar 2024 10:00:00 +0000", "2024-03-04T10:00:00+00:00"),
+    ("Mon, 04 Mar 2024 10:00:00 +0000 (UTC)", "2024-03-04T10:00:00+00:00"),
+    ("Mon, 04 Mar 2024 10:00:00 GMT", "2024-03-04T10:00:00+00:00"),
+    ("Mon, 04 Mar 2024 10:00:00 -0800 (PST)", "2024-03-04T10:00:00-08:00"),
+    ("4 Mar 2024 10:00:00 +0100", "2024-03-04T10:00:00+01:00"),
+    ("Mon, 4 Mar 2024 10:00:00 -0000", "2024-03-04T10:00:00+00:00")
+])
+def test_parse_headers_accepts_rfc_5322_dates(date, expected):
+    msg = email.message_from_string(f"Message-ID: <a@example.com>\r\nSubject: Hi\r\nDate: {date}\r\n\r\n")
+    assert parse_headers(msg)["date"] == expected
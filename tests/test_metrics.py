@@ -0,0 +1,25 @@
+import pytest
+
+from newsletter_processor.core.metrics import CallbackMetric, Counter, _Metric, render_metrics
+from newsletter_processor.services.inference import query_cache
+from newsletter_processor.services.inference.query_cache import QueryVectorCache
+
+def test_metric_kinds_must_define_their_samples():
+    with pytest.raises(TypeError):
+        _Metric("incomplete_metric", "No samples.")
+
+def test_callback_metrics_reject_labels():
+    metric = CallbackMetric("callback_metric", "Read at scrape time.", ["cache"], lambda: {("search",): 3})
+    with pytest.raises(TypeError, match="callback_metric"):
+        metric.labels("search")
+    assert 'callback_metric{cache="search"} 3' in metric.render()
+
+def test_render_metrics_includes_cache_statistics(monkeypatch, tmp_path):
+    cache = QueryVectorCache(str(tmp_path / "query_vectors.db"), 10)
+    cache._memory.get("missing")
+    monkeypatch.setattr(query_cache, "get_query_vector_cache", lambda: cache)
+    Counter("rendered_total", "A counter.").inc(2)
+
+    text = render_metrics()
+    assert 'cache_misses_total{cache="query_vectors"} 1' in text
+    assert "rendered_total 2" in text
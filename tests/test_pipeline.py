@@ -0,0 +1,91 @@
+import itertools
+import time
+
+import pytest
+
+from newsletter_processor.services import pipeline as pipeline_module
+from newsletter_processor.services.email.content_splitter import ContentSplitter
+from newsletter_processor.services.pipeline import IngestPipeline
+from newsletter_processor.services.record_store import RecordStore
+
+from .fake_imap import make_newsletter
+
+class RecordingWriter:
+    def __init__(self) -> None:
+        self.flushes = 0
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+class RecordingBackend:
+    def __init__(self) -> None:
+        self.writer = RecordingWriter()
+
+    def create_batch_writer(self, on_complete=None) -> RecordingWriter:
+        return self.writer
+
+class FailingStore:
+    def append(self, records) -> int:
+        raise RuntimeError("disk full")
+
+    def mark_invalid(self, errors) -> None:
+        raise RuntimeError("disk full")
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(pipeline_module, "get_storage_backend", lambda: backend)
+    return backend
+
+def test_failed_stage_closes_sources(backend):
+    closed = []
+
+    def source():
+        try:
+            for index in itertools.count():
+                yield {"id": f"issue-{index}@example.com", "uid": str(index), "rfc822": make_newsletter(index)}
+        finally:
+            closed.append(True)
+
+    pipeline = IngestPipeline([source()], ContentSplitter(), FailingStore(), queue_size=2, load_batch_size=1)
+    with pytest.raises(RuntimeError, match="disk full"):
+        pipeline.run()
+    assert closed == [True]
+
+def test_quiet_stream_does_not_flush_an_empty_writer(backend):
+    def source():
+        time.sleep(1.2)
+        yield from ()
+
+    pipeline = IngestPipeline([source()], ContentSplitter(), FailingStore(), flush_interval=0.2)
+    assert pipeline.run()["fetched"] == 0
+    assert backend.writer.flushes == 0
+
+def undecodable_sources():
+    return [
+        iter([{"id": "issue-0@example.com", "uid": "3", "rfc822": b"Subject: no date\r\n\r\nbody"}]),
+        iter([{"id": "issue-1@example.com", "uid": "8", "rfc822": make_newsletter(1, date="Garbage 04 Jan 2024")}])
+    ]
+
+def test_undecodable_emails_are_stored_as_errors(backend, tmp_path):
+    store = RecordStore(str(tmp_path / "records.db"))
+    pipeline = IngestPipeline(undecodable_sources(), ContentSplitter(), store)
+    stats = pipeline.run()
+    assert (stats["fetched"], stats["errors"]) == (2, 2)
+    assert set(store.get_errors()) == {"issue-0@example.com", "issue-1@example.com"}
+    assert store.existing_ids(["issue-0@example.com", "issue-1@example.com"]) == {"issue-0@example.com", "issue-1@example.com"}
+    # Never loaded or retried
+    assert store.count_pending() == 0
+    assert list(store.iter_embedded()) == []
+    assert pipeline.failed_uids == {}
+
+def test_undecodable_emails_that_cannot_be_stored_are_reported_by_source(backend):
+    pipeline = IngestPipeline(undecodable_sources(), ContentSplitter(), FailingStore())
+    pipeline.run()
+    assert pipeline.failed_uids == {0: {"3"}, 1: {"8"}}
@@ -0,0 +1,29 @@
+import numpy as np
+
+from newsletter_processor.services.storage.local_backend import LocalVectorIndex
+from newsletter_processor.services.weaviate import query as query_module
+
+def add(backend, index, date):
+    backend.upsert("Newsletter", [(f"uuid-{index}", {"email_id": f"issue-{index}@example.com", "received_date": date}, np.ones(4))])
+
+def test_recent_pages_do_not_repeat_records_received_at_the_same_time(monkeypatch, tmp_path):
+    backend = LocalVectorIndex(str(tmp_path))
+    dates = ["2024-01-03T08:00:00Z"] + ["2024-01-02T08:00:00Z"] * 5 + ["2024-01-01T08:00:00Z"] * 2
+    for index, date in enumerate(dates):
+        add(backend, index + 1, date)
+    monkeypatch.setattr(query_module, "get_storage_backend", lambda: backend)
+
+    page, cursor = query_module._get_recent_page(3, None, ["email_id"])
+    # Arrives between pages at the date the first page ended on, ahead of the records already returned
+    add(backend, 0, "2024-01-02T08:00:00Z")
+    records = page + list(query_module.iter_recent_records(cursor=cursor, page_size=3, fields=["email_id"]))
+    assert [record["email_id"] for record in records] == [f"issue-{index}@example.com" for index in range(1, 9)]
+
+def test_search_cache_keys_keep_case_unless_keyword_only():
+    def key(term, mode):
+        return query_module._prepare_search(term, mode=mode)[-1]
+
+    assert key("Apple  results", "vector") == key("Apple results", "vector")
+    assert key("Apple", "vector") != key("apple", "vector")
+    assert key("Apple", "hybrid") != key("apple", "hybrid")
+    assert key("Apple", "keyword") == key("apple", "keyword")
@@ -0,0 +1,40 @@
+import json
+
+from newsletter_processor.services.record_store import RecordStore
+
+def test_only_legacy_records_in_the_vector_store_are_imported_as_loaded(tmp_path):
+    records = [
+        {"id": "<a@example.com>", "subject": "A", "date": "2024-01-01T10:00:00+00:00", "body": "a"},
+        {"id": "b@example.com", "subject": "B", "date": "2024-01-02T10:00:00+00:00", "body": "b"},
+        {"id": "c@example.com", "subject": "C", "date": "2024-01-03T10:00:00+00:00", "body": "c"},
+        {"subject": "no id"}
+    ]
+    (tmp_path / "newsletter_records.json").write_text(json.dumps(records))
+    (tmp_path / "error_records.json").write_text(json.dumps({"b@example.com": "Empty header"}))
+
+    store = RecordStore(
+        str(tmp_path / "records.db"),
+        legacy_json_path=str(tmp_path / "newsletter_records.json"),
+        legacy_errors_path=str(tmp_path / "error_records.json"),
+        # The old loader kept the ids as they were in the file
+        legacy_loaded_ids=lambda: {"<a@example.com>"}
+    )
+
+    assert store.count() == 3
+    # b failed to load and c was appended by a scheduled check without a load
+    assert [record["id"] for record in store.iter_pending()] == ["b@example.com", "c@example.com"]
+    assert store.get_errors() == {"b@example.com": "Empty header"}
+    assert [record["id"] for record in store.iter_embedded()] == ["a@example.com"]
+
+def test_legacy_records_are_pending_without_loaded_ids(tmp_path):
+    (tmp_path / "newsletter_records.json").write_text(json.dumps([{"id": "a@example.com"}]))
+    store = RecordStore(str(tmp_path / "records.db"), legacy_json_path=str(tmp_path / "newsletter_records.json"))
+    assert store.count_pending() == 1
+
+def test_legacy_import_only_runs_on_an_empty_store(tmp_path):
+    (tmp_path / "newsletter_records.json").write_text(json.dumps([{"id": "a@example.com"}]))
+    store = RecordStore(str(tmp_path / "records.db"))
+    store.append([{"id": "new@example.com"}])
+
+    store = RecordStore(str(tmp_path / "records.db"), legacy_json_path=str(tmp_path / "newsletter_records.json"))
+    assert store.existing_ids(["a@example.com", "new@example.com"]) == {"new@example.com"}
@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+from newsletter_processor.services import scheduler as scheduler_module
+
+def job_ids(listeners):
+    async def start():
+        scheduler = scheduler_module.start_scheduler(listeners)
+        scheduler.shutdown(wait=False)
+        return {job.id for job in scheduler.get_jobs()}
+    return asyncio.run(start())
+
+def test_fallback_poll_is_only_scheduled_with_idle_listeners(monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "KEYWORD_INDEX_ENABLED", False)
+    assert job_ids([]) == {"email_check"}
+    assert job_ids([SimpleNamespace(connected=True)]) == {"email_check", "email_fallback_check"}
+
+def test_keyword_backfill_is_scheduled_with_the_keyword_index(monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "KEYWORD_INDEX_ENABLED", True)
+    assert "keyword_backfill" in job_ids([])
+
+def test_fallback_poll_runs_only_while_a_listener_is_disconnected(monkeypatch):
+    checks = []
+
+    async def check():
+        checks.append(True)
+    monkeypatch.setattr(scheduler_module, "scheduled_email_check", check)
+
+    asyncio.run(scheduler_module.fallback_email_check([SimpleNamespace(connected=True)] * 2))
+    assert checks == []
+    asyncio.run(scheduler_module.fallback_email_check([SimpleNamespace(connected=True), SimpleNamespace(connected=False)]))
+    assert checks == [True]